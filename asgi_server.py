@@ -0,0 +1,185 @@
+import os
+import json
+import logging
+import traceback
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Worker ImageNormalizer (spawn) meng-import ulang file ini sebagai __mp_main__;
+# runtime bot (Telegram, klien Google, journal) hanya dibuat di proses server
+SERVER_PROCESS = __name__ != '__mp_main__'
+
+# Import runtime bot (bot application + pipeline update webhook)
+if SERVER_PROCESS:
+    from bot_runtime import BotRuntime
+from services.metrics import metrics
+
+# Setup logging dengan format yang lebih detail
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO,
+    handlers=[
+        logging.StreamHandler(),
+    ]
+)
+
+logger = logging.getLogger(__name__)
+
+# Batas ukuran body request (update Telegram jauh di bawah ini)
+MAX_BODY_SIZE = int(os.getenv('MAX_BODY_SIZE', 1024 * 1024))
+
+# Global variables
+runtime = BotRuntime() if SERVER_PROCESS else None
+
+def error_payload(message):
+    """Standard error payload"""
+    return {
+        "status": "error",
+        "message": message,
+        "timestamp": datetime.now().isoformat()
+    }
+
+async def read_json(receive):
+    """Read the request body and parse it as JSON, None if empty or invalid"""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+        if len(body) > MAX_BODY_SIZE:
+            return None
+
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+async def send_response(send, body, status=200, content_type='application/json'):
+    """Send a complete HTTP response"""
+    if not isinstance(body, (bytes, str)):
+        body = json.dumps(body)
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type.encode('latin-1')),
+            (b'content-length', str(len(body)).encode('latin-1')),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def index(receive):
+    """Health check endpoint"""
+    return runtime.health_info(), 200
+
+async def webhook(receive):
+    """Handle incoming webhook from Telegram, on the same loop as the Application"""
+    json_data = await read_json(receive)
+    return runtime.accept_update(json_data)
+
+async def set_webhook(receive):
+    """Set webhook URL for Telegram bot"""
+    if not runtime.application:
+        return error_payload("Bot application is not initialized"), 500
+    return await runtime.set_webhook(await read_json(receive))
+
+async def webhook_info(receive):
+    """Get current webhook info"""
+    if not runtime.application:
+        return error_payload("Bot application is not initialized"), 500
+    return await runtime.get_webhook_info()
+
+async def delete_webhook(receive):
+    """Delete current webhook"""
+    if not runtime.application:
+        return error_payload("Bot application is not initialized"), 500
+    return await runtime.delete_webhook()
+
+async def test(receive):
+    """Test endpoint for debugging"""
+    return runtime.test_info(), 200
+
+ROUTES = {
+    '/': ('GET', index),
+    '/webhook': ('POST', webhook),
+    '/set-webhook': ('POST', set_webhook),
+    '/webhook-info': ('GET', webhook_info),
+    '/delete-webhook': ('POST', delete_webhook),
+    '/test': ('GET', test),
+}
+
+async def lifespan(receive, send):
+    """Initialize the bot on startup, on the server's own event loop"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                await runtime.initialize()
+                await send({'type': 'lifespan.startup.complete'})
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+        elif message['type'] == 'lifespan.shutdown':
+            # uvicorn sudah berhenti menerima koneksi; drain update dan pekerjaan Google
+            await runtime.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    """ASGI application"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    path = scope['path']
+    if path == '/metrics':
+        await send_response(send, metrics.render(), content_type='text/plain; version=0.0.4')
+        return
+
+    route = ROUTES.get(path)
+    if not route:
+        await send_response(send, error_payload("Endpoint not found"), 404)
+        return
+
+    method, handler = route
+    if scope['method'] != method:
+        await send_response(send, error_payload("Method not allowed"), 405)
+        return
+
+    try:
+        payload, status = await handler(receive)
+    except Exception as e:
+        logger.error(f"Error in {path}: {e}")
+        logger.error(traceback.format_exc())
+        payload, status = error_payload(f"Error in {path}: {str(e)}"), 500
+
+    await send_response(send, payload, status)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    try:
+        logger.info("🚀 Starting Telegram Bot ASGI Server...")
+
+        # Get port from environment variable (Railway uses PORT)
+        port = int(os.getenv('PORT', 5000))
+        host = os.getenv('HOST', '0.0.0.0')
+
+        logger.info(f"🚀 Starting ASGI server on {host}:{port}")
+
+        # Bot diinisialisasi lewat lifespan, di loop yang sama dengan route webhook
+        uvicorn.run(app, host=host, port=port, lifespan='on', log_level='info')
+
+    except Exception as e:
+        logger.error(f"❌ Failed to start server: {e}")
+        logger.error(traceback.format_exc())
+        exit(1)
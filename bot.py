@@ -1,5 +1,7 @@
 import os
 import re
+import asyncio
+import mimetypes
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 from telegram.ext import (
     Application,
@@ -9,40 +11,303 @@ from telegram.ext import (
     ContextTypes,
     ConversationHandler
 )
+from telegram.error import RetryAfter
 from datetime import datetime
 
 # Fixed imports - use absolute paths
 from services.google_service import GoogleService
+from services.async_google_service import AsyncGoogleService
+from services.httpx_google_service import HttpxGoogleService
+from services.retry_policy import RetryPolicy
 from services.session_service import SessionService
+from services.photo_service import PhotoService
+from services.image_service import ImageNormalizer
+from services.upload_queue import UploadQueue
+from services.album_collector import AlbumCollector
+from services.status_message import StatusMessage
+from services.rate_limiter import TelegramRateLimiter, PRIORITY_BACKGROUND
 from config.spreadsheet_config import SpreadsheetConfig
+from services.metrics import metrics, timed_handler
 
 # States untuk ConversationHandler
 SELECT_REPORT_TYPE, INPUT_ID, INPUT_DATA, CONFIRM_DATA, UPLOAD_PHOTO, INPUT_PHOTO_DESC = range(6)
 
+# Jenis update yang dibaca tiap tipe handler. Semua handler percakapan membaca
+# update.message, jadi edited_message, channel_post, dll tidak pernah ditangani.
+HANDLER_UPDATE_TYPES = {
+    CommandHandler: Update.MESSAGE,
+    MessageHandler: Update.MESSAGE,
+}
+
 class TelegramBot:
     def __init__(self, token, spreadsheet_id):
         self.token = token
         self.spreadsheet_id = spreadsheet_id
         
         # Initialize services
-        self.google_service = GoogleService()
-        self.session_service = SessionService(self.google_service)
+        self.google_service = GoogleService(policy=RetryPolicy(
+            max_attempts=int(os.getenv('GOOGLE_RETRY_ATTEMPTS', 4)),
+            base_delay=float(os.getenv('GOOGLE_RETRY_BASE_DELAY', 0.5)),
+            max_delay=float(os.getenv('GOOGLE_RETRY_MAX_DELAY', 8)),
+            deadline=float(os.getenv('GOOGLE_CALL_DEADLINE', 30)),
+            failure_threshold=int(os.getenv('GOOGLE_BREAKER_FAILURES', 5)),
+            reset_timeout=float(os.getenv('GOOGLE_BREAKER_RESET', 30))
+        ))
+        self.async_google_service = self.create_async_google_service()
+        self.session_service = SessionService(
+            self.google_service,
+            recent_reports=int(os.getenv('RECENT_REPORTS_INDEX', 50))
+        )
+        self.photo_service = PhotoService(
+            self.async_google_service,
+            spool_dir=os.getenv('PHOTO_SPOOL_DIR', 'spool'),
+            spool_threshold=int(os.getenv('PHOTO_SPOOL_THRESHOLD', 5 * 1024 * 1024)),
+            streaming=os.getenv('PHOTO_STREAMING', 'true').lower() == 'true',
+            normalizer=self.create_image_normalizer()
+        )
+        # Transfer foto berjalan di background, dibatasi per sesi
+        self.upload_queue = UploadQueue(
+            per_session_limit=int(os.getenv('PHOTO_UPLOADS_PER_SESSION', 3))
+        )
+        # Tunggu singkat saja: send_report berjalan di lane dispatcher yang dipakai user lain juga
+        self.upload_barrier_timeout = float(os.getenv('PHOTO_UPLOAD_BARRIER_TIMEOUT', 5))
+        # Jeda minimum antar edit pesan status (batas Telegram per chat)
+        self.status_interval = float(os.getenv('STATUS_EDIT_INTERVAL', 1.0))
+        # Album (media_group_id) di mode Upload Banyak dikumpulkan lalu diproses sekaligus
+        self.album_collector = AlbumCollector(
+            self.save_album,
+            window=int(os.getenv('ALBUM_WINDOW_MS', 1000)) / 1000
+        )
         self.spreadsheet_config = SpreadsheetConfig()
+        self.conv_handler = None
+        
+        # Lock per user agar folder Drive hanya dibuat sekali per sesi
+        self.folder_locks = {}
         
         # Authenticate Google
         if not self.google_service.authenticate():
             raise Exception("Failed to authenticate Google APIs")
+        
+        # Permission, delete dan rename Drive digabung ke batch request
+        if os.getenv('DRIVE_BATCH', 'true').lower() == 'true':
+            self.google_service.start_batcher(
+                max_batch=int(os.getenv('DRIVE_BATCH_SIZE', 50)),
+                max_delay_ms=int(os.getenv('DRIVE_BATCH_DELAY_MS', 50))
+            )
+        # Share parent folder sekali saja, folder dan foto baru mewarisi aksesnya
+        if os.getenv('DRIVE_SHARE_PARENT_ONLY', 'false').lower() == 'true':
+            self.google_service.share_parent_folder()
+        
+        # Pool folder Drive yang sudah dibuat dan di-share sebelumnya
+        self.google_service.start_folder_pool(
+            size=int(os.getenv('FOLDER_POOL_SIZE', 5)),
+            refill_per_minute=int(os.getenv('FOLDER_POOL_REFILL_PER_MIN', 30))
+        )
+        # Kalau True, folder dari pool baru di-rename saat laporan dikirim
+        self.defer_folder_naming = os.getenv('FOLDER_POOL_DEFER_NAMING', 'false').lower() == 'true'
+        
+        # Metrics
+        self.errors = metrics.counter('bot_errors_total', 'Errors reported to the application error handler')
+        self.reports = metrics.counter('bot_reports_total', 'Finished report sessions by outcome')
+        self.duplicates = metrics.counter('photo_duplicates_total', 'Resent photos that skipped upload by match and scope')
+        self.duplicate_bytes = metrics.counter('photo_duplicate_bytes_saved_total', 'Photo bytes not uploaded again because of dedupe')
+        metrics.gauge('bot_active_sessions', 'Report sessions currently in progress').set_function(
+            lambda: len(self.session_service.user_sessions)
+        )
+
+    def create_async_google_service(self):
+        """Pick the async Google backend: thread pool (default) or native httpx"""
+        backend = os.getenv('GOOGLE_ASYNC_BACKEND', 'executor').lower()
+        if backend == 'httpx':
+            return HttpxGoogleService(
+                self.google_service,
+                max_connections=int(os.getenv('GOOGLE_HTTP_MAX_CONNECTIONS', 100)),
+                http2=os.getenv('GOOGLE_HTTP2', 'true').lower() == 'true'
+            )
+        return AsyncGoogleService(
+            self.google_service,
+            max_workers=int(os.getenv('GOOGLE_EXECUTOR_WORKERS', 8)),
+            max_queued=int(os.getenv('GOOGLE_EXECUTOR_QUEUE', 32))
+        )
 
-    def delete_folder_if_exists(self, user_id):
+    def create_image_normalizer(self):
+        """Build the optional JPEG normalization stage from environment settings"""
+        if os.getenv('IMAGE_NORMALIZE', 'false').lower() != 'true':
+            return None
+        return ImageNormalizer(
+            max_size=int(os.getenv('IMAGE_MAX_SIZE', 2560)),
+            quality=int(os.getenv('IMAGE_QUALITY', 85)),
+            workers=int(os.getenv('IMAGE_WORKERS', 0)) or None
+        )
+
+    @staticmethod
+    def get_photo(message):
+        """Get the photo of a message: the largest PhotoSize or an image document"""
+        if message.photo:
+            return message.photo[-1]
+        return message.document
+
+    @staticmethod
+    def photo_extension(photo):
+        """File extension for a photo, image documents keep their own format"""
+        mime_type = getattr(photo, 'mime_type', None)
+        if mime_type and mime_type != 'image/jpeg':
+            return mimetypes.guess_extension(mime_type) or '.jpg'
+        return '.jpg'
+
+    async def delete_folder_if_exists(self, user_id):
         """Delete folder if session exists"""
         session = self.session_service.get_session(user_id)
         if session and session.get('folder_id'):
-            try:
-                self.google_service.service_drive.files().delete(fileId=session['folder_id']).execute()
+            if await self.async_google_service.delete_file_or_folder(session['folder_id']):
                 print(f"✅ Folder deleted for user {user_id}")
-            except Exception as e:
-                print(f"❌ Error deleting folder: {e}")
 
+    async def ensure_folder(self, user_id):
+        """Get the session's Drive folder, creating it on first use"""
+        lock = self.folder_locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            session = self.session_service.get_session(user_id)
+            if not session:
+                return None
+            if session.get('folder_id'):
+                return session['folder_id']
+            
+            # Folder baru dibuat saat foto pertama / kirim laporan, bukan saat input ID
+            folder_name = f"{session['report_type']}_{session['id_ticket']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            folder_id, needs_rename = await self.async_google_service.claim_folder(
+                folder_name, defer_naming=self.defer_folder_naming
+            )
+            if not folder_id:
+                return None
+            
+            self.session_service.update_session(user_id, {
+                'folder_id': folder_id,
+                'pending_folder_name': folder_name if needs_rename else None
+            })
+            if session.get('data'):
+                session['data']['folder_link'] = self.google_service.get_folder_link(folder_id)
+            return folder_id
+
+    def photo_status(self, bot, chat_id, session, new=False):
+        """Get the session's upload status message, edited in place for every photo"""
+        if new or not session.get('status_message'):
+            session['status_message'] = StatusMessage(bot, chat_id, min_interval=self.status_interval)
+        return session['status_message']
+
+    def photo_progress_text(self, session, note=None):
+        """Build the upload progress text shown in the status message"""
+        photos = session.get('photos', [])
+        uploaded = sum(1 for photo in photos if photo.get('id'))
+        
+        text = f"📷 Foto eviden: {len(photos)} foto\n✅ Terupload: {uploaded}\n"
+        if uploaded < len(photos):
+            text += f"⏳ Sedang diupload: {len(photos) - uploaded}\n"
+        if note:
+            text += f"\n{note}\n"
+        text += "\nKirim foto lain atau pilih 'Selesai Upload'"
+        return text
+
+    def queue_photo_upload(self, update, context, session, photo, filename):
+        """Reserve the photo in the session and transfer it in the background
+
+        Returns (total_photos, duplicate): kalau foto yang sama sudah ada di sesi
+        ini, duplicate berisi entry foto tersebut dan tidak ada yang diupload.
+        """
+        user_id = update.effective_user.id
+        chat_id = update.effective_chat.id
+        
+        # Foto yang dikirim ulang punya file_unique_id yang sama
+        existing, scope = self.session_service.find_photo(user_id, photo.file_unique_id)
+        if scope == 'session':
+            self.duplicates.inc(match='unique_id', scope=scope)
+            self.duplicate_bytes.inc(photo.file_size or 0)
+            return len(session['photos']), existing
+        
+        # Foto langsung masuk daftar (id None = masih diupload) agar penomoran tetap urut
+        entry = {'id': None, 'name': filename}
+        if 'photos' not in session:
+            session['photos'] = []
+        session['photos'].append(entry)
+        self.session_service.index_photo(user_id, photo.file_unique_id, entry)
+        
+        if scope == 'ticket':
+            # Sudah ada di laporan sebelumnya untuk ticket ini: salin di Drive, tanpa download/upload
+            self.duplicates.inc(match='unique_id', scope=scope)
+            self.duplicate_bytes.inc(photo.file_size or 0)
+            transfer = lambda: self.async_google_service.copy_file(existing['id'], filename, session['folder_id'])
+        else:
+            transfer = lambda: self.photo_service.transfer_photo(
+                context.bot, photo, user_id, filename, session['folder_id'],
+                dedupe=lambda digest, size: self.dedupe_photo_content(user_id, session, entry, digest, size)
+            )
+        
+        status = self.photo_status(context.bot, chat_id, session)
+        self.upload_queue.submit(
+            user_id,
+            self.upload_photo_background(context.bot, chat_id, user_id, session, entry, transfer, status)
+        )
+        return len(session['photos']), None
+
+    async def dedupe_photo_content(self, user_id, session, entry, digest, size):
+        """Skip the Drive upload when the downloaded content was already sent, returns a file ID"""
+        key = f"sha256:{digest}"
+        existing, scope = self.session_service.find_photo(user_id, key)
+        if existing is None:
+            self.session_service.index_photo(user_id, key, entry)
+            return None
+        if not existing.get('id'):
+            # Foto kembarannya masih diupload, upload biasa saja
+            return None
+        
+        self.duplicates.inc(match='hash', scope=scope)
+        self.duplicate_bytes.inc(size)
+        if scope == 'session':
+            entry['duplicate_of'] = existing['name']
+            return existing['id']
+        return await self.async_google_service.copy_file(existing['id'], entry['name'], session['folder_id'])
+
+    async def upload_photo_background(self, bot, chat_id, user_id, session, entry, transfer, status):
+        """Run one queued photo transfer and update the status message, telling the user when it fails"""
+        try:
+            file_id = await transfer()
+        except Exception as e:
+            print(f"Error uploading photo '{entry['name']}' in background: {e}")
+            file_id = None
+        
+        if file_id and not entry.get('duplicate_of'):
+            entry['id'] = file_id
+            await status.update(self.photo_progress_text(session), background=True)
+            return file_id
+        
+        # Hapus dari daftar; foto gagal harus dikirim ulang, foto duplikat cukup diberi tahu
+        photos = session.get('photos', [])
+        for i, photo in enumerate(photos):
+            if photo is entry:
+                del photos[i]
+                break
+        self.session_service.unindex_photo(user_id, entry)
+        
+        if entry.get('duplicate_of'):
+            note = f"⚠️ {entry['name']} sama dengan {entry['duplicate_of']}, tidak diupload ulang."
+            await status.update(self.photo_progress_text(session, note), background=True)
+            return file_id
+        
+        # Dicek send_report agar laporan tidak terkirim tanpa foto ini
+        session.setdefault('failed_photos', []).append(entry['name'])
+        
+        # Kegagalan dikirim sebagai pesan baru (edit tidak memunculkan notifikasi)
+        await status.update(self.photo_progress_text(session), background=True)
+        try:
+            await bot.send_message(
+                chat_id=chat_id,
+                text=f"❌ Gagal mengupload foto {entry['name']}. Silakan kirim ulang foto tersebut.",
+                rate_limit_args={'priority': PRIORITY_BACKGROUND}
+            )
+        except Exception as e:
+            print(f"Error notifying user {user_id} about photo {entry['name']}: {e}")
+        return file_id
+
+    @timed_handler
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Start command handler"""
         try:
@@ -50,6 +315,8 @@ class TelegramBot:
             username = update.effective_user.first_name or "User"
             
             # Clean up any existing session
+            self.album_collector.discard(user_id)
+            await self.upload_queue.cancel(user_id)
             self.session_service.end_session(user_id)
             
             # Buat sesi baru
@@ -76,6 +343,7 @@ class TelegramBot:
             )
             return ConversationHandler.END
 
+    @timed_handler
     async def select_report_type(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle report type selection"""
         try:
@@ -126,6 +394,7 @@ class TelegramBot:
             )
             return ConversationHandler.END
 
+    @timed_handler
     async def input_id(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle ID input"""
         try:
@@ -154,29 +423,15 @@ class TelegramBot:
                 )
                 return ConversationHandler.END
             
-            # Update session
+            # Update session (folder Drive dibuat nanti saat foto pertama / kirim laporan)
             self.session_service.update_session(user_id, {'id_ticket': ticket_id})
             
-            # Buat folder di Google Drive
-            folder_name = f"{session['report_type']}_{ticket_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            folder_id = self.google_service.create_folder(folder_name)
-            
-            if not folder_id:
-                await update.message.reply_text(
-                    "❌ Gagal membuat folder di Google Drive. Silakan coba lagi."
-                )
-                return INPUT_ID
-            
-            self.session_service.update_session(user_id, {'folder_id': folder_id})
-            
             # Kirim format pengisian
-            folder_link = self.google_service.get_folder_link(folder_id)
             report_format = (
-                f"✅ Folder berhasil dibuat!\n\n"
+                f"✅ ID Ticket tersimpan!\n\n"
                 f"📋 **Detail Laporan:**\n"
                 f"• Report Type: {session['report_type']}\n"
-                f"• ID Ticket: {ticket_id}\n"
-                f"• Folder Drive: {folder_link}\n\n"
+                f"• ID Ticket: {ticket_id}\n\n"
                 f"📝 **Format Laporan** (Salin dan isi):\n\n"
                 f"Customer Name: \n"
                 f"Service No: \n"
@@ -200,6 +455,7 @@ class TelegramBot:
             )
             return INPUT_ID
 
+    @timed_handler
     async def input_data(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle data input"""
         try:
@@ -286,6 +542,7 @@ class TelegramBot:
             )
             return INPUT_DATA
 
+    @timed_handler
     async def show_confirmation(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show confirmation screen"""
         try:
@@ -305,7 +562,8 @@ class TelegramBot:
             if session.get('photos') and len(session['photos']) > 0:
                 photo_info = f"\n📷 **Foto Eviden:** {len(session['photos'])} foto\n"
                 for i, photo in enumerate(session['photos'], 1):
-                    photo_info += f"   {i}. {photo['name']}\n"
+                    status = "" if photo.get('id') else " ⏳"
+                    photo_info += f"   {i}. {photo['name']}{status}\n"
             else:
                 photo_info = "\n📷 **Foto Eviden:** Belum ada foto\n"
             
@@ -324,13 +582,7 @@ class TelegramBot:
                 f"Pilih tindakan selanjutnya:"
             )
             
-            keyboard = [
-                [KeyboardButton("✅ Kirim Laporan"), KeyboardButton("📝 Edit Data")],
-                [KeyboardButton("📷 Upload Foto"), KeyboardButton("❌ Batalkan")]
-            ]
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
-            
-            await update.message.reply_text(confirmation_text, reply_markup=reply_markup)
+            await update.message.reply_text(confirmation_text, reply_markup=self.confirmation_markup())
             return CONFIRM_DATA
             
         except Exception as e:
@@ -340,6 +592,15 @@ class TelegramBot:
             )
             return ConversationHandler.END
 
+    def confirmation_markup(self):
+        """Keyboard with the report confirmation actions"""
+        keyboard = [
+            [KeyboardButton("✅ Kirim Laporan"), KeyboardButton("📝 Edit Data")],
+            [KeyboardButton("📷 Upload Foto"), KeyboardButton("❌ Batalkan")]
+        ]
+        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
+
+    @timed_handler
     async def confirm_data(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle data confirmation"""
         try:
@@ -381,6 +642,7 @@ class TelegramBot:
             )
             return CONFIRM_DATA
 
+    @timed_handler
     async def send_report(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Send report to spreadsheet"""
         try:
@@ -393,10 +655,51 @@ class TelegramBot:
                 )
                 return ConversationHandler.END
             
-            await update.message.reply_text("⏳ Mengirim laporan ke spreadsheet...")
+            # Satu pesan progres untuk seluruh proses kirim laporan
+            status = StatusMessage(context.bot, update.effective_chat.id, min_interval=self.status_interval)
+            await status.update("⏳ Mengirim laporan ke spreadsheet...")
+            
+            # Laporan tanpa foto: folder dibuat sekarang agar link tetap masuk ke sheet
+            if not await self.ensure_folder(user_id):
+                await status.update("❌ Gagal membuat folder di Google Drive. Silakan coba lagi.", force=True)
+                return CONFIRM_DATA
+            
+            # Tunggu semua foto sesi ini selesai diupload sebelum menulis ke sheet
+            await self.album_collector.flush(user_id)
+            pending = self.upload_queue.outstanding(user_id)
+            if pending:
+                await status.update(f"⏳ Menunggu {pending} foto selesai diupload...", force=True)
+                still_running = await self.upload_queue.wait(user_id, timeout=self.upload_barrier_timeout)
+                if still_running:
+                    # Jangan tahan lane dispatcher, user mengirim ulang setelah upload selesai
+                    await status.update(f"⏳ Masih ada {still_running} foto yang sedang diupload.", force=True)
+                    await update.message.reply_text(
+                        "Laporan belum dikirim. Pilih '✅ Kirim Laporan' lagi setelah semua foto "
+                        "terupload (lihat pesan status upload foto).",
+                        reply_markup=self.confirmation_markup()
+                    )
+                    return CONFIRM_DATA
+                await status.update("⏳ Mengirim laporan ke spreadsheet...", force=True)
+            
+            # Foto yang gagal diupload: jangan kirim laporan tanpa sepengetahuan user
+            failed = session.pop('failed_photos', None)
+            if failed:
+                await status.update(f"❌ {len(failed)} foto gagal diupload.", force=True)
+                await update.message.reply_text(
+                    f"❌ Foto berikut gagal diupload: {', '.join(failed)}\n\n"
+                    "Pilih '📷 Upload Foto' untuk mengirim ulang, atau '✅ Kirim Laporan' "
+                    "lagi untuk mengirim laporan tanpa foto tersebut.",
+                    reply_markup=self.confirmation_markup()
+                )
+                return CONFIRM_DATA
+            
+            # Beri nama folder dari pool yang penamaannya ditunda
+            if session.get('pending_folder_name'):
+                if await self.async_google_service.rename_file(session['folder_id'], session['pending_folder_name']):
+                    session['pending_folder_name'] = None
             
             # Kirim ke spreadsheet
-            success = self.google_service.update_spreadsheet(
+            success = await self.async_google_service.update_spreadsheet(
                 self.spreadsheet_id,
                 self.spreadsheet_config,
                 session['data']
@@ -415,14 +718,19 @@ class TelegramBot:
                     success_message,
                     reply_markup=ReplyKeyboardMarkup([[KeyboardButton("/start")]], resize_keyboard=True)
                 )
+                self.reports.inc(status='sent')
+                # Foto laporan ini bisa dipakai ulang oleh laporan berikutnya untuk ticket yang sama
+                self.session_service.remember_report(user_id)
             else:
                 await update.message.reply_text(
                     "❌ **Gagal mengirim laporan ke spreadsheet.**\n"
                     "Silakan coba lagi atau hubungi admin.",
                     reply_markup=ReplyKeyboardMarkup([[KeyboardButton("/start")]], resize_keyboard=True)
                 )
+                self.reports.inc(status='failed')
             
             self.session_service.end_session(user_id)
+            self.folder_locks.pop(user_id, None)
             return ConversationHandler.END
             
         except Exception as e:
@@ -432,6 +740,7 @@ class TelegramBot:
             )
             return CONFIRM_DATA
 
+    @timed_handler
     async def edit_data(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Edit report data"""
         try:
@@ -450,7 +759,7 @@ class TelegramBot:
                 f"📝 **EDIT DATA LAPORAN**\n\n"
                 f"📋 Report Type: {report_data['report_type']}\n"
                 f"🎫 ID Ticket: {report_data['id_ticket']}\n"
-                f"📁 Folder Drive: {report_data['folder_link']}\n\n"
+                f"📁 Folder Drive: {report_data['folder_link'] or 'Dibuat saat upload foto / kirim laporan'}\n\n"
                 f"📝 **Salin format di bawah dan edit sesuai kebutuhan:**\n\n"
                 f"Customer Name: {report_data['customer_name']}\n"
                 f"Service No: {report_data['service_no']}\n"
@@ -474,9 +783,17 @@ class TelegramBot:
             )
             return CONFIRM_DATA
 
+    @timed_handler
     async def start_photo_upload(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Start photo upload process"""
         try:
+            # Batch upload baru mendapat pesan status baru di bawah menu
+            session = self.session_service.get_session(update.effective_user.id)
+            if session:
+                session.pop('status_message', None)
+                # Foto yang gagal akan dikirim ulang di batch ini
+                session.pop('failed_photos', None)
+            
             keyboard = [
                 [KeyboardButton("📸 Upload Satu-Satu (Custom Nama)")],
                 [KeyboardButton("📷 Upload Banyak (Auto Nama)")],
@@ -498,6 +815,7 @@ class TelegramBot:
             print(f"Error in start_photo_upload: {e}")
             return await self.show_confirmation(update, context)
 
+    @timed_handler
     async def upload_photo(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle photo upload process"""
         try:
@@ -538,6 +856,8 @@ class TelegramBot:
                 return UPLOAD_PHOTO
             
             elif message_text == "✅ Selesai Upload":
+                # Album yang masih dikumpulkan ikut masuk daftar foto
+                await self.album_collector.flush(user_id)
                 # Reset upload mode
                 if 'upload_mode' in context.user_data:
                     del context.user_data['upload_mode']
@@ -550,7 +870,7 @@ class TelegramBot:
                 return await self.cancel_report(update, context)
             
             # Handle photo upload
-            elif update.message.photo:
+            elif update.message.photo or update.message.document:
                 return await self.process_photo(update, context)
             
             else:
@@ -566,6 +886,7 @@ class TelegramBot:
             )
             return UPLOAD_PHOTO
 
+    @timed_handler
     async def process_photo(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Process uploaded photo"""
         try:
@@ -574,7 +895,7 @@ class TelegramBot:
             
             if upload_mode == 'single':
                 # Store photo for description input
-                photo = update.message.photo[-1]
+                photo = self.get_photo(update.message)
                 context.user_data['temp_photo'] = photo
                 
                 keyboard = [[KeyboardButton("❌ Batalkan")]]
@@ -598,61 +919,50 @@ class TelegramBot:
             )
             return UPLOAD_PHOTO
 
+    @timed_handler
     async def save_photo_auto(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Save photo with automatic naming"""
         try:
             user_id = update.effective_user.id
             session = self.session_service.get_session(user_id)
             
-            if not session or not session.get('folder_id'):
+            if not session:
                 await update.message.reply_text(
                     "❌ Session tidak valid. Silakan mulai ulang."
                 )
                 return ConversationHandler.END
             
-            photo = update.message.photo[-1]
-            file = await context.bot.get_file(photo.file_id)
+            # Bagian album dikumpulkan dulu, dibalas sekali lewat save_album
+            if update.message.media_group_id:
+                self.album_collector.add(
+                    user_id, update.message.media_group_id, update.message.message_id, (update, context)
+                )
+                return UPLOAD_PHOTO
+            
+            # Folder Drive dibuat saat foto pertama diterima
+            if not await self.ensure_folder(user_id):
+                await update.message.reply_text(
+                    "❌ Gagal membuat folder di Google Drive. Silakan coba lagi."
+                )
+                return UPLOAD_PHOTO
+            
+            photo = self.get_photo(update.message)
             
             # Generate automatic filename
             photo_count = len(session.get('photos', [])) + 1
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"foto_{photo_count}_{timestamp}.jpg"
-            filepath = f"temp_{filename}"
-            
-            await update.message.reply_text("⏳ Mengupload foto...")
-            await file.download_to_drive(filepath)
-            
-            file_id = self.google_service.upload_to_drive(filepath, filename, session['folder_id'])
-            
-            # Cleanup temp file
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            
-            if file_id:
-                # Add to photo list
-                if 'photos' not in session:
-                    session['photos'] = []
-                session['photos'].append({
-                    'id': file_id,
-                    'name': filename
-                })
-                
-                keyboard = [
-                    [KeyboardButton("✅ Selesai Upload"), KeyboardButton("❌ Batalkan")]
-                ]
-                reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-                
-                await update.message.reply_text(
-                    f"✅ **Foto berhasil diupload!**\n"
-                    f"📄 Nama file: {filename}\n"
-                    f"📷 Total foto: {len(session['photos'])}\n\n"
-                    f"Kirim foto lain atau pilih 'Selesai Upload'",
-                    reply_markup=reply_markup
-                )
+            filename = f"foto_{photo_count}_{timestamp}{self.photo_extension(photo)}"
+            
+            # Upload berjalan di background, user bisa langsung kirim foto berikutnya
+            _, duplicate = self.queue_photo_upload(update, context, session, photo, filename)
+            
+            # Satu pesan status per sesi, diedit untuk setiap foto
+            if duplicate:
+                note = f"⚠️ Foto ini sudah diupload sebagai {duplicate['name']}, tidak diupload ulang."
             else:
-                await update.message.reply_text(
-                    "❌ Gagal mengupload foto. Silakan coba lagi."
-                )
+                note = f"📥 {filename} diterima"
+            status = self.photo_status(context.bot, update.effective_chat.id, session)
+            await status.update(self.photo_progress_text(session, note))
             
             return UPLOAD_PHOTO
             
@@ -663,6 +973,42 @@ class TelegramBot:
             )
             return UPLOAD_PHOTO
 
+    async def save_album(self, user_id, parts):
+        """Queue every photo of a collected album and send one summary reply"""
+        session = self.session_service.get_session(user_id)
+        if not session:
+            return
+        
+        update, context = parts[0]
+        if not await self.ensure_folder(user_id):
+            await update.message.reply_text(
+                "❌ Gagal membuat folder di Google Drive. Silakan kirim ulang album."
+            )
+            return
+        
+        # Nomor foto mengikuti urutan message_id, bukan urutan update diterima
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filenames = []
+        skipped = 0
+        for part_update, part_context in parts:
+            photo = self.get_photo(part_update.message)
+            photo_count = len(session.get('photos', [])) + 1
+            filename = f"foto_{photo_count}_{timestamp}{self.photo_extension(photo)}"
+            _, duplicate = self.queue_photo_upload(part_update, part_context, session, photo, filename)
+            if duplicate:
+                skipped += 1
+            else:
+                filenames.append(filename)
+        
+        note = f"📥 {len(filenames)} foto album diterima"
+        if filenames:
+            note += f" ({filenames[0]} s/d {filenames[-1]})"
+        if skipped:
+            note += f"\n⚠️ {skipped} foto sudah pernah diupload, dilewati."
+        status = self.photo_status(context.bot, update.effective_chat.id, session)
+        await status.update(self.photo_progress_text(session, note))
+
+    @timed_handler
     async def input_photo_desc(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle photo description input"""
         try:
@@ -685,51 +1031,37 @@ class TelegramBot:
             session = self.session_service.get_session(user_id)
             temp_photo = context.user_data.get('temp_photo')
             
+            # Folder Drive dibuat saat foto pertama diterima
+            if temp_photo and session and not await self.ensure_folder(user_id):
+                await update.message.reply_text(
+                    "❌ Gagal membuat folder di Google Drive. Silakan coba lagi."
+                )
+                return INPUT_PHOTO_DESC
+            
             if temp_photo and session and session.get('folder_id'):
                 try:
-                    file = await context.bot.get_file(temp_photo.file_id)
-                    
                     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    filename = f"{clean_desc}_{timestamp}.jpg"
-                    filepath = f"temp_{filename}"
+                    filename = f"{clean_desc}_{timestamp}{self.photo_extension(temp_photo)}"
                     
-                    await update.message.reply_text("⏳ Mengupload foto...")
-                    await file.download_to_drive(filepath)
+                    # Prompt nama foto memotong chat, jadi status baru dikirim (dengan keyboard upload)
+                    status = self.photo_status(context.bot, update.effective_chat.id, session, new=True)
                     
-                    file_id = self.google_service.upload_to_drive(filepath, filename, session['folder_id'])
+                    # Upload berjalan di background, user bisa langsung kirim foto berikutnya
+                    _, duplicate = self.queue_photo_upload(update, context, session, temp_photo, filename)
                     
-                    # Cleanup temp file
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
+                    keyboard = [
+                        [KeyboardButton("✅ Selesai Upload"), KeyboardButton("❌ Batalkan")]
+                    ]
+                    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
                     
-                    if file_id:
-                        # Add to photo list
-                        if 'photos' not in session:
-                            session['photos'] = []
-                        session['photos'].append({
-                            'id': file_id,
-                            'name': filename
-                        })
-                        
-                        keyboard = [
-                            [KeyboardButton("✅ Selesai Upload"), KeyboardButton("❌ Batalkan")]
-                        ]
-                        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-                        
-                        await update.message.reply_text(
-                            f"✅ **Foto berhasil diupload!**\n"
-                            f"📄 Nama file: {filename}\n"
-                            f"📷 Total foto: {len(session['photos'])}\n\n"
-                            f"Kirim foto lain atau pilih 'Selesai Upload'",
-                            reply_markup=reply_markup
-                        )
+                    if duplicate:
+                        note = f"⚠️ Foto ini sudah diupload sebagai {duplicate['name']}, tidak diupload ulang."
                     else:
-                        await update.message.reply_text(
-                            "❌ Gagal mengupload foto. Silakan coba lagi."
-                        )
+                        note = f"📥 {filename} diterima"
+                    await status.update(self.photo_progress_text(session, note), reply_markup=reply_markup)
                         
                 except Exception as e:
-                    print(f"Error uploading photo with custom name: {e}")
+                    print(f"Error queueing photo with custom name: {e}")
                     await update.message.reply_text(
                         "❌ Terjadi kesalahan saat mengupload foto."
                     )
@@ -747,16 +1079,21 @@ class TelegramBot:
             )
             return INPUT_PHOTO_DESC
 
+    @timed_handler
     async def cancel_report(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Cancel current report and cleanup"""
         try:
             user_id = update.effective_user.id
             
-            # Delete folder if exists
-            self.delete_folder_if_exists(user_id)
+            # Hentikan upload foto yang masih berjalan, lalu hapus folder
+            self.album_collector.discard(user_id)
+            await self.upload_queue.cancel(user_id)
+            await self.delete_folder_if_exists(user_id)
             
             # End session
             self.session_service.end_session(user_id)
+            self.folder_locks.pop(user_id, None)
+            self.reports.inc(status='cancelled')
             
             # Clear context data
             context.user_data.clear()
@@ -777,6 +1114,7 @@ class TelegramBot:
             )
             return ConversationHandler.END
 
+    @timed_handler
     async def fallback_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Fallback handler for unexpected messages"""
         try:
@@ -831,6 +1169,11 @@ class TelegramBot:
                     MessageHandler(
                         filters.PHOTO,
                         self.upload_photo
+                    ),
+                    # Foto yang dikirim sebagai file (tanpa kompresi Telegram)
+                    MessageHandler(
+                        filters.Document.IMAGE,
+                        self.upload_photo
                     )
                 ],
                 INPUT_PHOTO_DESC: [
@@ -846,16 +1189,23 @@ class TelegramBot:
             ],
             allow_reentry=True,
             name="report_conversation",
-            persistent=False
+            # State percakapan disimpan kalau Application punya persistence (webhook runtime)
+            persistent=application.persistence is not None
         )
         
         # Add handlers
+        self.conv_handler = conv_handler
         application.add_handler(conv_handler)
         
         # Add error handler
         async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
             """Log errors caused by Updates."""
             print(f"Exception while handling an update: {context.error}")
+            self.errors.inc(error=type(context.error).__name__)
+            
+            # Flood control yang tetap gagal setelah retry: jangan tambah pesan lagi
+            if isinstance(context.error, RetryAfter):
+                return
             
             # Try to send error message to user if update is available
             if isinstance(update, Update) and update.effective_message:
@@ -869,12 +1219,28 @@ class TelegramBot:
         application.add_error_handler(error_handler)
         print("✅ Bot handlers setup complete!")
 
+    def get_allowed_updates(self):
+        """Get update types handled by the registered conversation handlers"""
+        if not self.conv_handler:
+            return [Update.MESSAGE]
+        
+        handlers = list(self.conv_handler.entry_points) + list(self.conv_handler.fallbacks)
+        for state_handlers in self.conv_handler.states.values():
+            handlers.extend(state_handlers)
+        
+        allowed_updates = []
+        for handler in handlers:
+            update_type = HANDLER_UPDATE_TYPES.get(type(handler))
+            if update_type and update_type not in allowed_updates:
+                allowed_updates.append(update_type)
+        return allowed_updates
+
     # Method for local testing (optional)
     def run_polling(self):
         """Run the bot with polling (for local testing only)"""
         print("🤖 Starting Telegram Bot with polling...")
         
-        application = Application.builder().token(self.token).build()
+        application = Application.builder().token(self.token).rate_limiter(TelegramRateLimiter()).build()
         self.setup_handlers(application)
         
         print("🤖 Bot is running... Press Ctrl+C to stop")
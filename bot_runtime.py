@@ -0,0 +1,537 @@
+import os
+import asyncio
+import logging
+import time
+import traceback
+from datetime import datetime
+from telegram import Update
+from telegram.ext import Application, PicklePersistence
+
+# Import bot class
+from bot import TelegramBot
+from services.update_dispatcher import UpdateDispatcher
+from services.update_filter import RecentUpdateIds, UpdatePreFilter
+from services.update_journal import UpdateJournal
+from services.metrics import metrics
+from services.rate_limiter import TelegramRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Antrian update webhook: ukuran maksimum dan jumlah lane paralel
+# (update dari satu user selalu diproses berurutan di lane yang sama)
+UPDATE_QUEUE_SIZE = int(os.getenv('UPDATE_QUEUE_SIZE', 1000))
+UPDATE_LANES = int(os.getenv('UPDATE_LANES', 8))
+
+# Jendela update_id terakhir untuk membuang redelivery dari Telegram
+UPDATE_DEDUP_WINDOW = int(os.getenv('UPDATE_DEDUP_WINDOW', 2048))
+
+# Journal update yang diterima (kosongkan path untuk menonaktifkan)
+UPDATE_JOURNAL_PATH = os.getenv('UPDATE_JOURNAL_PATH', 'webhook_journal.jsonl')
+JOURNAL_FLUSH_MS = int(os.getenv('JOURNAL_FLUSH_MS', 20))
+
+# State percakapan + sesi laporan yang bertahan saat restart (kosongkan path untuk menonaktifkan)
+BOT_STATE_PATH = os.getenv('BOT_STATE_PATH', 'bot_state.pickle')
+BOT_STATE_FLUSH_MS = int(os.getenv('BOT_STATE_FLUSH_MS', 500))
+
+# Job update_persistence bawaan PTB praktis dimatikan: state hanya boleh disimpan
+# oleh persist_state() bersama daftar update yang tercakup di dalamnya
+PTB_PERSISTENCE_INTERVAL = 24 * 60 * 60
+
+# Batas kirim pesan ke Telegram (global per detik, per chat pribadi per detik, per grup per menit)
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+TELEGRAM_GROUP_RATE_PER_MIN = float(os.getenv('TELEGRAM_GROUP_RATE_PER_MIN', 20))
+
+# Batas waktu drain saat SIGTERM (Railway memberi jeda sebelum SIGKILL)
+SHUTDOWN_DEADLINE = float(os.getenv('SHUTDOWN_DEADLINE', 20))
+
+class BotRuntime:
+    def __init__(self):
+        """Bot application plus the webhook update pipeline
+
+        Dipakai bersama oleh server Flask (webhook_server.py) dan server ASGI
+        (asgi_server.py). Semua coroutine di sini harus jalan di loop yang sama
+        dengan loop tempat initialize() dipanggil.
+        """
+        self.telegram_bot = None
+        self.application = None
+        self.dispatcher = None
+        self.prefilter = None
+        self.recent_update_ids = RecentUpdateIds(UPDATE_DEDUP_WINDOW)
+        self.journal = UpdateJournal(UPDATE_JOURNAL_PATH, JOURNAL_FLUSH_MS) if UPDATE_JOURNAL_PATH else None
+        self.shutting_down = False
+
+        # Update yang sudah diproses tapi state-nya belum tersimpan ke BOT_STATE_PATH
+        self._processed = []
+        self._settling = set()
+        # Salinan sesi user sebelum update yang sedang diproses dimulai
+        self._in_flight = {}
+        # Update yang sudah tersimpan di state tapi marker journal-nya belum tentu di disk
+        self._unsynced = []
+        self._state_task = None
+
+        self.state_flush_seconds = metrics.histogram(
+            'bot_state_flush_seconds', 'Time to save conversation and session state'
+        )
+        self.webhook_seconds = metrics.histogram(
+            'webhook_request_seconds', 'Time spent handling a /webhook request'
+        )
+
+    @property
+    def ready(self):
+        """Check whether the webhook pipeline can accept updates"""
+        return bool(self.application and self.dispatcher and self.prefilter)
+
+    async def initialize(self):
+        """Initialize the telegram bot"""
+        started = time.perf_counter()
+        try:
+            # Konfigurasi
+            BOT_TOKEN = os.getenv('BOT_TOKEN')
+            SPREADSHEET_ID = os.getenv('SPREADSHEET_ID')
+
+            if not BOT_TOKEN:
+                raise Exception("BOT_TOKEN environment variable is required!")
+            if not SPREADSHEET_ID:
+                raise Exception("SPREADSHEET_ID environment variable is required!")
+
+            logger.info("Initializing Telegram Bot...")
+            logger.info(f"Bot Token: {'*' * (len(BOT_TOKEN) - 10)}{BOT_TOKEN[-10:]}")
+            logger.info(f"Spreadsheet ID: {SPREADSHEET_ID}")
+
+            # Create bot instance
+            self.telegram_bot = TelegramBot(BOT_TOKEN, SPREADSHEET_ID)
+            logger.info(f"✅ TelegramBot instance created ({(time.perf_counter() - started) * 1000:.0f}ms)")
+
+            # Create application for webhook. Lane dispatcher memanggil
+            # process_update langsung, jadi paralelisme dan urutan per user diatur
+            # di sana; update processor PTB hanya dipakai untuk polling.
+            builder = Application.builder().token(BOT_TOKEN)
+            if BOT_STATE_PATH:
+                # Disimpan oleh persist_state(), bukan per perubahan
+                builder = builder.persistence(PicklePersistence(
+                    BOT_STATE_PATH, on_flush=True, update_interval=PTB_PERSISTENCE_INTERVAL
+                ))
+            self.application = (
+                builder
+                .rate_limiter(TelegramRateLimiter(
+                    global_rate=TELEGRAM_GLOBAL_RATE,
+                    private_chat_rate=TELEGRAM_CHAT_RATE,
+                    group_chat_rate=TELEGRAM_GROUP_RATE_PER_MIN / 60
+                ))
+                .build()
+            )
+            logger.info("✅ Application instance created")
+
+            # Handler didaftarkan sebelum initialize() agar state percakapan dimuat dari persistence
+            self.telegram_bot.setup_handlers(self.application)
+            logger.info("✅ Handlers setup complete")
+
+            # IMPORTANT: Initialize the application properly
+            await self.application.initialize()
+            logger.info("✅ Application initialized")
+
+            if self.application.persistence:
+                restored = self.telegram_bot.session_service.restore(self.application.bot_data.get('sessions'))
+                logger.info(f"✅ Restored {restored} report session(s) from {BOT_STATE_PATH}")
+
+            await self.application.start()
+            logger.info("✅ Application started")
+
+            # Pre-filter update mentah sesuai handler yang terdaftar
+            self.prefilter = UpdatePreFilter(self.telegram_bot.get_allowed_updates())
+            logger.info(f"✅ Update pre-filter allows: {self.prefilter.allowed_updates}")
+
+            # Start dispatcher lane yang mengosongkan antrian update webhook
+            self.dispatcher = UpdateDispatcher(
+                self.process_update_json,
+                max_queue_size=UPDATE_QUEUE_SIZE,
+                lanes=UPDATE_LANES
+            )
+            await self.dispatcher.start()
+            logger.info("✅ Update dispatcher started")
+
+            if self.application.persistence:
+                self._state_task = asyncio.get_running_loop().create_task(self._persist_loop(), name="bot-state")
+
+            # Proses ulang update yang belum selesai sebelum proses terakhir mati
+            if self.journal:
+                self.replay_journal()
+
+            startup_seconds = time.perf_counter() - started
+            metrics.gauge('bot_startup_seconds', 'Time from initialize() to a bot ready for updates').set(startup_seconds)
+            logger.info(f"🤖 Bot initialized and started successfully in {startup_seconds:.2f}s!")
+            return self.telegram_bot, self.application
+
+        except Exception as e:
+            logger.error(f"❌ Failed to initialize bot: {e}")
+            logger.error(traceback.format_exc())
+            raise
+
+    async def shutdown(self, deadline=SHUTDOWN_DEADLINE):
+        """Stop accepting updates, drain in-flight work within the deadline and stop the bot"""
+        if self.shutting_down:
+            return
+        self.shutting_down = True
+        started = time.monotonic()
+        logger.info(f"🛑 Shutting down, draining updates (deadline {deadline:.0f}s)...")
+
+        abandoned_updates = 0
+        abandoned_uploads = 0
+        abandoned_writes = 0
+        try:
+            # Tunggu antrian dan update yang sedang diproses selesai
+            if self.dispatcher:
+                abandoned_updates = await self.dispatcher.drain(deadline)
+
+            # Tunggu upload foto background, lalu upload Drive / append spreadsheet yang masih berjalan
+            if self.telegram_bot:
+                remaining = deadline - (time.monotonic() - started)
+                abandoned_uploads = await self.telegram_bot.upload_queue.drain(remaining)
+                if self._settling:
+                    await asyncio.wait(list(self._settling), timeout=max(0, deadline - (time.monotonic() - started)))
+                remaining = deadline - (time.monotonic() - started)
+                abandoned_writes = await asyncio.get_running_loop().run_in_executor(
+                    None, self.telegram_bot.google_service.wait_idle, remaining
+                )
+                self.telegram_bot.async_google_service.shutdown(wait=False)
+                await self.telegram_bot.async_google_service.close()
+                self.telegram_bot.google_service.stop_folder_pool()
+                # Kirim permission/delete yang masih menunggu di batch
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.telegram_bot.google_service.stop_batcher
+                )
+                await self.telegram_bot.photo_service.close()
+
+            # Simpan state terakhir lalu marker update yang sudah tercakup di dalamnya
+            if self._state_task:
+                self._state_task.cancel()
+            if self.application and self.application.persistence:
+                await self.persist_state()
+
+            # Update yang belum selesai tetap tanpa marker di journal dan di-replay saat start
+            if self.journal:
+                self.journal.close()
+
+            if self.application:
+                await self.application.stop()
+                await self.application.shutdown()
+
+        except Exception as e:
+            logger.error(f"❌ Error during shutdown: {e}")
+            logger.error(traceback.format_exc())
+
+        logger.info(
+            f"🛑 Drain finished in {time.monotonic() - started:.2f}s: "
+            f"{abandoned_updates} update(s) left for replay, "
+            f"{abandoned_uploads} photo upload(s) abandoned, "
+            f"{abandoned_writes} Google write(s) abandoned"
+        )
+
+    def replay_journal(self):
+        """Resubmit journaled updates that never got a completion marker, in order
+
+        Update yang tercatat di applied_updates state tersimpan sudah
+        tercakup di state itu (marker-nya belum sempat tertulis saat proses
+        mati), jadi hanya ditandai selesai dan tidak diproses ulang.
+        """
+        applied = set(self.application.bot_data.get('applied_updates', ())) if self.application.persistence else set()
+        unfinished = []
+        for json_data in self.journal.open():
+            if json_data['update_id'] in applied:
+                self.journal.mark_done(json_data['update_id'])
+            else:
+                unfinished.append(json_data)
+
+        for json_data in unfinished:
+            self.recent_update_ids.add_if_new(json_data['update_id'])
+            if not self.dispatcher.submit(json_data):
+                # Tetap tercatat di journal, akan dicoba lagi saat restart berikutnya
+                logger.warning(f"Update queue full, could not replay update {json_data['update_id']}")
+
+        if unfinished:
+            logger.info(f"♻️ Replayed {len(unfinished)} unfinished update(s) from journal")
+
+    async def process_update_json(self, json_data):
+        """Deserialize a queued raw update and run it through the handlers"""
+        user_id = None
+        try:
+            update = Update.de_json(json_data, self.application.bot)
+
+            if not update:
+                logger.warning("Failed to create Update object from JSON")
+            else:
+                if self.application.persistence and update.effective_user:
+                    # State yang disimpan selagi handler berjalan memakai sesi sebelum update ini
+                    user_id = update.effective_user.id
+                    self._in_flight[user_id] = self.telegram_bot.session_service.snapshot_session(user_id)
+                await self.application.process_update(update)
+        except asyncio.CancelledError:
+            # Dibatalkan di tengah jalan: tanpa marker agar di-replay saat start
+            # berikutnya, dan sesi sebelum update ini tetap yang disimpan
+            user_id = None
+            raise
+        except Exception:
+            # Update yang gagal tidak diulang saat replay
+            self.mark_update_done(json_data)
+            raise
+        finally:
+            if user_id is not None:
+                self._in_flight.pop(user_id, None)
+
+        self.finish_update(update, json_data)
+
+    def finish_update(self, update, json_data):
+        """Mark a processed update done once the state it produced has been saved
+
+        Tanpa persistence marker langsung ditulis. Dengan persistence, update
+        ikut persist_state() berikutnya. Foto album yang masih dikumpulkan
+        belum ada di sesi, jadi update-nya menunggu album user itu selesai
+        diproses. Crash sebelum itu membuat update di-replay terhadap state
+        terakhir yang tersimpan.
+        """
+        if not self.application.persistence:
+            self.mark_update_done(json_data)
+            return
+
+        user = update.effective_user if update else None
+        if user and self.telegram_bot.album_collector.pending(user.id):
+            task = asyncio.get_running_loop().create_task(self._finish_after_album(user.id, json_data))
+            self._settling.add(task)
+            task.add_done_callback(self._settling.discard)
+        else:
+            self._processed.append(json_data['update_id'])
+
+    async def _finish_after_album(self, user_id, json_data):
+        await self.telegram_bot.album_collector.settled(user_id)
+        self._processed.append(json_data['update_id'])
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(BOT_STATE_FLUSH_MS / 1000)
+            if not self._processed:
+                continue
+            try:
+                await self.persist_state()
+            except Exception as e:
+                logger.error(f"❌ Could not save bot state: {e}")
+
+    async def persist_state(self):
+        """Save conversation and session state with the updates it covers, then mark them done
+
+        Daftar update (applied_updates), sesi dan state percakapan diambil
+        dalam satu langkah event loop: update_persistence() membaca bot_data
+        dan state percakapan sebelum await pertamanya. Sesi user yang
+        updatenya masih diproses diganti salinan dari sebelum update itu
+        mulai, sedangkan state percakapannya baru berubah saat handler
+        selesai. Update yang masih berjalan tidak tercakup dan di-replay
+        setelah crash.
+        """
+        started = time.perf_counter()
+        update_ids, self._processed = self._processed, []
+        applied = self._unsynced + update_ids
+        try:
+            bot_data = self.application.bot_data
+            bot_data['sessions'] = self.telegram_bot.session_service.snapshot(self._in_flight)
+            bot_data['applied_updates'] = applied
+            await self.application.update_persistence()
+            await self.application.persistence.flush()
+        except Exception:
+            # Dicoba lagi di flush berikutnya
+            self._processed = update_ids + self._processed
+            raise
+        self.state_flush_seconds.observe(time.perf_counter() - started)
+
+        if self.journal:
+            for update_id in update_ids:
+                self.journal.mark_done(update_id)
+            # Setelah marker tersimpan di disk, state berikutnya tidak perlu membawanya lagi
+            self._unsynced = applied
+            await asyncio.get_running_loop().run_in_executor(None, self.journal.flush)
+            self._unsynced = []
+
+    def mark_update_done(self, json_data):
+        """Write the journal completion marker for an update"""
+        if self.journal:
+            self.journal.mark_done(json_data['update_id'])
+
+    def accept_update(self, json_data):
+        """Validate, filter and enqueue a raw webhook update, returns (payload, status)"""
+        started = time.perf_counter()
+        payload, status = self._accept_update(json_data)
+        self.webhook_seconds.observe(time.perf_counter() - started, status=status)
+        return payload, status
+
+    def _accept_update(self, json_data):
+        if not self.ready:
+            logger.error("Bot application is not initialized")
+            return {
+                "status": "error",
+                "message": "Bot application is not initialized"
+            }, 500
+
+        if self.shutting_down:
+            return {
+                "status": "error",
+                "message": "Server is shutting down"
+            }, 503
+
+        if not json_data:
+            logger.warning("No JSON data received")
+            return {
+                "status": "error",
+                "message": "No JSON data received"
+            }, 400
+
+        # Validasi minimal sebelum masuk antrian
+        if not isinstance(json_data, dict) or not isinstance(json_data.get('update_id'), int):
+            logger.warning("Invalid update data received")
+            return {
+                "status": "error",
+                "message": "Invalid update data"
+            }, 400
+
+        # Buang update yang tidak akan ditangani handler mana pun
+        if not self.prefilter.accepts(json_data):
+            logger.info(f"Ignoring unhandled update: {list(json_data.keys())}")
+            return {"status": "ok", "message": "Update ignored"}, 200
+
+        # Log incoming update (but not the full data for privacy)
+        if 'message' in json_data:
+            user_id = json_data.get('message', {}).get('from', {}).get('id', 'unknown')
+            message_type = 'text' if json_data.get('message', {}).get('text') else 'other'
+            logger.info(f"Received {message_type} message from user {user_id}")
+        else:
+            logger.info(f"Received update: {list(json_data.keys())}")
+
+        # Buang update yang sudah pernah diterima (redelivery)
+        update_id = json_data['update_id']
+        if not self.recent_update_ids.add_if_new(update_id):
+            logger.info(f"Dropping duplicate update {update_id}")
+            return {"status": "ok", "message": "Duplicate update"}, 200
+
+        # Catat di journal sebelum diproses agar bisa di-replay setelah crash
+        if self.journal:
+            self.journal.append_update(json_data)
+
+        # Masukkan ke antrian dan langsung balas Telegram
+        if not self.dispatcher.submit(json_data):
+            logger.warning(f"Update queue full, rejecting update {update_id}")
+            self.recent_update_ids.forget(update_id)
+            self.mark_update_done(json_data)
+
+            # Return 503 so Telegram redelivers the update later
+            return {
+                "status": "error",
+                "message": "Update queue is full"
+            }, 503
+
+        return {"status": "ok"}, 200
+
+    async def set_webhook(self, json_data):
+        """Set webhook URL for Telegram bot, returns (payload, status)"""
+        if not json_data:
+            return {
+                "status": "error",
+                "message": "JSON data with webhook_url is required"
+            }, 400
+
+        webhook_url = json_data.get('webhook_url')
+        if not webhook_url:
+            return {
+                "status": "error",
+                "message": "webhook_url field is required"
+            }, 400
+
+        # Ensure webhook_url ends with the correct path
+        if not webhook_url.endswith('/webhook'):
+            webhook_url = webhook_url.rstrip('/') + '/webhook'
+
+        logger.info(f"Setting webhook to: {webhook_url}")
+
+        # Set webhook, hanya untuk jenis update yang ditangani handler
+        allowed_updates = self.telegram_bot.get_allowed_updates()
+        result = await self.application.bot.set_webhook(
+            url=webhook_url,
+            allowed_updates=allowed_updates
+        )
+
+        if result:
+            logger.info(f"✅ Webhook successfully set to {webhook_url}")
+            return {
+                "status": "ok",
+                "message": f"Webhook set to {webhook_url}",
+                "allowed_updates": allowed_updates,
+                "timestamp": datetime.now().isoformat()
+            }, 200
+        else:
+            logger.error("Failed to set webhook")
+            return {
+                "status": "error",
+                "message": "Failed to set webhook"
+            }, 500
+
+    async def get_webhook_info(self):
+        """Get current webhook info, returns (payload, status)"""
+        info = await self.application.bot.get_webhook_info()
+
+        return {
+            "status": "ok",
+            "webhook_info": {
+                "url": info.url,
+                "has_custom_certificate": info.has_custom_certificate,
+                "pending_update_count": info.pending_update_count,
+                "last_error_date": info.last_error_date.isoformat() if info.last_error_date else None,
+                "last_error_message": info.last_error_message,
+                "max_connections": info.max_connections,
+                "allowed_updates": info.allowed_updates
+            },
+            "timestamp": datetime.now().isoformat()
+        }, 200
+
+    async def delete_webhook(self):
+        """Delete current webhook, returns (payload, status)"""
+        result = await self.application.bot.delete_webhook()
+
+        if result:
+            logger.info("✅ Webhook deleted successfully")
+            return {
+                "status": "ok",
+                "message": "Webhook deleted successfully",
+                "timestamp": datetime.now().isoformat()
+            }, 200
+        else:
+            logger.error("Failed to delete webhook")
+            return {
+                "status": "error",
+                "message": "Failed to delete webhook"
+            }, 500
+
+    def health_info(self):
+        """Health check payload"""
+        return {
+            "status": "ok",
+            "message": "Telegram Bot Webhook Server is running",
+            "bot": "Report Bot",
+            "timestamp": datetime.now().isoformat(),
+            "bot_initialized": self.telegram_bot is not None,
+            "application_initialized": self.application is not None
+        }
+
+    def test_info(self):
+        """Debug payload for the /test endpoint"""
+        return {
+            "status": "ok",
+            "message": "Test endpoint working",
+            "bot_initialized": self.telegram_bot is not None,
+            "application_initialized": self.application is not None,
+            "bot_token_set": bool(os.getenv('BOT_TOKEN')),
+            "spreadsheet_id_set": bool(os.getenv('SPREADSHEET_ID')),
+            "google_credentials_set": bool(os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON')),
+            "environment_variables": {
+                "PORT": os.getenv('PORT'),
+                "BOT_TOKEN": "***" + (os.getenv('BOT_TOKEN', '')[-10:] if os.getenv('BOT_TOKEN') else 'Not Set'),
+                "SPREADSHEET_ID": os.getenv('SPREADSHEET_ID', 'Not Set'),
+            },
+            "timestamp": datetime.now().isoformat()
+        }
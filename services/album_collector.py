@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+from services.metrics import metrics
+
+class AlbumCollector:
+    def __init__(self, on_album, window=1.0):
+        """Collect Telegram album parts (media_group_id) into one batch
+
+        Telegram mengirim album berisi N foto sebagai N update terpisah, bisa
+        tidak berurutan. Bagian album dikumpulkan per (sesi, media_group_id)
+        sampai tidak ada bagian baru selama window detik, lalu on_album
+        dipanggil sekali dengan semua bagian yang sudah diurutkan.
+        """
+        self.on_album = on_album
+        self.window = window
+        self._albums = {}
+        self._flushing = {}
+
+        self.albums = metrics.counter(
+            'photo_albums_total', 'Telegram albums collected into one batch'
+        )
+        self.album_size = metrics.histogram(
+            'photo_album_size', 'Photos per collected album', buckets=(1, 2, 3, 5, 10)
+        )
+
+    def add(self, session_key, group_id, order, item):
+        """Add one album part; order is used to sort parts (message_id)"""
+        key = (session_key, group_id)
+        album = self._albums.get(key)
+        if album is None:
+            album = {'parts': [], 'last_part': 0.0, 'task': None}
+            self._albums[key] = album
+            album['task'] = asyncio.get_running_loop().create_task(
+                self._wait_and_flush(key), name=f"album-{group_id}"
+            )
+        album['parts'].append((order, item))
+        album['last_part'] = time.monotonic()
+
+    async def _wait_and_flush(self, key):
+        # Tunggu sampai window berlalu sejak bagian terakhir diterima
+        while True:
+            album = self._albums.get(key)
+            if album is None:
+                return
+            remaining = album['last_part'] + self.window - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(remaining)
+        await self._flush_album(key)
+
+    async def _flush_album(self, key):
+        album = self._albums.pop(key, None)
+        if not album:
+            return
+        parts = [item for order, item in sorted(album['parts'], key=lambda part: part[0])]
+        self.albums.inc()
+        self.album_size.observe(len(parts))
+
+        # Dicatat agar flush() bisa menunggu album yang sedang diproses
+        task = asyncio.current_task()
+        self._flushing[key] = task
+        try:
+            await self.on_album(key[0], parts)
+        except Exception as e:
+            print(f"❌ Error processing album {key[1]}: {e}")
+        finally:
+            if self._flushing.get(key) is task:
+                del self._flushing[key]
+
+    async def flush(self, session_key):
+        """Process the session's albums now instead of waiting for the window"""
+        for key in [key for key in self._albums if key[0] == session_key]:
+            album = self._albums.get(key)
+            if album:
+                album['task'].cancel()
+                await self._flush_album(key)
+
+        for key, task in list(self._flushing.items()):
+            if key[0] == session_key:
+                await asyncio.wait([task])
+
+    def pending(self, session_key):
+        """Whether the session has albums collecting or being processed"""
+        return any(key[0] == session_key for key in list(self._albums) + list(self._flushing))
+
+    async def settled(self, session_key):
+        """Wait until the session's albums have been collected and processed"""
+        while True:
+            tasks = [album['task'] for key, album in self._albums.items() if key[0] == session_key]
+            tasks += [task for key, task in self._flushing.items() if key[0] == session_key]
+            if not tasks:
+                return
+            await asyncio.wait(tasks)
+
+    def discard(self, session_key):
+        """Drop the session's albums, including ones being processed"""
+        for key in [key for key in self._albums if key[0] == session_key]:
+            self._albums.pop(key)['task'].cancel()
+        for key, task in list(self._flushing.items()):
+            if key[0] == session_key:
+                task.cancel()
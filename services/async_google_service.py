@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.metrics import metrics
+
+class AsyncGoogleService:
+    def __init__(self, google_service, max_workers=8, max_queued=32):
+        """Async facade that runs blocking GoogleService calls on a bounded thread pool
+
+        Handler async tidak boleh memanggil googleapiclient langsung karena akan
+        membekukan event loop untuk semua teknisi. Maksimal max_workers panggilan
+        berjalan bersamaan dan max_queued menunggu di executor; pemanggil
+        berikutnya menunggu (async) sampai ada slot.
+        """
+        self.google_service = google_service
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="google")
+        self._slots = asyncio.Semaphore(max_workers + max_queued)
+        self._active = 0
+        self._queued = 0
+        self._lock = threading.Lock()
+
+        self.active_calls = metrics.gauge(
+            'google_executor_active', 'GoogleService calls running on the executor'
+        )
+        self.queued_calls = metrics.gauge(
+            'google_executor_queued', 'GoogleService calls waiting for an executor thread'
+        )
+        self.queue_wait = metrics.histogram(
+            'google_executor_wait_seconds', 'Time between submitting a GoogleService call and its start'
+        )
+        self.saturated = metrics.counter(
+            'google_executor_saturated_total', 'GoogleService calls that had to wait for a free slot'
+        )
+        self.active_calls.set_function(lambda: self._active)
+        self.queued_calls.set_function(lambda: self._queued)
+
+    async def _call(self, method, *args, **kwargs):
+        if self._slots.locked():
+            self.saturated.inc(method=method.__name__)
+
+        async with self._slots:
+            submitted = time.monotonic()
+            with self._lock:
+                self._queued += 1
+
+            def run():
+                with self._lock:
+                    self._queued -= 1
+                    self._active += 1
+                self.queue_wait.observe(time.monotonic() - submitted)
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    with self._lock:
+                        self._active -= 1
+
+            return await asyncio.get_running_loop().run_in_executor(self._executor, run)
+
+    async def create_folder(self, folder_name, parent_folder_id=None):
+        """Create folder in Google Drive"""
+        return await self._call(self.google_service.create_folder, folder_name, parent_folder_id)
+
+    async def claim_folder(self, folder_name, defer_naming=False):
+        """Get a report folder from the warm pool, falling back to creating one"""
+        return await self._call(self.google_service.claim_folder, folder_name, defer_naming)
+
+    async def rename_file(self, file_id, new_name):
+        """Rename file or folder in Google Drive"""
+        return await self._call(self.google_service.rename_file, file_id, new_name)
+
+    async def upload_to_drive(self, file_path, file_name, folder_id):
+        """Upload file to Google Drive"""
+        return await self._call(self.google_service.upload_to_drive, file_path, file_name, folder_id)
+
+    async def upload_bytes_to_drive(self, data, file_name, folder_id, mime_type=None):
+        """Upload in-memory file content to Google Drive"""
+        return await self._call(
+            self.google_service.upload_bytes_to_drive, data, file_name, folder_id, mime_type
+        )
+
+    async def stream_upload_to_drive(self, chunks, file_name, folder_id, mime_type=None):
+        """Upload an iterable of byte chunks to Google Drive with a resumable session"""
+        return await self._call(
+            self.google_service.stream_upload_to_drive, chunks, file_name, folder_id, mime_type
+        )
+
+    async def copy_file(self, file_id, file_name, folder_id):
+        """Copy an existing Drive file into a folder server-side"""
+        return await self._call(self.google_service.copy_file, file_id, file_name, folder_id)
+
+    async def update_spreadsheet(self, spreadsheet_id, spreadsheet_config, laporan_data):
+        """Update Google Spreadsheet with report data"""
+        return await self._call(
+            self.google_service.update_spreadsheet, spreadsheet_id, spreadsheet_config, laporan_data
+        )
+
+    async def test_spreadsheet_access(self, spreadsheet_id):
+        """Test access to spreadsheet"""
+        return await self._call(self.google_service.test_spreadsheet_access, spreadsheet_id)
+
+    async def delete_file_or_folder(self, file_id):
+        """Delete file or folder from Google Drive"""
+        return await self._call(self.google_service.delete_file_or_folder, file_id)
+
+    async def list_files_in_folder(self, folder_id, max_results=100):
+        """List files in a Google Drive folder"""
+        return await self._call(self.google_service.list_files_in_folder, folder_id, max_results)
+
+    async def get_spreadsheet_info(self, spreadsheet_id):
+        """Get basic information about a spreadsheet"""
+        return await self._call(self.google_service.get_spreadsheet_info, spreadsheet_id)
+
+    def get_folder_link(self, folder_id):
+        """Get shareable link for Google Drive folder"""
+        return self.google_service.get_folder_link(folder_id)
+
+    def get_file_link(self, file_id):
+        """Get shareable link for Google Drive file"""
+        return self.google_service.get_file_link(file_id)
+
+    def shutdown(self, wait=True):
+        """Stop the executor"""
+        self._executor.shutdown(wait=wait)
+
+    async def close(self):
+        """Nothing to close, blocking clients belong to the worker threads"""
@@ -0,0 +1,200 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from googleapiclient.errors import HttpError
+
+from services.metrics import metrics
+from services.retry_policy import httplib2_status, is_idempotent, is_retryable_status
+
+# Drive menerima maksimal 100 request per batch
+MAX_DRIVE_BATCH = 100
+
+# Penanda berhenti di antrian request
+_STOP = object()
+
+class DriveBatcher:
+    def __init__(self, google_service, max_batch=50, max_delay_ms=50):
+        """Group small Drive requests into Google batch HTTP requests
+
+        Permission, delete dan update metadata dikumpulkan di thread sendiri
+        lalu dikirim sebagai satu BatchHttpRequest saat jumlahnya mencapai
+        max_batch atau max_delay_ms sejak request pertama di batch itu.
+        """
+        self.google_service = google_service
+        self.max_batch = max(1, min(max_batch, MAX_DRIVE_BATCH))
+        self.max_delay = max_delay_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._thread = None
+        # Hanya disentuh thread batcher: (waktu siap, item) yang menunggu retry,
+        # dan future -> (percobaan ke, mulai) untuk backoff
+        self._retries = []
+        self._attempts = {}
+
+        self.batch_size = metrics.histogram(
+            'drive_batch_size', 'Requests sent per Drive batch call', buckets=(1, 2, 5, 10, 20, 50, 100)
+        )
+        self.flushes = metrics.counter(
+            'drive_batch_flushes_total', 'Drive batch calls by flush reason (size/delay)'
+        )
+        self.batch_errors = metrics.counter(
+            'drive_batch_errors_total', 'Drive batch calls that failed as a whole'
+        )
+
+    def start(self):
+        """Start the flush thread"""
+        self._thread = threading.Thread(target=self._run, name="drive-batcher", daemon=True)
+        self._thread.start()
+        print(f"✅ Drive batcher started (batch {self.max_batch}, delay {self.max_delay * 1000:.0f}ms)")
+
+    def stop(self, timeout=10):
+        """Flush what is queued and stop the flush thread, later submits fail right away"""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._queue.put(_STOP)
+        if self._thread:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # Masih menunggu retry; sisa antrian tetap akan dikirim thread itu
+                return
+            self._thread = None
+        self._fail_leftovers()
+
+    def submit(self, build_request):
+        """Queue a request built by build_request(service_drive), returns a Future with its response"""
+        future = Future()
+        with self._lock:
+            if self._stopped:
+                future.set_exception(RuntimeError("Drive batcher stopped"))
+            else:
+                self._queue.put((build_request, future))
+        return future
+
+    def _run(self):
+        stopping = False
+        while not stopping or self._retries:
+            batch = self._due_retries()
+            if not batch:
+                try:
+                    item = self._queue.get(timeout=self._until_next_retry())
+                except queue.Empty:
+                    continue
+                if item is _STOP:
+                    stopping = True
+                    continue
+                batch = [item]
+
+            deadline = time.monotonic() + self.max_delay
+            while not stopping and len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._execute(batch, 'size' if len(batch) >= self.max_batch else 'delay')
+
+    def _due_retries(self):
+        """Take retries whose backoff has passed, at most one batch worth"""
+        now = time.monotonic()
+        due = [entry for entry in self._retries if entry[0] <= now][:self.max_batch]
+        for entry in due:
+            self._retries.remove(entry)
+        return [item for ready_at, item in due]
+
+    def _until_next_retry(self):
+        if not self._retries:
+            return None
+        return max(0, min(ready_at for ready_at, item in self._retries) - time.monotonic())
+
+    def _fail_leftovers(self):
+        """Fail futures still queued after the flush thread is gone"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP and not item[1].done():
+                item[1].set_exception(RuntimeError("Drive batcher stopped"))
+
+    def _execute(self, batch, reason):
+        drive = self.google_service.service_drive
+        self.batch_size.observe(len(batch))
+        self.flushes.inc(reason=reason)
+
+        # Satu request baru saja tidak perlu dibungkus batch
+        if len(batch) == 1 and batch[0][1] not in self._attempts:
+            build_request, future = batch[0]
+            try:
+                future.set_result(build_request(drive).execute())
+            except Exception as e:
+                future.set_exception(e)
+            return
+
+        # Sub-request yang kena 429/5xx dijadwalkan ke batch berikutnya setelah
+        # backoff; thread ini tidak tidur supaya request lain tetap terkirim
+        policy = self.google_service.policy
+        started = time.monotonic()
+        retried = 0
+        longest = 0
+        for item, error, status in self._send_batch(drive, batch):
+            future = item[1]
+            attempt, first_started = self._attempts.get(future, (0, started))
+            delay = policy.retry_delay('drive', attempt, first_started, str(status))
+            if delay is None:
+                future.set_exception(error)
+                continue
+            self._attempts[future] = (attempt + 1, first_started)
+            self._retries.append((time.monotonic() + delay, item))
+            retried += 1
+            longest = max(longest, delay)
+
+        for build_request, future in batch:
+            if future.done():
+                self._attempts.pop(future, None)
+        if retried:
+            print(f"⚠️ Retrying {retried} Drive batch request(s) in up to {longest:.1f}s")
+
+    def _send_batch(self, drive, batch):
+        """Send one batch call, returns (item, error, status) of sub-requests worth retrying"""
+        failed = []
+
+        def callback(item, request):
+            future = item[1]
+
+            def done(request_id, response, exception):
+                if exception is None:
+                    future.set_result(response)
+                    return
+                status = httplib2_status((exception.resp, exception.content)) if isinstance(exception, HttpError) else None
+                if is_retryable_status(status, is_idempotent(request.method)):
+                    failed.append((item, exception, status))
+                else:
+                    future.set_exception(exception)
+            return done
+
+        try:
+            http_batch = drive.new_batch_http_request()
+            for i, item in enumerate(batch):
+                request = item[0](drive)
+                http_batch.add(request, callback=callback(item, request), request_id=str(i))
+            http_batch.execute()
+        except Exception as e:
+            print(f"❌ Error executing Drive batch of {len(batch)} request(s): {e}")
+            self.batch_errors.inc()
+            for build_request, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return []
+        return failed
@@ -0,0 +1,153 @@
+import threading
+import time
+import uuid
+from collections import deque
+
+from services.metrics import metrics
+
+# Prefix nama folder cadangan di pool, dipakai juga untuk mengadopsi sisa pool saat restart
+POOL_FOLDER_PREFIX = "_pool_"
+# appProperty untuk folder yang sudah diambil tapi penamaannya ditunda (tidak diadopsi lagi)
+CLAIMED_PROPERTY = "pool_claimed"
+
+class FolderPool:
+    def __init__(self, google_service, size=5, refill_per_minute=30):
+        """Background-refilled pool of pre-created, pre-shared Drive folders
+
+        Folder dibuat (plus permission 'anyone reader') di parent_folder_id
+        sebelum dibutuhkan. Saat laporan butuh folder, cukup ambil satu dari
+        pool lalu rename, atau tanpa API call sama sekali kalau penamaan ditunda.
+        """
+        self.google_service = google_service
+        self.size = size
+        self.refill_interval = 60.0 / refill_per_minute if refill_per_minute > 0 else 0
+        self._folders = deque()
+        self._unmarked = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.available = metrics.gauge(
+            'drive_folder_pool_available', 'Pre-created Drive folders ready to be claimed'
+        )
+        self.refilled = metrics.counter(
+            'drive_folder_pool_refills_total', 'Folders created by the pool refill thread'
+        )
+        self.claims = metrics.counter(
+            'drive_folder_pool_claims_total', 'Folder claims by result (hit/miss/rename_failed)'
+        )
+        self.claim_seconds = metrics.histogram(
+            'drive_folder_pool_claim_seconds', 'Time to claim a folder from the pool, including rename'
+        )
+        self.available.set_function(lambda: len(self._folders))
+
+    def start(self):
+        """Start the refill thread"""
+        self._thread = threading.Thread(target=self._run, name="folder-pool", daemon=True)
+        self._thread.start()
+        print(f"✅ Drive folder pool started (size {self.size})")
+
+    def stop(self):
+        """Stop refilling, pooled folders stay on Drive for the next run"""
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def claim(self, folder_name=None):
+        """Take a pooled folder and rename it, returns None when the pool is empty
+
+        Kalau folder_name None, folder diambil tanpa rename (penamaan ditunda);
+        thread pool lalu memberinya appProperty CLAIMED_PROPERTY di background
+        agar tidak diadopsi lagi setelah restart.
+        """
+        started = time.perf_counter()
+        folder_id = self.take()
+        if not folder_id:
+            return None
+
+        if folder_name and not self.google_service.rename_file(folder_id, folder_name):
+            # Kembalikan ke pool, pemanggil akan membuat folder baru
+            self.release(folder_id)
+            return None
+
+        self.claimed(folder_id, started, deferred=not folder_name)
+        return folder_id
+
+    def take(self):
+        """Pop a pooled folder without renaming it, returns None when the pool is empty
+
+        Untuk backend async yang me-rename sendiri; setelah itu panggil
+        claimed() kalau berhasil atau release() kalau rename gagal.
+        """
+        with self._lock:
+            folder_id = self._folders.popleft() if self._folders else None
+        self._wakeup.set()
+
+        if not folder_id:
+            self.claims.inc(result='miss')
+        return folder_id
+
+    def claimed(self, folder_id, started, deferred=False):
+        """Record a successful claim, deferred claims get marked in the background"""
+        if deferred:
+            with self._lock:
+                self._unmarked.append(folder_id)
+            self._wakeup.set()
+        self.claims.inc(result='hit')
+        self.claim_seconds.observe(time.perf_counter() - started)
+
+    def release(self, folder_id):
+        """Put a claimed folder back at the front of the pool (rename gagal)"""
+        with self._lock:
+            self._folders.appendleft(folder_id)
+        self.claims.inc(result='rename_failed')
+
+    def _mark_claimed(self):
+        """Flag folders claimed with deferred naming so they are never adopted again"""
+        while self._unmarked and not self._stop_event.is_set():
+            with self._lock:
+                folder_id = self._unmarked.popleft()
+            if not self.google_service.set_app_property(folder_id, CLAIMED_PROPERTY, 'true'):
+                # Dicoba lagi nanti; folder yang sudah berisi foto tetap tidak diadopsi
+                with self._lock:
+                    self._unmarked.appendleft(folder_id)
+                return False
+        return True
+
+    def _adopt_leftovers(self):
+        """Reuse empty pool folders left unclaimed by the previous run"""
+        leftovers = []
+        for folder in self.google_service.find_folders(POOL_FOLDER_PREFIX):
+            if len(leftovers) >= self.size:
+                break
+            if folder.get('appProperties', {}).get(CLAIMED_PROPERTY):
+                continue
+            # Folder berisi tanpa marker (crash sebelum marker terpasang) milik laporan lain
+            if self.google_service.folder_is_empty(folder['id']):
+                leftovers.append(folder['id'])
+        with self._lock:
+            self._folders.extend(leftovers)
+        if leftovers:
+            print(f"♻️ Adopted {len(leftovers)} pooled folder(s) from previous run")
+
+    def _run(self):
+        self._adopt_leftovers()
+        while not self._stop_event.is_set():
+            if not self._mark_claimed():
+                self._stop_event.wait(10)
+                continue
+
+            if len(self._folders) >= self.size:
+                # Tunggu sampai ada folder yang diambil
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            folder_id = self.google_service.create_folder(f"{POOL_FOLDER_PREFIX}{uuid.uuid4().hex}")
+            if folder_id:
+                with self._lock:
+                    self._folders.append(folder_id)
+                self.refilled.inc()
+
+            # Batasi laju refill (dan tunggu lebih lama kalau create gagal)
+            self._stop_event.wait(self.refill_interval if folder_id else max(self.refill_interval, 10))
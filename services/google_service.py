@@ -1,21 +1,225 @@
 import os
+import io
+import functools
+import threading
+import time
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from google.auth.transport.requests import AuthorizedSession
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload, build_http
 from datetime import datetime
 import json
 
+from services.metrics import metrics
+from services.folder_pool import FolderPool
+from services.drive_batcher import DriveBatcher
+from services.retry_policy import RetryPolicy, RetryingHttp, response_status
+
 # Scopes untuk Google API
 SCOPES = ['https://www.googleapis.com/auth/drive', 'https://www.googleapis.com/auth/spreadsheets']
 
+# Versi API per client; client dibuat per thread karena httplib2 tidak thread-safe
+API_VERSIONS = {
+    'drive': 'v3',
+    'sheets': 'v4',
+}
+HTTP_TIMEOUT = float(os.getenv('GOOGLE_HTTP_TIMEOUT', 60))
+
+# Endpoint upload resumable Drive dan ukuran chunk (harus kelipatan 256 KiB)
+DRIVE_UPLOAD_URL = 'https://www.googleapis.com/upload/drive/v3/files'
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def chunk_range(offset, length, total):
+    """Content-Range of a resumable upload chunk, an empty chunk asks for the upload status"""
+    size = total if total is not None else '*'
+    if length:
+        return f"bytes {offset}-{offset + length - 1}/{size}"
+    return f"bytes */{size}"
+
+def received_bytes(response):
+    """Bytes Drive already stored, from the Range header of a 308 upload status"""
+    stored = response.headers.get('Range')
+    if not stored:
+        return 0
+    return int(stored.rsplit('-', 1)[1]) + 1
+
+def guess_mime_type(file_name):
+    """Determine MIME type based on file extension"""
+    name = file_name.lower()
+    if name.endswith(('.jpg', '.jpeg')):
+        return 'image/jpeg'
+    elif name.endswith('.png'):
+        return 'image/png'
+    elif name.endswith('.pdf'):
+        return 'application/pdf'
+    elif name.endswith(('.doc', '.docx')):
+        return 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    return 'application/octet-stream'  # Default
+
+google_call_seconds = metrics.histogram(
+    'google_api_seconds', 'Duration of GoogleService calls'
+)
+google_thread_clients = metrics.counter(
+    'google_thread_clients_total', 'Per-thread Google API clients built, by API'
+)
+google_token_refreshes = metrics.counter(
+    'google_token_refreshes_total', 'Service account access token refreshes'
+)
+google_call_errors = metrics.counter(
+    'google_api_errors_total', 'GoogleService calls that failed'
+)
+google_client_build_seconds = metrics.histogram(
+    'google_client_build_seconds', 'Time to build one Google API client from its discovery document'
+)
+google_connection_ok = metrics.gauge(
+    'google_connection_ok', 'Result of the background Google API connectivity check (1 ok, 0 failed)'
+)
+
+# Teks JSON discovery document, dibaca sekali lalu dipakai bersama semua thread
+_discovery_documents = {}
+_discovery_lock = threading.Lock()
+
+def discovery_document(api):
+    """JSON text of the discovery document bundled with googleapiclient, None when not bundled"""
+    with _discovery_lock:
+        if api not in _discovery_documents:
+            # Dokumen statis ikut terpasang bersama library: tanpa request HTTP
+            # dan tanpa discovery_cache (yang selalu memberi warning saat boot)
+            _discovery_documents[api] = discovery_cache.get_static_doc(api, API_VERSIONS[api])
+        return _discovery_documents[api]
+
+def timed_call(method):
+    """Record duration of a GoogleService call, a None/False result counts as an error"""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        result = None
+        try:
+            result = method(self, *args, **kwargs)
+            return result
+        finally:
+            google_call_seconds.observe(time.perf_counter() - started, method=name)
+            if result is None or result is False:
+                google_call_errors.inc(method=name)
+    return wrapper
+
+def tracked_write(method):
+    """Count a Google write as in-flight so shutdown can wait for it"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.begin_write()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.end_write()
+    return wrapper
+
 class GoogleService:
-    def __init__(self, parent_folder_id="1mLsCBEqEb0R4_pX75-xmpRE1023H6A90"):
-        self.service_drive = None
-        self.service_sheets = None
+    def __init__(self, parent_folder_id="1mLsCBEqEb0R4_pX75-xmpRE1023H6A90", policy=None):
+        self.credentials = None
         self.parent_folder_id = parent_folder_id
         
-    def authenticate(self):
-        """Authenticate with Google APIs using Service Account"""
+        # Retry, backoff dan circuit breaker untuk semua request ke Google
+        self.policy = policy or RetryPolicy()
+        
+        # Client Drive/Sheets per thread (satu koneksi httplib2 keep-alive per thread)
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
+        
+        # Jumlah operasi tulis (folder, upload, spreadsheet) yang sedang berjalan
+        self._inflight = 0
+        self._inflight_cond = threading.Condition()
+        
+        # Pool folder Drive yang sudah dibuat sebelumnya (opsional)
+        self.folder_pool = None
+        
+        # Batch permission/delete/rename (opsional) dan mode share lewat parent folder
+        self.batcher = None
+        self.share_parent_only = False
+        
+    @property
+    def service_drive(self):
+        """Drive client of the calling thread"""
+        return self._client('drive')
+
+    @property
+    def service_sheets(self):
+        """Sheets client of the calling thread"""
+        return self._client('sheets')
+
+    def _client(self, api):
+        if not self.credentials:
+            return None
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            clients = {}
+            self._local.clients = clients
+        
+        client = clients.get(api)
+        if client is None:
+            # Credentials dipakai bersama, transport httplib2 milik thread ini sendiri.
+            # build_http() membuang 308 dari redirect_codes: Drive menjawab chunk
+            # upload resumable dengan 308 tanpa Location
+            transport = build_http()
+            transport.timeout = HTTP_TIMEOUT
+            http = RetryingHttp(AuthorizedHttp(self.credentials, http=transport), self.policy, api)
+            started = time.perf_counter()
+            document = discovery_document(api)
+            if document is not None:
+                # Teks di-parse per thread (json C, lebih cepat dari deepcopy dict):
+                # build_from_document menulis ke dokumen hasil parse
+                client = build_from_document(document, http=http)
+            else:
+                client = build(api, API_VERSIONS[api], http=http, cache_discovery=False)
+            google_client_build_seconds.observe(time.perf_counter() - started, api=api)
+            clients[api] = client
+            google_thread_clients.inc(api=api)
+        return client
+
+    def _share_credentials(self, creds):
+        """Make concurrent threads refresh the shared access token only once"""
+        refresh = creds.refresh
+        
+        def locked_refresh(request):
+            with self._refresh_lock:
+                # Thread lain mungkin sudah refresh selagi kita menunggu lock
+                if creds.valid:
+                    return
+                refresh(request)
+                google_token_refreshes.inc()
+        
+        creds.refresh = locked_refresh
+        return creds
+
+    def begin_write(self):
+        """Mark a Google write as started"""
+        with self._inflight_cond:
+            self._inflight += 1
+
+    def end_write(self):
+        """Mark a Google write as finished"""
+        with self._inflight_cond:
+            self._inflight -= 1
+            self._inflight_cond.notify_all()
+
+    def wait_idle(self, timeout):
+        """Wait for in-flight writes to finish, returns how many are still running"""
+        with self._inflight_cond:
+            self._inflight_cond.wait_for(lambda: self._inflight == 0, timeout=max(timeout, 0))
+            return self._inflight
+        
+    def authenticate(self, check_connection=True):
+        """Authenticate with Google APIs using Service Account
+
+        Hanya memuat credentials; client dibuat saat pertama dipakai dan tes
+        koneksi berjalan di thread background agar startup tidak menunggu
+        request ke Google.
+        """
+        started = time.perf_counter()
         try:
             # Coba ambil dari environment variable dulu (untuk production)
             service_account_info = os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON')
@@ -51,30 +255,39 @@ class GoogleService:
                 if not creds:
                     raise Exception("No valid service account credentials found!")
             
-            # Build services
-            self.service_drive = build('drive', 'v3', credentials=creds)
-            self.service_sheets = build('sheets', 'v4', credentials=creds)
+            # Client dibuat per thread saat pertama dipakai
+            self.credentials = self._share_credentials(creds)
             
-            # Test the connection
-            try:
-                # Test Drive API
-                drive_about = self.service_drive.about().get(fields="user").execute()
-                print(f"✅ Google Drive API connected as: {drive_about.get('user', {}).get('emailAddress', 'Unknown')}")
-                
-                # Test Sheets API
-                print("✅ Google Sheets API connected successfully")
-                
-            except Exception as e:
-                print(f"❌ Error testing API connections: {e}")
-                return False
+            if check_connection:
+                threading.Thread(target=self.check_connection, name="google-check", daemon=True).start()
             
-            print("✅ Google APIs authenticated successfully!")
+            print(f"✅ Google APIs authenticated successfully! ({(time.perf_counter() - started) * 1000:.0f}ms)")
             return True
             
         except Exception as e:
             print(f"❌ Error authenticating Google APIs: {e}")
             return False
 
+    def check_connection(self):
+        """Test Drive and Sheets access, also loads both discovery documents"""
+        started = time.perf_counter()
+        try:
+            drive_about = self.service_drive.about().get(fields="user").execute()
+            print(f"✅ Google Drive API connected as: {drive_about.get('user', {}).get('emailAddress', 'Unknown')}")
+            
+            # Client Sheets cukup dibuat, tidak perlu request
+            self.service_sheets
+            print(f"✅ Google Sheets API connected successfully ({(time.perf_counter() - started) * 1000:.0f}ms)")
+            google_connection_ok.set(1)
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error testing API connections: {e}")
+            google_connection_ok.set(0)
+            return False
+
+    @timed_call
+    @tracked_write
     def create_folder(self, folder_name, parent_folder_id=None):
         """Create folder in Google Drive"""
         try:
@@ -99,19 +312,7 @@ class GoogleService:
                 print(f"✅ Folder created: {folder_name} (ID: {folder_id})")
                 
                 # Set folder permissions to be viewable by anyone with link
-                try:
-                    permission = {
-                        'type': 'anyone',
-                        'role': 'reader'
-                    }
-                    self.service_drive.permissions().create(
-                        fileId=folder_id,
-                        body=permission
-                    ).execute()
-                    print(f"✅ Folder permissions set for: {folder_name}")
-                except Exception as perm_e:
-                    print(f"⚠️ Warning: Could not set folder permissions: {perm_e}")
-                
+                self._share_file(folder_id, folder_name)
                 return folder_id
             else:
                 print(f"❌ Failed to get folder ID for: {folder_name}")
@@ -121,6 +322,8 @@ class GoogleService:
             print(f"❌ Error creating folder '{folder_name}': {e}")
             return None
 
+    @timed_call
+    @tracked_write
     def upload_to_drive(self, file_path, file_name, folder_id):
         """Upload file to Google Drive"""
         try:
@@ -132,57 +335,350 @@ class GoogleService:
                 print(f"❌ File not found: {file_path}")
                 return None
             
-            file_metadata = {
-                'name': file_name,
-                'parents': [folder_id]
-            }
+            media = MediaFileUpload(file_path, mimetype=guess_mime_type(file_path), resumable=True)
+            return self._create_file(media, file_name, folder_id)
+                
+        except Exception as e:
+            print(f"❌ Error uploading file '{file_name}': {e}")
+            return None
+
+    @timed_call
+    @tracked_write
+    def upload_bytes_to_drive(self, data, file_name, folder_id, mime_type=None):
+        """Upload in-memory file content to Google Drive"""
+        try:
+            if not self.service_drive:
+                print("❌ Google Drive service not initialized")
+                return None
+            
+            media = MediaIoBaseUpload(
+                io.BytesIO(data),
+                mimetype=mime_type or guess_mime_type(file_name),
+                resumable=True
+            )
+            return self._create_file(media, file_name, folder_id)
+                
+        except Exception as e:
+            print(f"❌ Error uploading file '{file_name}': {e}")
+            return None
+
+    @timed_call
+    @tracked_write
+    def stream_upload_to_drive(self, chunks, file_name, folder_id, mime_type=None):
+        """Upload an iterable of byte chunks to Google Drive with a resumable session
+
+        Chunk dikirim ke Drive begitu terkumpul UPLOAD_CHUNK_SIZE byte, jadi
+        memori yang dipakai tetap sekitar satu chunk berapa pun ukuran file.
+        Total ukuran baru dikirim di chunk terakhir.
+        """
+        try:
+            if not self.credentials:
+                print("❌ Google credentials not initialized")
+                return None
+            
+            with AuthorizedSession(self.credentials) as session:
+                mime_type = mime_type or guess_mime_type(file_name)
+            
+                # Buka sesi upload resumable
+                response = self.policy.call('drive', lambda remaining: session.post(
+                    DRIVE_UPLOAD_URL,
+                    params={'uploadType': 'resumable', 'fields': 'id'},
+                    headers={'X-Upload-Content-Type': mime_type},
+                    json={'name': file_name, 'parents': [folder_id]},
+                    timeout=max(1.0, min(HTTP_TIMEOUT, remaining))
+                ), response_status, idempotent=False)
+                response.raise_for_status()
+                upload_url = response.headers['Location']
+            
+                buffer = bytearray()
+                offset = 0
+                for chunk in chunks:
+                    buffer.extend(chunk)
+                    while len(buffer) > UPLOAD_CHUNK_SIZE:
+                        piece = bytes(buffer[:UPLOAD_CHUNK_SIZE])
+                        del buffer[:UPLOAD_CHUNK_SIZE]
+                        self._put_chunk(session, upload_url, piece, offset, None)
+                        offset += len(piece)
+            
+                # Chunk terakhir membawa total ukuran file
+                total = offset + len(buffer)
+                result = self._put_chunk(session, upload_url, bytes(buffer), offset, total)
+            
+                file_id = result.get('id') if result else None
+                if not file_id:
+                    print(f"❌ Failed to get file ID for: {file_name}")
+                    return None
+            
+                print(f"✅ File streamed: {file_name} ({total} bytes, ID: {file_id})")
+                self._share_file(file_id, file_name)
+                return file_id
+            
+        except Exception as e:
+            print(f"❌ Error streaming file '{file_name}': {e}")
+            return None
+
+    def _put_chunk(self, session, upload_url, data, offset, total):
+        """Send one chunk of a resumable upload, returns the file resource on the last chunk
+
+        Sebelum mengirim ulang, status upload ditanyakan dulu (Content-Range
+        bytes */total) supaya pengiriman dilanjutkan dari byte yang belum
+        diterima Drive, bukan mengirim ulang seluruh chunk.
+        """
+        sent = False
+        
+        def attempt(remaining):
+            nonlocal sent
+            timeout = max(1.0, min(HTTP_TIMEOUT, remaining))
+            start = offset
+            if sent:
+                status = session.put(
+                    upload_url, headers={'Content-Range': chunk_range(offset, 0, total)}, timeout=timeout
+                )
+                if status.status_code != 308:
+                    return status
+                start = received_bytes(status)
+                if start < offset:
+                    raise RuntimeError(f"Drive lost uploaded bytes before offset {offset}")
+                if start >= offset + len(data) and total is None:
+                    return status
+            sent = True
+            piece = data[start - offset:]
+            return session.put(
+                upload_url, data=piece, headers={'Content-Range': chunk_range(start, len(piece), total)},
+                timeout=timeout
+            )
+        
+        response = self.policy.call('drive', attempt, response_status)
+        if response.status_code == 308:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def _share_file(self, file_id, file_name):
+        """Make a Drive file viewable by anyone with the link"""
+        # Akses sudah diwarisi dari parent folder yang di-share
+        if self.share_parent_only:
+            return
+        
+        permission = {
+            'type': 'anyone',
+            'role': 'reader'
+        }
+        
+        if self.batcher:
+            # Dikirim bersama permission lain di batch berikutnya, tidak perlu ditunggu
+            future = self.batcher.submit(
+                lambda drive: drive.permissions().create(fileId=file_id, body=permission)
+            )
+            future.add_done_callback(
+                lambda f: print(f"⚠️ Warning: Could not set permissions for {file_name}: {f.exception()}")
+                if f.exception() else None
+            )
+            return
+        
+        try:
+            self.service_drive.permissions().create(
+                fileId=file_id,
+                body=permission
+            ).execute()
+            print(f"✅ File permissions set for: {file_name}")
+        except Exception as perm_e:
+            print(f"⚠️ Warning: Could not set file permissions: {perm_e}")
+
+    def _execute(self, build_request):
+        """Execute a small Drive request, through the batcher when it is running"""
+        if self.batcher:
+            return self.batcher.submit(build_request).result(timeout=60)
+        return build_request(self.service_drive).execute()
+
+    def _create_file(self, media, file_name, folder_id):
+        """Create a Drive file from a media body and share it, returns file ID"""
+        file_metadata = {
+            'name': file_name,
+            'parents': [folder_id]
+        }
+        
+        uploaded_file = self.service_drive.files().create(
+            body=file_metadata, 
+            media_body=media
+        ).execute()
+        
+        file_id = uploaded_file.get('id')
+        
+        if file_id:
+            print(f"✅ File uploaded: {file_name} (ID: {file_id})")
+            
+            # Set file permissions
+            self._share_file(file_id, file_name)
+            return file_id
+        else:
+            print(f"❌ Failed to get file ID for: {file_name}")
+            return None
+
+    def start_folder_pool(self, size=5, refill_per_minute=30):
+        """Start the warm pool of pre-created evidence folders"""
+        if size <= 0 or self.folder_pool:
+            return
+        self.folder_pool = FolderPool(self, size=size, refill_per_minute=refill_per_minute)
+        self.folder_pool.start()
+
+    def stop_folder_pool(self):
+        """Stop refilling the folder pool"""
+        if self.folder_pool:
+            self.folder_pool.stop()
+
+    def start_batcher(self, max_batch=50, max_delay_ms=50):
+        """Start batching permission, delete and rename requests"""
+        if self.batcher:
+            return
+        self.batcher = DriveBatcher(self, max_batch=max_batch, max_delay_ms=max_delay_ms)
+        self.batcher.start()
+
+    def stop_batcher(self):
+        """Flush queued batch requests and stop batching"""
+        if self.batcher:
+            batcher, self.batcher = self.batcher, None
+            batcher.stop()
+
+    def share_parent_folder(self):
+        """Share parent_folder_id once so new folders and files inherit access
+
+        Setelah berhasil, permission per folder/file tidak dibuat lagi.
+        """
+        try:
+            if not self.service_drive or not self.parent_folder_id:
+                return False
             
-            # Determine MIME type based on file extension
-            mime_type = 'application/octet-stream'  # Default
-            if file_path.lower().endswith(('.jpg', '.jpeg')):
-                mime_type = 'image/jpeg'
-            elif file_path.lower().endswith('.png'):
-                mime_type = 'image/png'
-            elif file_path.lower().endswith('.pdf'):
-                mime_type = 'application/pdf'
-            elif file_path.lower().endswith(('.doc', '.docx')):
-                mime_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            
-            media = MediaFileUpload(file_path, mimetype=mime_type, resumable=True)
-            
-            uploaded_file = self.service_drive.files().create(
-                body=file_metadata, 
-                media_body=media
+            self.service_drive.permissions().create(
+                fileId=self.parent_folder_id,
+                body={'type': 'anyone', 'role': 'reader'}
             ).execute()
+            self.share_parent_only = True
+            print(f"✅ Parent folder shared, files inherit its permissions: {self.parent_folder_id}")
+            return True
             
-            file_id = uploaded_file.get('id')
+        except Exception as e:
+            print(f"⚠️ Warning: Could not share parent folder, sharing each file instead: {e}")
+            return False
+
+    def claim_folder(self, folder_name, defer_naming=False):
+        """Get a report folder from the warm pool, falling back to creating one
+
+        Returns (folder_id, needs_rename). needs_rename True berarti folder
+        diambil dari pool tanpa rename dan masih harus diberi nama folder_name.
+        """
+        if self.folder_pool:
+            folder_id = self.folder_pool.claim(None if defer_naming else folder_name)
+            if folder_id:
+                print(f"✅ Folder claimed from pool: {folder_name} (ID: {folder_id})")
+                return folder_id, defer_naming
+        return self.create_folder(folder_name), False
+
+    @timed_call
+    @tracked_write
+    def rename_file(self, file_id, new_name):
+        """Rename file or folder in Google Drive"""
+        try:
+            if not self.service_drive:
+                print("❌ Google Drive service not initialized")
+                return False
             
-            if file_id:
-                print(f"✅ File uploaded: {file_name} (ID: {file_id})")
-                
-                # Set file permissions
-                try:
-                    permission = {
-                        'type': 'anyone',
-                        'role': 'reader'
-                    }
-                    self.service_drive.permissions().create(
-                        fileId=file_id,
-                        body=permission
-                    ).execute()
-                    print(f"✅ File permissions set for: {file_name}")
-                except Exception as perm_e:
-                    print(f"⚠️ Warning: Could not set file permissions: {perm_e}")
-                
-                return file_id
-            else:
-                print(f"❌ Failed to get file ID for: {file_name}")
+            self._execute(lambda drive: drive.files().update(
+                fileId=file_id,
+                body={'name': new_name},
+                fields='id'
+            ))
+            print(f"✅ Renamed {file_id} to: {new_name}")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error renaming {file_id}: {e}")
+            return False
+
+    @timed_call
+    @tracked_write
+    def copy_file(self, file_id, file_name, folder_id):
+        """Copy an existing Drive file into a folder server-side, returns the new file ID"""
+        try:
+            if not self.service_drive:
+                print("❌ Google Drive service not initialized")
                 return None
-                
+            
+            # Salinan dibuat di sisi Drive, tidak ada byte yang di-download/upload ulang
+            copied = self.service_drive.files().copy(
+                fileId=file_id,
+                body={'name': file_name, 'parents': [folder_id]},
+                fields='id'
+            ).execute()
+            new_file_id = copied.get('id')
+            
+            if not new_file_id:
+                print(f"❌ Failed to get file ID for copy: {file_name}")
+                return None
+            
+            print(f"✅ File copied: {file_name} (ID: {new_file_id})")
+            self._share_file(new_file_id, file_name)
+            return new_file_id
+            
         except Exception as e:
-            print(f"❌ Error uploading file '{file_name}': {e}")
+            print(f"❌ Error copying file {file_id}: {e}")
             return None
 
+    @timed_call
+    def find_folders(self, name_prefix, parent_folder_id=None):
+        """Find folders whose name starts with a prefix under the parent folder"""
+        try:
+            if not self.service_drive:
+                print("❌ Google Drive service not initialized")
+                return []
+            
+            target_parent = parent_folder_id or self.parent_folder_id
+            query = (
+                f"'{target_parent}' in parents and name contains '{name_prefix}' "
+                f"and mimeType='application/vnd.google-apps.folder' and trashed=false"
+            )
+            results = self.service_drive.files().list(
+                q=query,
+                pageSize=100,
+                fields="files(id, name, appProperties)"
+            ).execute()
+            
+            # 'contains' di Drive mencocokkan prefix kata, jadi saring lagi di sini
+            return [f for f in results.get('files', []) if f.get('name', '').startswith(name_prefix)]
+            
+        except Exception as e:
+            print(f"❌ Error finding folders '{name_prefix}*': {e}")
+            return []
+
+    @timed_call
+    def set_app_property(self, file_id, key, value):
+        """Set one private appProperties entry on a Drive file"""
+        try:
+            self._execute(lambda drive: drive.files().update(
+                fileId=file_id,
+                body={'appProperties': {key: value}},
+                fields='id'
+            ))
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error setting {key} on {file_id}: {e}")
+            return False
+
+    def folder_is_empty(self, folder_id):
+        """Check whether a Drive folder has no children, False when it cannot be checked"""
+        try:
+            results = self.service_drive.files().list(
+                q=f"'{folder_id}' in parents and trashed=false",
+                pageSize=1,
+                fields="files(id)"
+            ).execute()
+            return not results.get('files')
+            
+        except Exception as e:
+            print(f"❌ Error checking folder {folder_id}: {e}")
+            return False
+
     def get_folder_link(self, folder_id):
         """Get shareable link for Google Drive folder"""
         if folder_id:
@@ -195,6 +691,8 @@ class GoogleService:
             return f"https://drive.google.com/file/d/{file_id}/view"
         return ""
 
+    @timed_call
+    @tracked_write
     def update_spreadsheet(self, spreadsheet_id, spreadsheet_config, laporan_data):
         """Update Google Spreadsheet with report data"""
         try:
@@ -246,6 +744,7 @@ class GoogleService:
                 print(f"Response reason: {e.resp.reason}")
             return False
 
+    @timed_call
     def test_spreadsheet_access(self, spreadsheet_id):
         """Test access to spreadsheet"""
         try:
@@ -266,6 +765,7 @@ class GoogleService:
             print(f"❌ Error accessing spreadsheet: {e}")
             return False
 
+    @timed_call
     def delete_file_or_folder(self, file_id):
         """Delete file or folder from Google Drive"""
         try:
@@ -273,7 +773,7 @@ class GoogleService:
                 print("❌ Google Drive service not initialized")
                 return False
                 
-            self.service_drive.files().delete(fileId=file_id).execute()
+            self._execute(lambda drive: drive.files().delete(fileId=file_id))
             print(f"✅ Successfully deleted file/folder: {file_id}")
             return True
             
@@ -281,6 +781,7 @@ class GoogleService:
             print(f"❌ Error deleting file/folder {file_id}: {e}")
             return False
 
+    @timed_call
     def list_files_in_folder(self, folder_id, max_results=100):
         """List files in a Google Drive folder"""
         try:
@@ -304,6 +805,7 @@ class GoogleService:
             print(f"❌ Error listing files in folder {folder_id}: {e}")
             return []
 
+    @timed_call
     def get_spreadsheet_info(self, spreadsheet_id):
         """Get basic information about a spreadsheet"""
         try:
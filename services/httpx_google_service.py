@@ -0,0 +1,438 @@
+import json
+import uuid
+import asyncio
+import functools
+import time
+from urllib.parse import quote
+
+import httpx
+from google.auth.transport.requests import Request
+
+from services.google_service import (
+    DRIVE_UPLOAD_URL,
+    HTTP_TIMEOUT,
+    UPLOAD_CHUNK_SIZE,
+    chunk_range,
+    google_call_seconds,
+    google_call_errors,
+    guess_mime_type,
+    received_bytes,
+)
+from services.retry_policy import is_idempotent, response_status
+
+DRIVE_FILES_URL = 'https://www.googleapis.com/drive/v3/files'
+SHEETS_URL = 'https://sheets.googleapis.com/v4/spreadsheets'
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+def timed_async_call(method):
+    """Record duration of an async Google call, a None/False result counts as an error"""
+    name = method.__name__
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        result = None
+        try:
+            result = await method(self, *args, **kwargs)
+            return result
+        finally:
+            google_call_seconds.observe(time.perf_counter() - started, method=name)
+            if result is None or result is False:
+                google_call_errors.inc(method=name)
+    return wrapper
+
+def tracked_async_write(method):
+    """Count an async Google write as in-flight so shutdown can wait for it"""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        self.google_service.begin_write()
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            self.google_service.end_write()
+    return wrapper
+
+async def _iter_async(chunks):
+    """Iterate async or blocking chunk iterables without blocking the event loop"""
+    if hasattr(chunks, '__aiter__'):
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    # Iterator biasa (misal antrian dari PhotoService) dibaca di thread
+    iterator = iter(chunks)
+    while True:
+        chunk = await asyncio.to_thread(next, iterator, None)
+        if chunk is None:
+            return
+        yield chunk
+
+async def _iter_file(file_path):
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+class HttpxGoogleService:
+    def __init__(self, google_service, max_connections=100, http2=True):
+        """Native asyncio Drive/Sheets client over one shared httpx.AsyncClient
+
+        Method sama dengan AsyncGoogleService, tapi request REST dikirim
+        langsung dari event loop (HTTP/2 keep-alive, banyak request dalam satu
+        koneksi) tanpa thread executor. Credentials, parent folder dan pool
+        folder tetap milik GoogleService.
+        """
+        self.google_service = google_service
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self._refresh_lock = asyncio.Lock()
+
+    async def _headers(self):
+        credentials = self.google_service.credentials
+        if not credentials.valid:
+            # Satu refresh untuk semua request yang menunggu
+            async with self._refresh_lock:
+                if not credentials.valid:
+                    await asyncio.to_thread(credentials.refresh, Request())
+        return {'Authorization': f'Bearer {credentials.token}'}
+
+    async def _send(self, method, url, headers=None, **kwargs):
+        """Send one request under the shared retry/circuit breaker policy"""
+        api = 'sheets' if url.startswith(SHEETS_URL) else 'drive'
+
+        async def attempt(remaining):
+            return await self._send_once(method, url, remaining, headers, **kwargs)
+
+        return await self.google_service.policy.acall(api, attempt, response_status, idempotent=is_idempotent(method))
+
+    async def _send_once(self, method, url, remaining, headers=None, **kwargs):
+        # Header diambil ulang tiap percobaan, token mungkin sudah di-refresh
+        request_headers = await self._headers()
+        request_headers.update(headers or {})
+        return await self._client.request(
+            method, url, headers=request_headers, timeout=max(1.0, min(HTTP_TIMEOUT, remaining)), **kwargs
+        )
+
+    async def _request(self, method, url, **kwargs):
+        response = await self._send(method, url, **kwargs)
+        response.raise_for_status()
+        return response
+
+    async def _share_file(self, file_id, file_name):
+        # Akses sudah diwarisi dari parent folder yang di-share
+        if self.google_service.share_parent_only:
+            return
+        if self.google_service.batcher:
+            # Digabung dengan permission lain di batch Drive berikutnya, tidak ditunggu
+            self.google_service._share_file(file_id, file_name)
+            return
+        try:
+            await self._request(
+                'POST', f"{DRIVE_FILES_URL}/{file_id}/permissions",
+                json={'type': 'anyone', 'role': 'reader'}
+            )
+            print(f"✅ File permissions set for: {file_name}")
+        except Exception as perm_e:
+            print(f"⚠️ Warning: Could not set file permissions: {perm_e}")
+
+    @timed_async_call
+    @tracked_async_write
+    async def create_folder(self, folder_name, parent_folder_id=None):
+        """Create folder in Google Drive"""
+        try:
+            folder_metadata = {'name': folder_name, 'mimeType': FOLDER_MIME_TYPE}
+            target_parent = parent_folder_id or self.google_service.parent_folder_id
+            if target_parent:
+                folder_metadata['parents'] = [target_parent]
+
+            response = await self._request('POST', DRIVE_FILES_URL, params={'fields': 'id'}, json=folder_metadata)
+            folder_id = response.json().get('id')
+            if not folder_id:
+                print(f"❌ Failed to get folder ID for: {folder_name}")
+                return None
+
+            print(f"✅ Folder created: {folder_name} (ID: {folder_id})")
+            await self._share_file(folder_id, folder_name)
+            return folder_id
+
+        except Exception as e:
+            print(f"❌ Error creating folder '{folder_name}': {e}")
+            return None
+
+    async def claim_folder(self, folder_name, defer_naming=False):
+        """Get a report folder from the warm pool, falling back to creating one"""
+        pool = self.google_service.folder_pool
+        if pool:
+            # Rename lewat httpx, bukan lewat pool (rename sinkron akan memblokir event loop)
+            started = time.perf_counter()
+            folder_id = pool.take()
+            if folder_id and (defer_naming or await self.rename_file(folder_id, folder_name)):
+                pool.claimed(folder_id, started, deferred=defer_naming)
+                print(f"✅ Folder claimed from pool: {folder_name} (ID: {folder_id})")
+                return folder_id, defer_naming
+            if folder_id:
+                pool.release(folder_id)
+        return await self.create_folder(folder_name), False
+
+    @timed_async_call
+    @tracked_async_write
+    async def rename_file(self, file_id, new_name):
+        """Rename file or folder in Google Drive"""
+        try:
+            await self._request('PATCH', f"{DRIVE_FILES_URL}/{file_id}", params={'fields': 'id'}, json={'name': new_name})
+            print(f"✅ Renamed {file_id} to: {new_name}")
+            return True
+        except Exception as e:
+            print(f"❌ Error renaming {file_id}: {e}")
+            return False
+
+    @timed_async_call
+    @tracked_async_write
+    async def upload_to_drive(self, file_path, file_name, folder_id):
+        """Upload file to Google Drive"""
+        return await self._resumable_upload(_iter_file(file_path), file_name, folder_id, guess_mime_type(file_path))
+
+    @timed_async_call
+    @tracked_async_write
+    async def upload_bytes_to_drive(self, data, file_name, folder_id, mime_type=None):
+        """Upload in-memory file content to Google Drive"""
+        try:
+            # File kecil: satu request multipart (metadata + isi)
+            boundary = uuid.uuid4().hex
+            metadata = json.dumps({'name': file_name, 'parents': [folder_id]})
+            body = (
+                f"--{boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n{metadata}\r\n"
+                f"--{boundary}\r\nContent-Type: {mime_type or guess_mime_type(file_name)}\r\n\r\n"
+            ).encode() + bytes(data) + f"\r\n--{boundary}--".encode()
+
+            response = await self._request(
+                'POST', DRIVE_UPLOAD_URL,
+                params={'uploadType': 'multipart', 'fields': 'id'},
+                headers={'Content-Type': f'multipart/related; boundary={boundary}'},
+                content=body
+            )
+            file_id = response.json().get('id')
+            if not file_id:
+                print(f"❌ Failed to get file ID for: {file_name}")
+                return None
+
+            print(f"✅ File uploaded: {file_name} (ID: {file_id})")
+            await self._share_file(file_id, file_name)
+            return file_id
+
+        except Exception as e:
+            print(f"❌ Error uploading file '{file_name}': {e}")
+            return None
+
+    @timed_async_call
+    @tracked_async_write
+    async def stream_upload_to_drive(self, chunks, file_name, folder_id, mime_type=None):
+        """Upload an iterable of byte chunks to Google Drive with a resumable session"""
+        return await self._resumable_upload(_iter_async(chunks), file_name, folder_id, mime_type)
+
+    async def _resumable_upload(self, chunks, file_name, folder_id, mime_type=None):
+        try:
+            mime_type = mime_type or guess_mime_type(file_name)
+            response = await self._request(
+                'POST', DRIVE_UPLOAD_URL,
+                params={'uploadType': 'resumable', 'fields': 'id'},
+                headers={'X-Upload-Content-Type': mime_type},
+                json={'name': file_name, 'parents': [folder_id]}
+            )
+            upload_url = response.headers['Location']
+
+            buffer = bytearray()
+            offset = 0
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                while len(buffer) > UPLOAD_CHUNK_SIZE:
+                    piece = bytes(buffer[:UPLOAD_CHUNK_SIZE])
+                    del buffer[:UPLOAD_CHUNK_SIZE]
+                    await self._put_chunk(upload_url, piece, offset, None)
+                    offset += len(piece)
+
+            # Chunk terakhir membawa total ukuran file
+            total = offset + len(buffer)
+            result = await self._put_chunk(upload_url, bytes(buffer), offset, total)
+
+            file_id = result.get('id') if result else None
+            if not file_id:
+                print(f"❌ Failed to get file ID for: {file_name}")
+                return None
+
+            print(f"✅ File uploaded: {file_name} ({total} bytes, ID: {file_id})")
+            await self._share_file(file_id, file_name)
+            return file_id
+
+        except Exception as e:
+            print(f"❌ Error uploading file '{file_name}': {e}")
+            return None
+
+    async def _put_chunk(self, upload_url, data, offset, total):
+        sent = False
+
+        async def attempt(remaining):
+            nonlocal sent
+            start = offset
+            if sent:
+                # Percobaan ulang: lanjutkan dari byte terakhir yang diterima Drive
+                status = await self._send_once(
+                    'PUT', upload_url, remaining, headers={'Content-Range': chunk_range(offset, 0, total)}
+                )
+                if status.status_code != 308:
+                    return status
+                start = received_bytes(status)
+                if start < offset:
+                    raise RuntimeError(f"Drive lost uploaded bytes before offset {offset}")
+                if start >= offset + len(data) and total is None:
+                    return status
+            sent = True
+            piece = data[start - offset:]
+            return await self._send_once(
+                'PUT', upload_url, remaining, content=piece,
+                headers={'Content-Range': chunk_range(start, len(piece), total)}
+            )
+
+        response = await self.google_service.policy.acall('drive', attempt, response_status)
+        if response.status_code == 308:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    @timed_async_call
+    @tracked_async_write
+    async def copy_file(self, file_id, file_name, folder_id):
+        """Copy an existing Drive file into a folder server-side"""
+        try:
+            response = await self._request(
+                'POST', f"{DRIVE_FILES_URL}/{file_id}/copy",
+                params={'fields': 'id'}, json={'name': file_name, 'parents': [folder_id]}
+            )
+            new_file_id = response.json().get('id')
+            if not new_file_id:
+                print(f"❌ Failed to get file ID for copy: {file_name}")
+                return None
+
+            print(f"✅ File copied: {file_name} (ID: {new_file_id})")
+            await self._share_file(new_file_id, file_name)
+            return new_file_id
+
+        except Exception as e:
+            print(f"❌ Error copying file {file_id}: {e}")
+            return None
+
+    @timed_async_call
+    @tracked_async_write
+    async def update_spreadsheet(self, spreadsheet_id, spreadsheet_config, laporan_data):
+        """Update Google Spreadsheet with report data"""
+        try:
+            if not spreadsheet_id:
+                print("❌ Spreadsheet ID is required")
+                return False
+
+            print(f"📊 Updating spreadsheet: {spreadsheet_id}")
+            row_data = spreadsheet_config.prepare_row_data(laporan_data, 0)
+            append_range = quote(spreadsheet_config.get_append_range(), safe='')
+
+            response = await self._request(
+                'POST', f"{SHEETS_URL}/{spreadsheet_id}/values/{append_range}:append",
+                params={'valueInputOption': 'RAW', 'insertDataOption': 'INSERT_ROWS'},
+                json={'values': [row_data]}
+            )
+
+            updates = response.json().get('updates', {})
+            updated_rows = updates.get('updatedRows', 0)
+            if updated_rows > 0:
+                print(f"✅ Successfully added {updated_rows} row(s) to spreadsheet")
+                print(f"📍 Updated range: {updates.get('updatedRange', 'Unknown')}")
+                return True
+            print(f"⚠️ No rows were added to spreadsheet")
+            return False
+
+        except Exception as e:
+            print(f"❌ Error updating spreadsheet: {e}")
+            return False
+
+    @timed_async_call
+    async def test_spreadsheet_access(self, spreadsheet_id):
+        """Test access to spreadsheet"""
+        try:
+            response = await self._request('GET', f"{SHEETS_URL}/{spreadsheet_id}", params={'fields': 'properties.title'})
+            title = response.json().get('properties', {}).get('title', 'Unknown')
+            print(f"✅ Spreadsheet access confirmed: '{title}'")
+            return True
+        except Exception as e:
+            print(f"❌ Error accessing spreadsheet: {e}")
+            return False
+
+    @timed_async_call
+    async def delete_file_or_folder(self, file_id):
+        """Delete file or folder from Google Drive"""
+        try:
+            await self._request('DELETE', f"{DRIVE_FILES_URL}/{file_id}")
+            print(f"✅ Successfully deleted file/folder: {file_id}")
+            return True
+        except Exception as e:
+            print(f"❌ Error deleting file/folder {file_id}: {e}")
+            return False
+
+    @timed_async_call
+    async def list_files_in_folder(self, folder_id, max_results=100):
+        """List files in a Google Drive folder"""
+        try:
+            response = await self._request('GET', DRIVE_FILES_URL, params={
+                'q': f"'{folder_id}' in parents and trashed=false",
+                'pageSize': max_results,
+                'fields': "nextPageToken, files(id, name, mimeType, createdTime, size)"
+            })
+            files = response.json().get('files', [])
+            print(f"📁 Found {len(files)} files in folder {folder_id}")
+            return files
+        except Exception as e:
+            print(f"❌ Error listing files in folder {folder_id}: {e}")
+            return []
+
+    @timed_async_call
+    async def get_spreadsheet_info(self, spreadsheet_id):
+        """Get basic information about a spreadsheet"""
+        try:
+            response = await self._request(
+                'GET', f"{SHEETS_URL}/{spreadsheet_id}", params={'fields': 'properties,sheets.properties'}
+            )
+            spreadsheet = response.json()
+            properties = spreadsheet.get('properties', {})
+            sheets = spreadsheet.get('sheets', [])
+
+            info = {
+                'title': properties.get('title', 'Unknown'),
+                'locale': properties.get('locale', 'Unknown'),
+                'timeZone': properties.get('timeZone', 'Unknown'),
+                'sheet_count': len(sheets),
+                'sheets': [sheet.get('properties', {}).get('title', f'Sheet{i+1}')
+                          for i, sheet in enumerate(sheets)]
+            }
+            print(f"📊 Spreadsheet info: {info}")
+            return info
+        except Exception as e:
+            print(f"❌ Error getting spreadsheet info: {e}")
+            return None
+
+    def get_folder_link(self, folder_id):
+        """Get shareable link for Google Drive folder"""
+        return self.google_service.get_folder_link(folder_id)
+
+    def get_file_link(self, file_id):
+        """Get shareable link for Google Drive file"""
+        return self.google_service.get_file_link(file_id)
+
+    def shutdown(self, wait=True):
+        """Nothing to stop, the HTTP client is closed by close()"""
+
+    async def close(self):
+        """Close the shared HTTP client"""
+        await self._client.aclose()
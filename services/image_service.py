@@ -0,0 +1,117 @@
+import io
+import os
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from services.metrics import metrics
+
+def _normalize(source, max_size, quality):
+    """Resize and re-encode a JPEG without metadata, returns new bytes or None to keep the original"""
+    with Image.open(source) as image:
+        if image.format != 'JPEG':
+            return None
+        # Rotasi dari EXIF diterapkan dulu karena EXIF akan dibuang
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+
+        output = io.BytesIO()
+        # Tanpa exif/icc_profile: metadata (lokasi, kamera, thumbnail) tidak ikut tersimpan
+        image.save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+        return output.getvalue()
+
+def normalize_bytes(data, max_size, quality):
+    """Worker entry point for in-memory photos, returns the smaller of original and re-encoded bytes"""
+    result = _normalize(io.BytesIO(data), max_size, quality)
+    if result is None or len(result) >= len(data):
+        return data
+    return result
+
+def normalize_file(filepath, max_size, quality):
+    """Worker entry point for spooled photos, rewrites the file in place, returns its new size"""
+    original_size = os.path.getsize(filepath)
+    result = _normalize(filepath, max_size, quality)
+    if result is None or len(result) >= original_size:
+        return original_size
+
+    tmp_path = filepath + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(result)
+    os.replace(tmp_path, filepath)
+    return len(result)
+
+class ImageNormalizer:
+    def __init__(self, max_size=2560, quality=85, workers=None):
+        """Shrink JPEG photos in a process pool before they are uploaded
+
+        Decode/resize/encode JPEG memakan CPU dan menahan GIL, jadi dijalankan
+        di proses terpisah agar event loop bot tetap responsif. Pool proses
+        baru dibuat saat foto pertama dinormalisasi.
+        """
+        self.max_size = max_size
+        self.quality = quality
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+
+        self.normalize_seconds = metrics.histogram(
+            'image_normalize_seconds', 'Time to normalize one photo in the process pool'
+        )
+        self.bytes_in = metrics.counter(
+            'image_normalize_bytes_in_total', 'Photo bytes before normalization'
+        )
+        self.bytes_out = metrics.counter(
+            'image_normalize_bytes_out_total', 'Photo bytes after normalization'
+        )
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn: aman dipakai dari proses yang sudah punya banyak thread
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            print(f"✅ Image normalizer started with {self.workers} worker process(es)")
+        return self._executor
+
+    async def normalize_bytes(self, data):
+        """Normalize in-memory photo content, returns the bytes to upload"""
+        started = time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._pool(), normalize_bytes, data, self.max_size, self.quality
+            )
+        except Exception as e:
+            print(f"⚠️ Warning: Could not normalize photo, uploading original: {e}")
+            return data
+        self._record(started, len(data), len(result))
+        return result
+
+    async def normalize_file(self, filepath):
+        """Normalize a spooled photo in place, returns its size after normalization"""
+        started = time.perf_counter()
+        original_size = os.path.getsize(filepath)
+        try:
+            size = await asyncio.get_running_loop().run_in_executor(
+                self._pool(), normalize_file, filepath, self.max_size, self.quality
+            )
+        except Exception as e:
+            print(f"⚠️ Warning: Could not normalize {filepath}, uploading original: {e}")
+            return original_size
+        self._record(started, original_size, size)
+        return size
+
+    def _record(self, started, size_in, size_out):
+        self.normalize_seconds.observe(time.perf_counter() - started)
+        self.bytes_in.inc(size_in)
+        self.bytes_out.inc(size_out)
+
+    def shutdown(self, wait=True):
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,283 @@
+import bisect
+import functools
+import threading
+import time
+import weakref
+
+# Bucket default (detik) untuk histogram latency
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _label_key(labels):
+    """Turn label kwargs into a hashable, ordered key"""
+    if not labels:
+        return ()
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=None):
+    """Format a label key as Prometheus label text"""
+    items = list(key)
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    body = ",".join(f'{name}="{str(value)}"' for name, value in items)
+    return "{" + body + "}"
+
+def _format_value(value):
+    """Format numeric value for Prometheus text output"""
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _ShardOwner:
+    """Holds one thread's shard; garbage collected when that thread exits"""
+    __slots__ = ('values', '__weakref__')
+
+    def __init__(self):
+        self.values = {}
+
+class _ShardedMetric:
+    def __init__(self, name, help_text):
+        """Base for metrics recorded into per-thread shards
+
+        Setiap thread menulis ke dict miliknya sendiri sehingga pencatatan di
+        hot path tidak perlu lock. Lock hanya dipakai sekali saat thread baru
+        pertama kali mencatat, saat thread selesai (shard-nya digabung ke
+        _base) dan saat scrape menggabungkan semua shard.
+        """
+        self.name = name
+        self.help_text = help_text
+        self._local = threading.local()
+        self._base = {}
+        self._shards = []
+        # RLock: finalize bisa jalan (GC) di thread yang sedang memegang lock
+        self._lock = threading.RLock()
+
+    def _shard(self):
+        owner = getattr(self._local, 'owner', None)
+        if owner is None:
+            owner = _ShardOwner()
+            self._local.owner = owner
+            with self._lock:
+                self._shards.append(owner.values)
+            # Thread per request (Flask threaded=True) tidak boleh meninggalkan shard
+            weakref.finalize(owner, self._retire, owner.values)
+        return owner.values
+
+    def _retire(self, shard):
+        with self._lock:
+            for i, live in enumerate(self._shards):
+                if live is shard:
+                    del self._shards[i]
+                    break
+            self._merge(self._base, shard)
+
+    def _merge(self, target, shard):
+        raise NotImplementedError
+
+    def _totals(self):
+        # Dijumlahkan di bawah lock yang sama dengan _retire: shard yang sedang
+        # digabung ke _base tidak boleh ikut terhitung dua kali
+        totals = {}
+        with self._lock:
+            for shard in [self._base] + self._shards:
+                self._merge(totals, shard)
+        return totals
+
+class Counter(_ShardedMetric):
+    def inc(self, amount=1, **labels):
+        """Increase counter"""
+        shard = self._shard()
+        key = _label_key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def _merge(self, target, shard):
+        for key, value in list(shard.items()):
+            target[key] = target.get(key, 0) + value
+
+    def value(self, **labels):
+        """Get current counter value"""
+        return self._totals().get(_label_key(labels), 0)
+
+    def render(self):
+        """Render counter in Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in self._totals().items():
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Gauge:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._functions = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        """Set gauge value"""
+        self._values[_label_key(labels)] = value
+
+    def set_function(self, function, **labels):
+        """Compute the gauge value with a callback at scrape time"""
+        self._functions[_label_key(labels)] = function
+
+    def inc(self, amount=1, **labels):
+        """Increase gauge value"""
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        """Decrease gauge value"""
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        """Get current gauge value"""
+        key = _label_key(labels)
+        if key in self._functions:
+            return self._functions[key]()
+        return self._values.get(key, 0)
+
+    def render(self):
+        """Render gauge in Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        values = dict(self._values)
+        for key, function in list(self._functions.items()):
+            try:
+                values[key] = function()
+            except Exception as e:
+                print(f"⚠️ Warning: Could not compute gauge {self.name}: {e}")
+        for key, value in values.items():
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Histogram(_ShardedMetric):
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """Record one observation"""
+        shard = self._shard()
+        key = _label_key(labels)
+        series = shard.get(key)
+        if series is None:
+            # [count per bucket..., +Inf bucket, sum, count]
+            series = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            shard[key] = series
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def time(self, **labels):
+        """Context manager that observes the elapsed time of its block"""
+        return _Timer(self, labels)
+
+    def _merge(self, target, shard):
+        for key, series in list(shard.items()):
+            total = target.get(key)
+            if total is None:
+                target[key] = list(series)
+            else:
+                for i, value in enumerate(series):
+                    total[i] += value
+
+    def count(self, **labels):
+        """Get number of observations"""
+        series = self._totals().get(_label_key(labels))
+        return series[-1] if series else 0
+
+    def render(self):
+        """Render histogram in Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in self._totals().items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}"
+                )
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, help_text, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {type(metric).__name__}")
+            return metric
+
+    def counter(self, name, help_text):
+        """Get or create a counter"""
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name, help_text):
+        """Get or create a gauge"""
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        """Get or create a histogram"""
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def render(self):
+        """Render all metrics in Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Registry global yang dipakai seluruh aplikasi
+metrics = MetricsRegistry()
+
+# Metric hot path yang dipakai bersama oleh bot dan service
+handler_seconds = metrics.histogram(
+    'bot_handler_seconds', 'Time spent in each conversation handler'
+)
+handler_errors = metrics.counter(
+    'bot_handler_errors_total', 'Exceptions raised by conversation handlers'
+)
+
+def timed_handler(method):
+    """Record duration and errors of an async bot handler under its method name"""
+    name = method.__name__
+
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        except Exception:
+            handler_errors.inc(handler=name)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - started, handler=name)
+    return wrapper
@@ -0,0 +1,198 @@
+import os
+import asyncio
+import concurrent.futures
+import hashlib
+import time
+import uuid
+
+import httpx
+
+from services.metrics import metrics
+
+# Ukuran chunk download dari Telegram dan jumlah chunk yang boleh antre ke upload
+STREAM_CHUNK_SIZE = 256 * 1024
+STREAM_QUEUE_CHUNKS = 4
+# Upload dibatalkan kalau tidak ada chunk baru selama ini (download macet/dibatalkan)
+STREAM_STALL_TIMEOUT = 60
+
+# Penanda akhir stream di antrian chunk
+_END_OF_STREAM = object()
+
+class PhotoService:
+    def __init__(self, async_google_service, spool_dir='spool', spool_threshold=5 * 1024 * 1024, streaming=True,
+                 normalizer=None):
+        """Move photos from Telegram to Google Drive
+
+        Foto kecil di-download ke memori dan di-upload langsung tanpa menyentuh
+        disk. Foto di atas spool_threshold byte di-stream chunk demi chunk dari
+        Telegram ke sesi upload resumable Drive (download dan upload berjalan
+        bersamaan, memori tetap). Kalau streaming dimatikan, file besar ditulis
+        dulu ke direktori spool per user.
+
+        normalizer: ImageNormalizer opsional untuk mengecilkan JPEG sebelum
+        upload. Karena butuh file utuh, foto besar lewat spool, bukan stream.
+        """
+        self.google = async_google_service
+        self.spool_dir = spool_dir
+        self.spool_threshold = spool_threshold
+        self.streaming = streaming
+        self.normalizer = normalizer
+        self._http = None
+
+        self.transfer_seconds = metrics.histogram(
+            'photo_transfer_seconds', 'Telegram download plus Drive upload time per photo'
+        )
+        self.photo_bytes = metrics.counter(
+            'photo_bytes_total', 'Photo bytes transferred from Telegram to Drive'
+        )
+        self.disk_bytes = metrics.counter(
+            'photo_disk_bytes_written_total', 'Photo bytes written to local disk while transferring'
+        )
+
+    async def transfer_photo(self, bot, photo, user_id, filename, folder_id, dedupe=None):
+        """Download a Telegram photo and upload it to the Drive folder, returns Drive file ID
+
+        dedupe: coroutine function opsional (content_hash, size) yang dipanggil
+        setelah download. Kalau mengembalikan file ID, upload dilewati dan ID
+        itu yang dikembalikan. Path stream tidak di-hash karena upload sudah
+        berjalan selama download.
+        """
+        started = time.perf_counter()
+        telegram_file = await bot.get_file(photo.file_id)
+        size = telegram_file.file_size or photo.file_size or 0
+
+        if size > self.spool_threshold and self.streaming and not self.normalizer:
+            path = 'stream'
+            file_id = await self._transfer_streaming(telegram_file, filename, folder_id)
+        elif size > self.spool_threshold:
+            path = 'spool'
+            file_id = await self._transfer_via_spool(telegram_file, user_id, filename, folder_id, dedupe)
+        else:
+            path = 'memory'
+            data = await telegram_file.download_as_bytearray()
+            size = len(data)
+            file_id = None
+            if dedupe:
+                digest = await asyncio.to_thread(_hash_bytes, data)
+                file_id = await dedupe(digest, size)
+            if not file_id:
+                data = await self.normalizer.normalize_bytes(bytes(data)) if self.normalizer else bytes(data)
+                file_id = await self.google.upload_bytes_to_drive(data, filename, folder_id)
+
+        self.transfer_seconds.observe(time.perf_counter() - started, path=path)
+        if file_id:
+            self.photo_bytes.inc(size, path=path)
+        return file_id
+
+    async def _transfer_via_spool(self, telegram_file, user_id, filename, folder_id, dedupe=None):
+        """Transfer a large photo through a per-user spool file"""
+        user_dir = os.path.join(self.spool_dir, str(user_id))
+        os.makedirs(user_dir, exist_ok=True)
+        filepath = os.path.join(user_dir, f"{uuid.uuid4().hex}_{filename}")
+
+        try:
+            await telegram_file.download_to_drive(filepath)
+            size = os.path.getsize(filepath)
+            self.disk_bytes.inc(size)
+            if dedupe:
+                file_id = await dedupe(await asyncio.to_thread(_hash_file, filepath), size)
+                if file_id:
+                    return file_id
+            if self.normalizer:
+                await self.normalizer.normalize_file(filepath)
+            return await self.google.upload_to_drive(filepath, filename, folder_id)
+        finally:
+            # Cleanup spool file
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+    async def _transfer_streaming(self, telegram_file, filename, folder_id):
+        """Relay a large file from Telegram to a Drive resumable upload, chunk by chunk"""
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=httpx.Timeout(30.0))
+
+        # Antrian terbatas antara download (event loop) dan upload (thread executor)
+        chunks = asyncio.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+        upload = asyncio.ensure_future(
+            self.google.stream_upload_to_drive(
+                _iter_chunks(chunks, asyncio.get_running_loop()), filename, folder_id
+            )
+        )
+
+        try:
+            try:
+                async with self._http.stream('GET', telegram_file.file_path) as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                        if not await _put_chunk(chunks, chunk, upload):
+                            break
+                await _put_chunk(chunks, _END_OF_STREAM, upload)
+            except Exception as e:
+                print(f"❌ Error streaming '{filename}' from Telegram: {e}")
+                await _put_chunk(chunks, e, upload)
+
+            return await upload
+        except asyncio.CancelledError:
+            # /start atau batal: thread upload dihentikan sekarang, tidak menunggu
+            # STREAM_STALL_TIMEOUT sambil memegang slot executor
+            _abort_chunks(chunks, ConnectionAbortedError(f"Transfer of '{filename}' cancelled"))
+            upload.cancel()
+            raise
+
+    async def close(self):
+        """Close the HTTP client used for streaming downloads and the normalizer processes"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self.normalizer:
+            self.normalizer.shutdown(wait=False)
+
+def _hash_bytes(data):
+    """SHA-256 of photo content, used as the dedupe key"""
+    return hashlib.sha256(data).hexdigest()
+
+def _hash_file(filepath):
+    """SHA-256 of a spooled photo, read in chunks"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+async def _put_chunk(chunks, item, upload):
+    """Hand a chunk to the upload thread, waiting while the queue is full
+
+    Mengembalikan False kalau upload sudah selesai/gagal sehingga download dihentikan.
+    """
+    if upload.done():
+        return False
+    put = asyncio.ensure_future(chunks.put(item))
+    await asyncio.wait((put, upload), return_when=asyncio.FIRST_COMPLETED)
+    if not put.done():
+        put.cancel()
+        return False
+    return not upload.done()
+
+def _abort_chunks(chunks, error):
+    """Put an error marker in the chunk queue without waiting, dropping unread chunks if it is full"""
+    while True:
+        try:
+            chunks.put_nowait(error)
+            return
+        except asyncio.QueueFull:
+            chunks.get_nowait()
+
+def _iter_chunks(chunks, loop):
+    """Yield chunks from the asyncio queue (read from the upload thread) until the end marker"""
+    while True:
+        get = asyncio.run_coroutine_threadsafe(asyncio.wait_for(chunks.get(), STREAM_STALL_TIMEOUT), loop)
+        try:
+            item = get.result(STREAM_STALL_TIMEOUT + 5)
+        except (asyncio.TimeoutError, concurrent.futures.TimeoutError):
+            get.cancel()
+            raise TimeoutError("Telegram download stalled")
+        if item is _END_OF_STREAM:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
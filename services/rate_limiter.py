@@ -0,0 +1,146 @@
+import asyncio
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from services.metrics import metrics
+
+# Prioritas request keluar, dikirim lewat rate_limit_args={'priority': ...}
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BACKGROUND = 'background'
+
+class _TokenBucket:
+    def __init__(self, rate, burst):
+        """Token bucket: rate token per detik, maksimal burst token tersimpan"""
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def delay(self, now):
+        """Seconds until one token is available (0 when available now)"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def take(self):
+        self.tokens -= 1
+
+class TelegramRateLimiter(BaseRateLimiter):
+    def __init__(self, global_rate=30, private_chat_rate=1.0, group_chat_rate=20 / 60, burst=3, max_retries=3):
+        """Outbound Bot API scheduler with global and per-chat limits plus priority lanes
+
+        Semua request melewati bucket global (default 30/detik); request yang
+        punya chat_id juga melewati bucket chat tersebut (1/detik untuk chat
+        pribadi, 20/menit untuk grup). Request 'background' menunggu selama
+        masih ada request 'interactive' yang antre. RetryAfter dari Telegram
+        menahan chat tersebut (atau semua request kalau tanpa chat_id) selama
+        retry_after detik lalu request diulang, maksimal max_retries kali.
+        """
+        self.global_bucket = _TokenBucket(global_rate, max(burst, global_rate))
+        self.private_chat_rate = private_chat_rate
+        self.group_chat_rate = group_chat_rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self._chat_buckets = {}
+        self._interactive_waiting = 0
+        self._interactive_by_chat = {}
+
+        self.queue_delay = metrics.histogram(
+            'telegram_outbound_delay_seconds', 'Time outbound Bot API requests waited in the rate limiter'
+        )
+        self.throttled = metrics.counter(
+            'telegram_outbound_throttled_total', 'Outbound requests delayed by the rate limiter, by scope'
+        )
+        self.retry_after = metrics.counter(
+            'telegram_retry_after_total', 'RetryAfter (flood control) responses from Telegram'
+        )
+        metrics.gauge(
+            'telegram_outbound_interactive_waiting', 'Interactive requests waiting in the rate limiter'
+        ).set_function(lambda: self._interactive_waiting)
+
+    async def initialize(self):
+        """Nothing to set up, buckets are created on demand"""
+
+    async def shutdown(self):
+        """Forget per-chat state"""
+        self._chat_buckets.clear()
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                self._prune_chat_buckets()
+            # chat_id negatif = grup/channel, batasnya per menit
+            is_group = isinstance(chat_id, int) and chat_id < 0
+            bucket = _TokenBucket(self.group_chat_rate if is_group else self.private_chat_rate, self.burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _prune_chat_buckets(self):
+        # Buang bucket chat yang sudah lama tidak dipakai
+        now = time.monotonic()
+        for chat_id, bucket in list(self._chat_buckets.items()):
+            if now - bucket.updated > 300 and bucket.blocked_until < now:
+                del self._chat_buckets[chat_id]
+
+    async def _acquire(self, chat_id, priority):
+        chat_bucket = self._chat_bucket(chat_id) if chat_id is not None else None
+        interactive = priority != PRIORITY_BACKGROUND
+        if interactive:
+            self._interactive_waiting += 1
+            self._interactive_by_chat[chat_id] = self._interactive_by_chat.get(chat_id, 0) + 1
+        try:
+            while True:
+                now = time.monotonic()
+                if not interactive and self._interactive_by_chat.get(chat_id):
+                    # Request interaktif di chat yang sama jalan duluan
+                    self.throttled.inc(scope='priority')
+                    await asyncio.sleep(0.05)
+                    continue
+
+                global_wait = self.global_bucket.delay(now)
+                chat_wait = chat_bucket.delay(now) if chat_bucket else 0.0
+                if not interactive:
+                    # Token global disisakan untuk request interaktif yang sedang antre
+                    needed = 1 + self._interactive_waiting
+                    if self.global_bucket.tokens < needed:
+                        global_wait = max(global_wait, (needed - self.global_bucket.tokens) / self.global_bucket.rate)
+                if global_wait <= 0 and chat_wait <= 0:
+                    self.global_bucket.take()
+                    if chat_bucket:
+                        chat_bucket.take()
+                    return
+
+                self.throttled.inc(scope='chat' if chat_wait > global_wait else 'global')
+                await asyncio.sleep(max(global_wait, chat_wait))
+        finally:
+            if interactive:
+                self._interactive_waiting -= 1
+                self._interactive_by_chat[chat_id] -= 1
+                if not self._interactive_by_chat[chat_id]:
+                    del self._interactive_by_chat[chat_id]
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        """Wait for a slot, send the request and retry it after flood control"""
+        chat_id = data.get('chat_id')
+        priority = (rate_limit_args or {}).get('priority', PRIORITY_INTERACTIVE)
+
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            await self._acquire(chat_id, priority)
+            self.queue_delay.observe(time.monotonic() - started, priority=priority)
+
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self.retry_after.inc(endpoint=endpoint)
+                if attempt >= self.max_retries:
+                    raise
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+                bucket = self._chat_bucket(chat_id) if chat_id is not None else self.global_bucket
+                bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + retry_after)
+                print(f"⚠️ Telegram flood control on {endpoint} (chat {chat_id}), retrying in {retry_after}s")
@@ -0,0 +1,285 @@
+import asyncio
+import random
+import socket
+import threading
+import time
+
+import httplib2
+import httpx
+import requests
+import urllib3
+
+from services.metrics import metrics
+
+# Status yang layak diulang: rate limit dan error sementara di sisi Google
+RETRYABLE_STATUSES = frozenset((408, 429, 500, 502, 503, 504))
+
+# Request non-idempotent (POST/PATCH) hanya diulang bila Google pasti belum
+# memprosesnya: 429/503 ditolak sebelum diproses, error koneksi belum terkirim
+UNPROCESSED_STATUSES = frozenset((429, 503))
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'))
+
+# Nilai gauge google_circuit_state
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_HALF_OPEN = 'half_open'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_STATE_VALUES = {CIRCUIT_CLOSED: 0, CIRCUIT_HALF_OPEN: 1, CIRCUIT_OPEN: 2}
+
+google_retries = metrics.counter(
+    'google_retries_total', 'Google requests retried, by API and reason'
+)
+google_retry_giveups = metrics.counter(
+    'google_retry_giveups_total', 'Google requests that failed after retrying, by API and reason (attempts/deadline)'
+)
+google_retry_sleep = metrics.histogram(
+    'google_retry_sleep_seconds', 'Backoff sleep before a Google request retry'
+)
+google_circuit_rejections = metrics.counter(
+    'google_circuit_rejections_total', 'Google requests failed fast by an open circuit breaker, by API'
+)
+google_circuit_transitions = metrics.counter(
+    'google_circuit_transitions_total', 'Circuit breaker state changes, by API and new state'
+)
+google_circuit_state = metrics.gauge(
+    'google_circuit_state', 'Circuit breaker state per API (0 closed, 1 half-open, 2 open)'
+)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Google while its circuit breaker is open"""
+
+class CircuitBreaker:
+    def __init__(self, api, failure_threshold=5, reset_timeout=30.0):
+        """Fail fast after failure_threshold consecutive failures of one API
+
+        Setelah terbuka, request langsung gagal selama reset_timeout detik;
+        lalu satu request percobaan (half-open) dibiarkan lewat. Berhasil
+        menutup breaker, gagal membukanya lagi.
+        """
+        self.api = api
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        google_circuit_state.set(0, api=api)
+
+    def allow(self):
+        """Whether a request may be sent now"""
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._transition(CIRCUIT_HALF_OPEN)
+            # Half-open: hanya satu request percobaan dalam satu waktu
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self.state != CIRCUIT_CLOSED:
+                self._transition(CIRCUIT_CLOSED)
+                print(f"✅ Google {self.api} circuit closed, requests resumed")
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == CIRCUIT_HALF_OPEN or (
+                self.state == CIRCUIT_CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._opened_at = time.monotonic()
+                self._transition(CIRCUIT_OPEN)
+                print(f"⚠️ Google {self.api} circuit open after {self._failures} failure(s), "
+                      f"failing fast for {self.reset_timeout:.0f}s")
+
+    def _transition(self, state):
+        self.state = state
+        google_circuit_state.set(CIRCUIT_STATE_VALUES[state], api=self.api)
+        google_circuit_transitions.inc(api=self.api, state=state)
+
+class RetryPolicy:
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=8.0, deadline=30.0,
+                 failure_threshold=5, reset_timeout=30.0):
+        """Shared retry/backoff/circuit breaker policy for Google requests
+
+        Status 408/429/5xx dan error jaringan diulang dengan exponential
+        backoff + full jitter, maksimal max_attempts percobaan dan tidak
+        melewati deadline detik sejak percobaan pertama. Request yang tidak
+        idempotent (append baris, create/copy file) hanya diulang untuk
+        429/503 dan error koneksi, supaya tidak tercipta baris atau file
+        ganda. Error lain (400, 403, 404) langsung dikembalikan ke pemanggil.
+        Tiap API punya circuit breaker sendiri.
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, api):
+        """Circuit breaker of one API (drive/sheets)"""
+        with self._lock:
+            breaker = self._breakers.get(api)
+            if breaker is None:
+                breaker = CircuitBreaker(api, self.failure_threshold, self.reset_timeout)
+                self._breakers[api] = breaker
+            return breaker
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def retry_delay(self, api, attempt, started, reason):
+        """Backoff before the next retry, None when attempts or the deadline are used up"""
+        if attempt + 1 >= self.max_attempts:
+            google_retry_giveups.inc(api=api, reason='attempts')
+            return None
+        delay = self._backoff(attempt)
+        if time.monotonic() + delay - started >= self.deadline:
+            google_retry_giveups.inc(api=api, reason='deadline')
+            return None
+        google_retries.inc(api=api, reason=reason)
+        google_retry_sleep.observe(delay)
+        return delay
+
+    def _settle(self, breaker, api, attempt, started, result, error, status_of, idempotent):
+        """Decide what to do after one attempt, returns the backoff delay or None when done"""
+        if error is not None:
+            reason = 'network' if is_network_error(error) else None
+            retryable = idempotent or is_connect_error(error)
+        else:
+            status = status_of(result)
+            reason = str(status) if status in RETRYABLE_STATUSES else None
+            retryable = is_retryable_status(status, idempotent)
+
+        if reason is None:
+            # Google menjawab (berhasil atau error permanen seperti 404): layanan sehat
+            breaker.record_success()
+            return None
+
+        breaker.record_failure()
+        if not retryable:
+            # Mungkin sudah diproses Google, mengulang bisa membuat data ganda
+            google_retry_giveups.inc(api=api, reason='not_idempotent')
+            return None
+        return self.retry_delay(api, attempt, started, reason)
+
+    def _admit(self, breaker, api):
+        if not breaker.allow():
+            google_circuit_rejections.inc(api=api)
+            raise CircuitOpenError(f"Google {api} is unavailable, circuit breaker open")
+
+    def call(self, api, attempt, status_of, idempotent=True):
+        """Run attempt(remaining_seconds) under the policy from a worker thread
+
+        Mengembalikan hasil attempt terakhir (termasuk response error yang
+        tidak diulang) atau melempar exception attempt terakhir. idempotent
+        False untuk request yang tidak aman dikirim dua kali.
+        """
+        breaker = self.breaker(api)
+        started = time.monotonic()
+        for n in range(self.max_attempts):
+            self._admit(breaker, api)
+            result, error = None, None
+            try:
+                result = attempt(self.deadline - (time.monotonic() - started))
+            except Exception as e:
+                error = e
+
+            delay = self._settle(breaker, api, n, started, result, error, status_of, idempotent)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return result
+            time.sleep(delay)
+
+    async def acall(self, api, attempt, status_of, idempotent=True):
+        """Async variant of call(), attempt returns a coroutine"""
+        breaker = self.breaker(api)
+        started = time.monotonic()
+        for n in range(self.max_attempts):
+            self._admit(breaker, api)
+            result, error = None, None
+            try:
+                result = await attempt(self.deadline - (time.monotonic() - started))
+            except Exception as e:
+                error = e
+
+            delay = self._settle(breaker, api, n, started, result, error, status_of, idempotent)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return result
+            await asyncio.sleep(delay)
+
+def is_network_error(error):
+    """Connection and timeout errors of httplib2, requests and httpx"""
+    if isinstance(error, requests.exceptions.RequestException):
+        return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+    return isinstance(error, (OSError, httplib2.HttpLib2Error, httpx.TransportError))
+
+def is_connect_error(error):
+    """Errors raised before the request reached Google, safe to retry for any method"""
+    if isinstance(error, requests.exceptions.RequestException):
+        reason = error.args[0] if error.args else None
+        if isinstance(reason, urllib3.exceptions.MaxRetryError):
+            reason = reason.reason
+        # NewConnectionError (DNS, connection refused) turunan ConnectTimeoutError
+        return isinstance(reason, urllib3.exceptions.ConnectTimeoutError)
+    if isinstance(error, httpx.TransportError):
+        return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+    return isinstance(error, (ConnectionRefusedError, socket.gaierror, httplib2.ServerNotFoundError))
+
+def is_idempotent(method):
+    """Whether an HTTP method may be sent twice without side effects"""
+    return method.upper() in IDEMPOTENT_METHODS
+
+def is_retryable_status(status, idempotent=True):
+    """Whether a response status may be retried for an (non-)idempotent request"""
+    return status in (RETRYABLE_STATUSES if idempotent else UNPROCESSED_STATUSES)
+
+def response_status(response):
+    """Status of a requests/httpx response, 403 rate limit errors count as 429"""
+    status = response.status_code
+    if status == 403 and b'ateLimitExceeded' in response.content:
+        return 429
+    return status
+
+def httplib2_status(result):
+    """Status of an httplib2 (response, content) pair, 403 rate limit errors count as 429"""
+    response, content = result
+    if response.status == 403 and b'ateLimitExceeded' in (content or b''):
+        return 429
+    return response.status
+
+class RetryingHttp:
+    def __init__(self, http, policy, api):
+        """httplib2-compatible wrapper that sends every googleapiclient request through the policy"""
+        self.http = http
+        self.policy = policy
+        self.api = api
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        # Body berupa stream tidak bisa dikirim ulang
+        if hasattr(body, 'read'):
+            return self.http.request(uri, method, body=body, headers=headers, **kwargs)
+        return self.policy.call(
+            self.api,
+            lambda remaining: self.http.request(uri, method, body=body, headers=headers, **kwargs),
+            httplib2_status,
+            idempotent=is_idempotent(method)
+        )
+
+    def __getattr__(self, name):
+        # credentials, timeout, connections, dll tetap milik AuthorizedHttp
+        return getattr(self.http, name)
@@ -1,11 +1,20 @@
+import copy
 import json
 import os
+from collections import OrderedDict
 from datetime import datetime
 
+# Isi sesi yang hanya berlaku di proses ini dan tidak ikut disimpan
+TRANSIENT_SESSION_KEYS = ('status_message',)
+
 class SessionService:
-    def __init__(self, google_service):
+    def __init__(self, google_service, recent_reports=50):
         self.user_sessions = {}
         self.google_service = google_service
+        
+        # Index foto (file_unique_id / hash konten) dari laporan terakhir per ID Ticket
+        self.recent_reports = OrderedDict()
+        self.recent_reports_limit = recent_reports
     
     def create_session(self, user_id):
         """Create new session"""
@@ -14,6 +23,7 @@ class SessionService:
             'id_ticket': None,
             'folder_id': None,
             'photos': [],
+            'photo_index': {},
             'data': None,
             'created_at': datetime.now().isoformat()
         }
@@ -35,4 +45,102 @@ class SessionService:
         if user_id in self.user_sessions:
             del self.user_sessions[user_id]
             return True
-        return False
\ No newline at end of file
+        return False
+    
+    def index_photo(self, user_id, key, entry):
+        """Register a photo entry under its file_unique_id or content hash"""
+        session = self.user_sessions.get(user_id)
+        if session and key:
+            session.setdefault('photo_index', {})[key] = entry
+    
+    def unindex_photo(self, user_id, entry):
+        """Remove every index key that points to a photo entry"""
+        session = self.user_sessions.get(user_id)
+        if not session:
+            return
+        index = session.get('photo_index', {})
+        for key in [key for key, value in index.items() if value is entry]:
+            del index[key]
+    
+    def find_photo(self, user_id, key):
+        """Find a photo already sent in this session or a recent report of the same ticket
+        
+        Returns (entry, scope) dengan scope 'session' atau 'ticket', atau (None, None).
+        """
+        session = self.user_sessions.get(user_id)
+        if not session or not key:
+            return None, None
+        
+        entry = session.get('photo_index', {}).get(key)
+        if entry is not None:
+            return entry, 'session'
+        
+        recent = self.recent_reports.get(session.get('id_ticket'))
+        if recent and recent.get(key):
+            return recent[key], 'ticket'
+        return None, None
+    
+    def remember_report(self, user_id):
+        """Keep the photo index of a sent report for later reports of the same ticket"""
+        session = self.user_sessions.get(user_id)
+        if not session or not session.get('id_ticket'):
+            return
+        
+        # Hanya foto yang benar-benar sudah ada di Drive
+        uploaded = {
+            key: {'id': entry['id'], 'name': entry['name']}
+            for key, entry in session.get('photo_index', {}).items()
+            if entry.get('id')
+        }
+        ticket = session['id_ticket']
+        index = self.recent_reports.pop(ticket, {})
+        index.update(uploaded)
+        self.recent_reports[ticket] = index
+        while len(self.recent_reports) > self.recent_reports_limit:
+            self.recent_reports.popitem(last=False)
+    
+    def snapshot_session(self, user_id):
+        """Picklable copy of one user's session, None when the user has no session"""
+        session = self.user_sessions.get(user_id)
+        if session is None:
+            return None
+        return copy.deepcopy({key: value for key, value in session.items() if key not in TRANSIENT_SESSION_KEYS})
+    
+    def snapshot(self, overrides=None):
+        """Picklable copy of the sessions and recent report indexes
+        
+        overrides: {user_id: hasil snapshot_session()} yang dipakai
+        menggantikan sesi user tersebut (None berarti user belum punya sesi).
+        """
+        sessions = {
+            user_id: {key: value for key, value in session.items() if key not in TRANSIENT_SESSION_KEYS}
+            for user_id, session in self.user_sessions.items()
+        }
+        for user_id, session in (overrides or {}).items():
+            if session is None:
+                sessions.pop(user_id, None)
+            else:
+                sessions[user_id] = session
+        # Satu deepcopy agar entry di 'photos' dan 'photo_index' tetap objek yang sama
+        return copy.deepcopy({'sessions': sessions, 'recent_reports': list(self.recent_reports.items())})
+    
+    def restore(self, state):
+        """Load sessions saved by snapshot(), returns the number of sessions restored
+        
+        Foto yang uploadnya belum selesai (id None) dibuang dari sesi dan
+        dicatat di 'failed_photos', sehingga user diminta mengirim ulang
+        sebelum laporan dikirim.
+        """
+        if not state:
+            return 0
+        for user_id, session in state.get('sessions', {}).items():
+            unfinished = [entry['name'] for entry in session.get('photos', []) if not entry.get('id')]
+            if unfinished:
+                session.setdefault('failed_photos', []).extend(unfinished)
+            session['photos'] = [entry for entry in session.get('photos', []) if entry.get('id')]
+            session['photo_index'] = {
+                key: entry for key, entry in session.get('photo_index', {}).items() if entry.get('id')
+            }
+            self.user_sessions[user_id] = session
+        self.recent_reports = OrderedDict(state.get('recent_reports', []))
+        return len(state.get('sessions', {}))
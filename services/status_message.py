@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+from telegram.error import BadRequest, NetworkError
+
+from services.metrics import metrics
+from services.rate_limiter import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+# Batas percobaan ulang update yang gagal karena jaringan/timeout
+MAX_FLUSH_RETRIES = 5
+
+status_updates = metrics.counter(
+    'bot_status_message_updates_total', 'Status message updates by action (sent/edited/throttled/skipped/failed)'
+)
+
+class StatusMessage:
+    def __init__(self, bot, chat_id, min_interval=1.0):
+        """One chat message that shows progress by being edited in place
+
+        Update pertama mengirim pesan baru, update berikutnya mengedit pesan
+        yang sama. Edit dibatasi paling sering sekali per min_interval detik;
+        update yang datang di antaranya digabung dan hanya teks terakhir yang
+        dikirim.
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.min_interval = min_interval
+        self.message = None
+        self._shown_text = None
+        self._pending_text = None
+        self._reply_markup = None
+        self._priority = PRIORITY_INTERACTIVE
+        self._last_sent = 0.0
+        self._delayed = None
+        self._retries = 0
+        self._lock = asyncio.Lock()
+
+    async def update(self, text, force=False, reply_markup=None, background=False):
+        """Show text, immediately if allowed or after the throttle interval
+
+        reply_markup hanya ikut saat pesan pertama kali dikirim (keyboard
+        balasan tidak bisa dipasang lewat edit). background=True untuk update
+        dari pekerjaan background, diantrekan di belakang balasan interaktif.
+        """
+        self._pending_text = text
+        self._priority = PRIORITY_BACKGROUND if background else PRIORITY_INTERACTIVE
+        if reply_markup is not None:
+            self._reply_markup = reply_markup
+        if self.message is None or force:
+            await self._flush()
+            return
+
+        if self._delayed and not self._delayed.done():
+            # Sudah ada edit terjadwal, teks terbaru ikut terkirim di situ
+            status_updates.inc(action='throttled')
+            return
+
+        delay = self._last_sent + self.min_interval - time.monotonic()
+        if delay <= 0:
+            await self._flush()
+        else:
+            status_updates.inc(action='throttled')
+            self._delayed = asyncio.get_running_loop().create_task(self._flush_later(delay))
+
+    async def _flush_later(self, delay):
+        await asyncio.sleep(delay)
+        await self._flush()
+
+    async def _flush(self):
+        async with self._lock:
+            text, self._pending_text = self._pending_text, None
+            if text is None or text == self._shown_text:
+                status_updates.inc(action='skipped')
+                return
+
+            try:
+                if self.message is not None:
+                    try:
+                        await self.bot.edit_message_text(
+                            text=text,
+                            chat_id=self.chat_id,
+                            message_id=self.message.message_id,
+                            rate_limit_args={'priority': self._priority}
+                        )
+                        status_updates.inc(action='edited')
+                    except BadRequest as e:
+                        if 'not modified' not in str(e).lower():
+                            raise
+                        status_updates.inc(action='skipped')
+                else:
+                    self.message = await self.bot.send_message(
+                        chat_id=self.chat_id,
+                        text=text,
+                        reply_markup=self._reply_markup,
+                        rate_limit_args={'priority': self._priority}
+                    )
+                    status_updates.inc(action='sent')
+                self._shown_text = text
+                self._retries = 0
+            except BadRequest as e:
+                # Pesan lama sudah dihapus/tidak bisa diedit: kirim pesan baru berikutnya
+                print(f"⚠️ Warning: Could not edit status message in chat {self.chat_id}: {e}")
+                status_updates.inc(action='failed')
+                self.message = None
+            except NetworkError as e:
+                # Gangguan sementara (termasuk TimedOut): teks disimpan dan dicoba lagi
+                print(f"⚠️ Warning: Could not update status message in chat {self.chat_id}, retrying: {e}")
+                status_updates.inc(action='failed')
+                self._retry(text)
+            except Exception as e:
+                print(f"⚠️ Warning: Could not update status message in chat {self.chat_id}: {e}")
+                status_updates.inc(action='failed')
+            finally:
+                self._last_sent = time.monotonic()
+
+    def _retry(self, text):
+        """Keep text pending and schedule another flush with backoff after a transient failure"""
+        if self._pending_text is None:
+            self._pending_text = text
+        if self._retries >= MAX_FLUSH_RETRIES:
+            # Tetap tertunda; update berikutnya akan mengirimnya
+            self._retries = 0
+            return
+        self._retries += 1
+
+        if self._delayed is None or self._delayed.done() or self._delayed is asyncio.current_task():
+            delay = self.min_interval * 2 ** (self._retries - 1)
+            self._delayed = asyncio.get_running_loop().create_task(self._flush_later(delay))
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+import traceback
+
+from services.metrics import metrics
+
+def extract_user_id(json_data):
+    """Get the sender user id from a raw update dict, None if there is none"""
+    for key, value in json_data.items():
+        if key == 'update_id' or not isinstance(value, dict):
+            continue
+        user = value.get('from') or value.get('user')
+        if isinstance(user, dict) and isinstance(user.get('id'), int):
+            return user['id']
+    return None
+
+class UpdateDispatcher:
+    def __init__(self, process_update, max_queue_size=1000, lanes=8):
+        """Bounded dispatcher that keeps each user's updates in order across parallel lanes
+
+        process_update: coroutine function yang menerima dict JSON update.
+        Update dari user yang sama selalu masuk lane yang sama (urutan terjaga),
+        sedangkan user berbeda diproses paralel di lane lain.
+        """
+        self.process_update = process_update
+        self.max_queue_size = max_queue_size
+        self.lane_count = max(1, lanes)
+        self.loop = None
+        self._lanes = []
+        self._workers = []
+        self._pending = 0
+        self._active = 0
+        self.accepting = True
+        self._lock = threading.Lock()
+
+        self.queue_depth = metrics.gauge(
+            'webhook_queue_depth', 'Updates waiting in the webhook queue'
+        )
+        self.lane_depth = metrics.gauge(
+            'webhook_lane_depth', 'Updates waiting per dispatcher lane'
+        )
+        self.queue_wait = metrics.histogram(
+            'webhook_queue_wait_seconds', 'Time between enqueue and worker start'
+        )
+        self.overflow = metrics.counter(
+            'webhook_queue_overflow_total', 'Updates rejected because the webhook queue was full'
+        )
+        self.processed = metrics.counter(
+            'webhook_updates_processed_total', 'Updates processed by webhook workers'
+        )
+        self.processing_time = metrics.histogram(
+            'webhook_update_processing_seconds', 'Time spent processing one update in a lane'
+        )
+
+    async def start(self):
+        """Create one queue and one worker per lane on the running loop"""
+        self.loop = asyncio.get_running_loop()
+        self._lanes = [asyncio.Queue() for _ in range(self.lane_count)]
+        self._workers = [
+            self.loop.create_task(self._worker(i), name=f"update-lane-{i}")
+            for i in range(self.lane_count)
+        ]
+        print(f"✅ Update dispatcher started with {self.lane_count} lanes (queue size {self.max_queue_size})")
+
+    async def stop(self):
+        """Cancel all lane workers"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def lane_for(self, json_data):
+        """Pick the lane for an update, keyed by user id so one user stays in order"""
+        user_id = extract_user_id(json_data)
+        key = user_id if user_id is not None else json_data.get('update_id', 0)
+        return hash(key) % self.lane_count
+
+    async def drain(self, timeout):
+        """Stop accepting, wait for queued and in-flight updates, then stop workers
+
+        Mengembalikan jumlah update yang ditinggalkan saat deadline habis.
+        """
+        self.accepting = False
+        deadline = self.loop.time() + timeout
+        while (self._pending or self._active) and self.loop.time() < deadline:
+            await asyncio.sleep(0.05)
+
+        abandoned = self._pending + self._active
+        await self.stop()
+        return abandoned
+
+    def submit(self, json_data):
+        """Enqueue a raw update from any thread, returns False if the queue is full"""
+        if not self.loop or not self._lanes:
+            raise RuntimeError("Update dispatcher is not started")
+        if not self.accepting:
+            return False
+
+        with self._lock:
+            if self._pending >= self.max_queue_size:
+                self.overflow.inc()
+                return False
+            self._pending += 1
+            self.queue_depth.set(self._pending)
+
+        lane = self.lane_for(json_data)
+        self.lane_depth.inc(lane=lane)
+        item = (time.monotonic(), json_data)
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is self.loop:
+            self._lanes[lane].put_nowait(item)
+        else:
+            self.loop.call_soon_threadsafe(self._lanes[lane].put_nowait, item)
+        return True
+
+    def depth(self):
+        """Get number of updates waiting in all lanes"""
+        return self._pending
+
+    async def _worker(self, lane):
+        queue = self._lanes[lane]
+        while True:
+            enqueued_at, json_data = await queue.get()
+            with self._lock:
+                self._pending -= 1
+                self._active += 1
+                self.queue_depth.set(self._pending)
+            self.lane_depth.dec(lane=lane)
+            self.queue_wait.observe(time.monotonic() - enqueued_at)
+
+            started = time.monotonic()
+            try:
+                await self.process_update(json_data)
+                self.processed.inc(status='ok')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.processed.inc(status='error')
+                print(f"❌ Error processing update in lane {lane}: {e}")
+                print(traceback.format_exc())
+            finally:
+                self.processing_time.observe(time.monotonic() - started)
+                with self._lock:
+                    self._active -= 1
+                queue.task_done()
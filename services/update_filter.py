@@ -0,0 +1,77 @@
+import threading
+
+from services.metrics import metrics
+
+class RecentUpdateIds:
+    def __init__(self, size=2048):
+        """Fixed-size window of recently accepted update_id values
+
+        Ring buffer menentukan id mana yang dibuang, dict id -> slot ring
+        dipakai untuk cek O(1). Memori tetap terbatas pada `size` id.
+        """
+        self.size = size
+        self._ring = [None] * size
+        self._ids = {}
+        self._position = 0
+        self._lock = threading.Lock()
+
+        self.duplicates = metrics.counter(
+            'webhook_duplicate_updates_total', 'Redelivered updates dropped by update_id'
+        )
+
+    def add_if_new(self, update_id):
+        """Remember update_id, returns False (and counts a drop) if it was already seen"""
+        with self._lock:
+            if update_id in self._ids:
+                self.duplicates.inc()
+                return False
+
+            evicted = self._ring[self._position]
+            if evicted is not None:
+                del self._ids[evicted]
+            self._ring[self._position] = update_id
+            self._ids[update_id] = self._position
+            self._position = (self._position + 1) % self.size
+            return True
+
+    def forget(self, update_id):
+        """Forget an update_id so a redelivery is accepted again"""
+        with self._lock:
+            # Slot ring ikut dikosongkan agar redelivery tidak punya dua slot
+            slot = self._ids.pop(update_id, None)
+            if slot is not None:
+                self._ring[slot] = None
+
+    def __contains__(self, update_id):
+        return update_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+class UpdatePreFilter:
+    def __init__(self, allowed_updates):
+        """Cheap filter on the raw update dict, run before Update.de_json
+
+        allowed_updates: jenis update yang benar-benar ditangani handler
+        (misal ['message']), sama dengan yang didaftarkan di set_webhook.
+        """
+        self.allowed_updates = tuple(allowed_updates)
+
+        self.filtered = metrics.counter(
+            'webhook_filtered_updates_total', 'Updates dropped by the pre-filter before deserialization'
+        )
+
+    def accepts(self, json_data):
+        """Check whether a raw update can reach any registered handler"""
+        for update_type in self.allowed_updates:
+            payload = json_data.get(update_type)
+            if isinstance(payload, dict):
+                # ConversationHandler butuh user pengirim untuk key percakapan
+                if 'from' not in payload and 'user' not in payload:
+                    self.filtered.inc(type=update_type)
+                    return False
+                return True
+
+        update_type = next((key for key in json_data if key != 'update_id'), 'unknown')
+        self.filtered.inc(type=update_type)
+        return False
@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+import time
+
+from services.metrics import metrics
+
+# Bucket fsync (detik), umumnya jauh di bawah bucket latency request
+FSYNC_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+class UpdateJournal:
+    def __init__(self, path='webhook_journal.jsonl', flush_interval_ms=20, compact_size=8 * 1024 * 1024):
+        """Append-only journal of accepted webhook updates with group commit
+
+        Setiap update yang diterima ditulis sebagai record 'update', dan record
+        'done' saat selesai diproses. Record dikumpulkan di buffer lalu ditulis
+        dan di-fsync sekaligus setiap flush_interval_ms. Saat startup, update
+        yang belum punya record 'done' dikembalikan untuk diproses ulang.
+        """
+        self.path = path
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.compact_size = compact_size
+        self._buffer = []
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._file = None
+        self._thread = None
+        self._closed = False
+
+        self.size_bytes = metrics.gauge(
+            'webhook_journal_size_bytes', 'Size of the webhook journal file'
+        )
+        self.pending_updates = metrics.gauge(
+            'webhook_journal_pending_updates', 'Journaled updates without a completion marker'
+        )
+        self.fsync_seconds = metrics.histogram(
+            'webhook_journal_fsync_seconds', 'Time spent in fsync per journal batch', buckets=FSYNC_BUCKETS
+        )
+        self.batch_records = metrics.histogram(
+            'webhook_journal_batch_records', 'Records written per journal batch',
+            buckets=(1, 2, 5, 10, 25, 50, 100, 250, 1000)
+        )
+        self.replay_seconds = metrics.gauge(
+            'webhook_journal_replay_seconds', 'Time spent reading the journal on startup'
+        )
+        self.replayed = metrics.counter(
+            'webhook_journal_replayed_total', 'Unfinished updates recovered from the journal'
+        )
+
+    def open(self):
+        """Read the journal, compact it and start the flusher, returns unfinished updates in order"""
+        started = time.monotonic()
+        unfinished = self._read_unfinished()
+
+        # Tulis ulang journal hanya berisi update yang belum selesai
+        self._pending = dict(unfinished)
+        self._rewrite()
+
+        self._thread = threading.Thread(target=self._run, name="journal-flusher", daemon=True)
+        self._thread.start()
+
+        elapsed = time.monotonic() - started
+        self.replay_seconds.set(elapsed)
+        self.replayed.inc(len(unfinished))
+        print(f"✅ Update journal opened: {len(unfinished)} unfinished update(s), read in {elapsed * 1000:.1f} ms")
+        return [payload for _, payload in unfinished]
+
+    def append_update(self, json_data):
+        """Journal an accepted update (written on the next group commit)"""
+        update_id = json_data['update_id']
+        with self._lock:
+            self._pending[update_id] = json_data
+            self._buffer.append({'type': 'update', 'update_id': update_id, 'payload': json_data})
+            self.pending_updates.set(len(self._pending))
+
+    def mark_done(self, update_id):
+        """Record the completion marker for an update"""
+        with self._lock:
+            if self._pending.pop(update_id, None) is None:
+                return
+            self._buffer.append({'type': 'done', 'update_id': update_id})
+            self.pending_updates.set(len(self._pending))
+
+    def pending_count(self):
+        """Get number of journaled updates not yet completed"""
+        return len(self._pending)
+
+    def flush(self):
+        """Write buffered records and fsync them as one batch"""
+        with self._file_lock:
+            with self._lock:
+                batch = self._buffer
+                self._buffer = []
+            if not batch or not self._file:
+                return
+
+            data = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in batch)
+            self._file.write(data)
+            self._file.flush()
+
+            started = time.monotonic()
+            os.fsync(self._file.fileno())
+            self.fsync_seconds.observe(time.monotonic() - started)
+            self.batch_records.observe(len(batch))
+
+            size = self._file.tell()
+            self.size_bytes.set(size)
+
+            # Compact kalau file sudah besar; hanya update yang belum selesai disimpan
+            if size >= self.compact_size:
+                self._rewrite_locked()
+
+    def close(self):
+        """Flush remaining records and stop the flusher"""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.flush()
+        with self._file_lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Error flushing update journal: {e}")
+
+    def _read_unfinished(self):
+        """Parse the journal file into [(update_id, payload)] without completion markers"""
+        if not os.path.exists(self.path):
+            return []
+
+        unfinished = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Baris terakhir bisa terpotong kalau proses mati saat menulis
+                    continue
+                if record.get('type') == 'update':
+                    unfinished[record['update_id']] = record['payload']
+                elif record.get('type') == 'done':
+                    unfinished.pop(record.get('update_id'), None)
+        return list(unfinished.items())
+
+    def _rewrite(self):
+        with self._file_lock:
+            self._rewrite_locked()
+
+    def _rewrite_locked(self):
+        """Atomically replace the journal with only the pending updates"""
+        with self._lock:
+            pending = list(self._pending.items())
+            # Record di buffer sudah tercermin di self._pending
+            self._buffer = []
+
+        if self._file:
+            self._file.close()
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for update_id, payload in pending:
+                record = {'type': 'update', 'update_id': update_id, 'payload': payload}
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self.size_bytes.set(self._file.tell())
+        self.pending_updates.set(len(pending))
@@ -0,0 +1,98 @@
+import asyncio
+import time
+import traceback
+
+from services.metrics import metrics
+
+class UploadQueue:
+    def __init__(self, per_session_limit=3):
+        """Background photo transfers per report session
+
+        Handler foto cukup menyerahkan transfer ke sini lalu langsung membalas
+        user. Maksimal per_session_limit transfer berjalan bersamaan per sesi,
+        sisanya menunggu giliran. send_report memanggil wait() sebagai barrier
+        sebelum menulis ke spreadsheet.
+        """
+        self.per_session_limit = max(1, per_session_limit)
+        self._tasks = {}
+        self._slots = {}
+
+        self.pending = metrics.gauge(
+            'photo_upload_queue_pending', 'Background photo transfers queued or running'
+        )
+        self.completed = metrics.counter(
+            'photo_upload_queue_completed_total', 'Background photo transfers by result'
+        )
+        self.barrier_wait = metrics.histogram(
+            'photo_upload_barrier_seconds', 'Time send_report waited for outstanding photo transfers'
+        )
+        self.pending.set_function(lambda: sum(len(tasks) for tasks in self._tasks.values()))
+
+    def submit(self, session_key, coro):
+        """Run a transfer coroutine in the background under the session's concurrency limit"""
+        slots = self._slots.setdefault(session_key, asyncio.Semaphore(self.per_session_limit))
+        tasks = self._tasks.setdefault(session_key, set())
+
+        async def run():
+            try:
+                async with slots:
+                    return await coro
+            finally:
+                # Coroutine yang dibatalkan sebelum mulai tetap ditutup
+                coro.close()
+
+        task = asyncio.get_running_loop().create_task(run(), name=f"photo-upload-{session_key}")
+        tasks.add(task)
+        task.add_done_callback(lambda t: self._finished(session_key, t))
+        return task
+
+    def _finished(self, session_key, task):
+        tasks = self._tasks.get(session_key)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                self._tasks.pop(session_key, None)
+                self._slots.pop(session_key, None)
+
+        if task.cancelled():
+            self.completed.inc(result='cancelled')
+        elif task.exception() is not None:
+            self.completed.inc(result='error')
+            error = task.exception()
+            print(f"❌ Background photo upload failed: {error}")
+            traceback.print_exception(type(error), error, error.__traceback__)
+        elif task.result():
+            self.completed.inc(result='ok')
+        else:
+            self.completed.inc(result='failed')
+
+    def outstanding(self, session_key):
+        """Number of transfers still queued or running for a session"""
+        return len(self._tasks.get(session_key, ()))
+
+    async def wait(self, session_key, timeout=None):
+        """Wait until every transfer of the session has finished, returns the number still running"""
+        tasks = list(self._tasks.get(session_key, ()))
+        if not tasks:
+            return 0
+
+        started = time.perf_counter()
+        done, still_running = await asyncio.wait(tasks, timeout=timeout)
+        self.barrier_wait.observe(time.perf_counter() - started)
+        return len(still_running)
+
+    async def cancel(self, session_key):
+        """Cancel the session's outstanding transfers (laporan dibatalkan)"""
+        tasks = list(self._tasks.get(session_key, ()))
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def drain(self, timeout):
+        """Wait for all sessions' transfers during shutdown, returns the number abandoned"""
+        tasks = [task for tasks in self._tasks.values() for task in tasks]
+        if not tasks:
+            return 0
+        done, still_running = await asyncio.wait(tasks, timeout=max(0, timeout))
+        return len(still_running)
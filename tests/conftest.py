@@ -0,0 +1,15 @@
+import pytest
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--run-benchmarks', action='store_true', default=False,
+        help='Run the benchmark tests (slow, numbers depend on the machine)'
+    )
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--run-benchmarks'):
+        return
+    skip = pytest.mark.skip(reason='benchmark, run with --run-benchmarks')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
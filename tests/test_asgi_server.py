@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+import uvicorn
+from werkzeug.serving import make_server
+
+import asgi_server
+import webhook_server
+from services.update_dispatcher import UpdateDispatcher
+from services.update_filter import UpdatePreFilter
+
+WEBHOOK_REQUESTS = 600
+CONCURRENCY_LEVELS = (1, 4, 32)
+
+def ready_runtime(runtime):
+    """Make a server's runtime accept updates without Telegram or Google"""
+    async def process_update(json_data):
+        await asyncio.sleep(0)
+
+    runtime.application = object()
+    runtime.prefilter = UpdatePreFilter(['message'])
+    runtime.journal = None
+    runtime.dispatcher = UpdateDispatcher(process_update, max_queue_size=WEBHOOK_REQUESTS * len(CONCURRENCY_LEVELS))
+    return runtime.dispatcher
+
+def update(update_id):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': 0, 'text': 'BGES',
+            'chat': {'id': update_id % 200, 'type': 'private'},
+            'from': {'id': update_id % 200, 'is_bot': False, 'first_name': 'Teknisi'}
+        }
+    }
+
+def requests_per_second(url, first_update_id, concurrency):
+    async def post_all():
+        update_ids = iter(range(first_update_id, first_update_id + WEBHOOK_REQUESTS))
+        statuses = []
+
+        async def client_worker(client):
+            for update_id in update_ids:
+                response = await client.post(url, json=update(update_id))
+                statuses.append(response.status_code)
+
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(client_worker(client) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+        assert statuses == [200] * WEBHOOK_REQUESTS
+        return WEBHOOK_REQUESTS / elapsed
+
+    return asyncio.run(post_all())
+
+def serve_flask(port):
+    """Run webhook_server's Flask app with its bot loop thread (benchmark server process)"""
+    dispatcher = ready_runtime(webhook_server.runtime)
+    webhook_server.start_bot_loop()
+    webhook_server.run_on_bot_loop(dispatcher.start())
+    make_server('127.0.0.1', port, webhook_server.app, threaded=True).serve_forever()
+
+def serve_asgi(port):
+    """Run asgi_server's app under uvicorn (benchmark server process)"""
+    dispatcher = ready_runtime(asgi_server.runtime)
+
+    async def app(scope, receive, send):
+        # Pengganti lifespan: dispatcher dijalankan di loop uvicorn
+        if scope['type'] == 'http' and dispatcher.loop is None:
+            await dispatcher.start()
+        await asgi_server.app(scope, receive, send)
+
+    uvicorn.run(app, host='127.0.0.1', port=port, lifespan='off', log_level='warning', access_log=False)
+
+def throughput(serve):
+    """Start serve() in its own process (server and load client do not share a GIL), req/s per concurrency"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    script = (
+        "import logging, sys\n"
+        "sys.path.insert(0, 'tests')\n"
+        "import test_asgi_server\n"
+        # Log per update sama untuk kedua server; dimatikan agar yang diukur hanya jalur request
+        "logging.disable(logging.INFO)\n"
+        f"test_asgi_server.{serve.__name__}({port})\n"
+    )
+    server = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                assert server.poll() is None and time.monotonic() < deadline
+                time.sleep(0.05)
+        return {
+            concurrency: requests_per_second(f"http://127.0.0.1:{port}/webhook", i * WEBHOOK_REQUESTS + 1, concurrency)
+            for i, concurrency in enumerate(CONCURRENCY_LEVELS)
+        }
+    finally:
+        server.terminate()
+        server.wait(10)
+
+@pytest.mark.benchmark
+def test_asgi_and_flask_webhook_throughput():
+    logging.disable(logging.INFO)
+    try:
+        flask = throughput(serve_flask)
+        asgi = throughput(serve_asgi)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    for concurrency in CONCURRENCY_LEVELS:
+        print(f"{concurrency:>2} client(s): Flask + bot loop thread {flask[concurrency]:.0f} req/s, "
+              f"ASGI (uvicorn) {asgi[concurrency]:.0f} req/s")
+    # Tanpa lompatan thread ke loop bot; di konkurensi tinggi parser h11 (tanpa httptools) yang membatasi
+    assert asgi[1] > flask[1]
+    assert asgi[4] > flask[4]
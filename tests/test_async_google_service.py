@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from bot import TelegramBot, SELECT_REPORT_TYPE
+from services.album_collector import AlbumCollector
+from services.async_google_service import AsyncGoogleService
+from services.session_service import SessionService
+from services.upload_queue import UploadQueue
+
+UPLOAD_SECONDS = 0.3
+
+class SleepingGoogleService:
+    """Stand-in for GoogleService whose uploads block the calling thread"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def upload_bytes_to_drive(self, data, file_name, folder_id, mime_type=None):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(UPLOAD_SECONDS)
+            return f"id-{file_name}"
+        finally:
+            with self._lock:
+                self.active -= 1
+
+def make_bot(google_service):
+    bot = TelegramBot.__new__(TelegramBot)
+    bot.session_service = SessionService(google_service)
+    bot.upload_queue = UploadQueue()
+    bot.album_collector = AlbumCollector(lambda session_key, parts: None)
+    return bot
+
+def make_start_update(user_id, replies):
+    async def reply_text(text, **kwargs):
+        replies.append(time.perf_counter())
+
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=user_id, first_name="Teknisi"),
+        message=SimpleNamespace(reply_text=reply_text)
+    )
+
+def test_concurrent_uploads_do_not_delay_start():
+    google_service = SleepingGoogleService()
+
+    async def scenario():
+        async_google = AsyncGoogleService(google_service, max_workers=4, max_queued=8)
+        bot = make_bot(google_service)
+        uploads = [
+            asyncio.create_task(async_google.upload_bytes_to_drive(b"x", f"foto_{i}.jpg", "folder"))
+            for i in range(20)
+        ]
+        # Beri kesempatan upload mulai dan memenuhi executor
+        await asyncio.sleep(0.05)
+
+        replies = []
+        started = time.perf_counter()
+        state = await bot.start(make_start_update(42, replies), None)
+        start_latency = replies[0] - started
+        uploads_running = not all(task.done() for task in uploads)
+
+        results = await asyncio.gather(*uploads)
+        async_google.shutdown()
+        return state, start_latency, uploads_running, results
+
+    state, start_latency, uploads_running, results = asyncio.run(scenario())
+
+    assert state == SELECT_REPORT_TYPE
+    assert uploads_running
+    assert start_latency < 0.05
+    assert results == [f"id-foto_{i}.jpg" for i in range(20)]
+
+def test_executor_is_bounded():
+    google_service = SleepingGoogleService()
+
+    async def scenario():
+        async_google = AsyncGoogleService(google_service, max_workers=4, max_queued=8)
+        await asyncio.gather(*(
+            async_google.upload_bytes_to_drive(b"x", f"foto_{i}.jpg", "folder") for i in range(20)
+        ))
+        async_google.shutdown()
+        return async_google
+
+    async_google = asyncio.run(scenario())
+
+    assert google_service.max_active == 4
+    assert async_google.saturated.value(method='upload_bytes_to_drive') > 0
@@ -0,0 +1,60 @@
+import time
+
+from services.folder_pool import FolderPool, CLAIMED_PROPERTY
+
+class FakeDrive:
+    """Stand-in for GoogleService with leftover pool folders from a previous run"""
+
+    def __init__(self, leftovers, non_empty=()):
+        self.leftovers = leftovers
+        self.non_empty = set(non_empty)
+        self.properties = {}
+        self.created = 0
+
+    def find_folders(self, name_prefix):
+        return self.leftovers
+
+    def folder_is_empty(self, folder_id):
+        return folder_id not in self.non_empty
+
+    def create_folder(self, folder_name):
+        self.created += 1
+        return f"new-{self.created}"
+
+    def set_app_property(self, file_id, key, value):
+        self.properties[file_id] = {key: value}
+        return True
+
+    def rename_file(self, file_id, new_name):
+        return True
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_only_unclaimed_empty_leftovers_are_adopted():
+    drive = FakeDrive(
+        [{'id': 'claimed', 'appProperties': {CLAIMED_PROPERTY: 'true'}}, {'id': 'with-photos'}, {'id': 'empty'}],
+        non_empty=['with-photos']
+    )
+    pool = FolderPool(drive, size=1, refill_per_minute=6000)
+    pool.start()
+    try:
+        assert wait_for(lambda: len(pool._folders) == 1)
+        assert pool.claim('Laporan') == 'empty'
+    finally:
+        pool.stop()
+
+def test_deferred_claim_is_marked_in_background():
+    drive = FakeDrive([])
+    pool = FolderPool(drive, size=1, refill_per_minute=6000)
+    pool.start()
+    try:
+        assert wait_for(lambda: len(pool._folders) == 1)
+        folder_id = pool.claim(None)
+        assert wait_for(lambda: folder_id in drive.properties)
+        assert drive.properties[folder_id] == {CLAIMED_PROPERTY: 'true'}
+    finally:
+        pool.stop()
@@ -0,0 +1,217 @@
+import io
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from googleapiclient.http import MediaIoBaseUpload
+
+import services.google_service as google_service_module
+from services.google_service import GoogleService
+
+THREADS = 8
+STRESS_UPLOADS = 32
+
+class FakeCredentials:
+    """Service account credentials whose token refresh takes a while"""
+
+    def __init__(self):
+        self.valid = False
+        self.token = None
+        self.refreshes = 0
+
+    def refresh(self, request):
+        time.sleep(0.05)
+        self.refreshes += 1
+        self.token = 'token'
+        self.valid = True
+
+    def before_request(self, request, method, url, headers):
+        if not self.valid:
+            self.refresh(request)
+        headers['authorization'] = f'Bearer {self.token}'
+
+class DriveStub(ThreadingHTTPServer):
+    """Local stand-in for the Drive resumable upload and permission endpoints"""
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0):
+        super().__init__(('127.0.0.1', 0), DriveStubHandler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}/"
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.files = {}
+        self.permissions = []
+        self.active = 0
+        self.max_active = 0
+        self.unauthorized = 0
+
+class DriveStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body=None, headers=None):
+        content = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def handle_one_request(self):
+        # Hitung request yang sedang diproses bersamaan
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            super().handle_one_request()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def do_POST(self):
+        server = self.server
+        body = self.body()
+        if self.headers.get('authorization') != 'Bearer token':
+            with server.lock:
+                server.unauthorized += 1
+        time.sleep(server.latency)
+
+        if self.path.startswith('/upload/drive/v3/files'):
+            with server.lock:
+                session = str(len(server.sessions))
+                server.sessions[session] = {'metadata': json.loads(body), 'data': bytearray()}
+            self.reply(200, {}, {'Location': f"{server.url}upload/session/{session}"})
+        elif re.match(r'/drive/v3/files/[^/]+/permissions', self.path):
+            with server.lock:
+                server.permissions.append(self.path.split('/')[4])
+            self.reply(200, {'id': 'anyone'})
+        else:
+            self.reply(404, {'error': {'code': 404}})
+
+    def do_PUT(self):
+        server = self.server
+        session = server.sessions[self.path.rsplit('/', 1)[1]]
+        data = self.body()
+        time.sleep(server.latency)
+
+        byte_range, total = self.headers['Content-Range'].split(' ')[1].split('/')
+        if byte_range != '*':
+            session['data'].extend(data)
+        received = len(session['data'])
+
+        if total != '*' and received == int(total):
+            file_id = f"file-{self.path.rsplit('/', 1)[1]}"
+            with server.lock:
+                server.files[file_id] = (session['metadata']['name'], bytes(session['data']))
+            self.reply(200, {'id': file_id})
+        else:
+            # Seperti Drive: 308 Resume Incomplete tanpa header Location
+            self.reply(308, None, {'Range': f"bytes=0-{received - 1}"} if received else {})
+
+@pytest.fixture
+def drive_stub(monkeypatch):
+    server = DriveStub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    # Client Drive diarahkan ke server lokal lewat rootUrl discovery document
+    discovery_document = google_service_module.discovery_document
+
+    def local_document(api):
+        document = json.loads(discovery_document(api))
+        document['rootUrl'] = server.url
+        document['baseUrl'] = server.url + document['servicePath']
+        return json.dumps(document)
+
+    monkeypatch.setattr(google_service_module, 'discovery_document', local_document)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def run_threads(target):
+    barrier = threading.Barrier(THREADS)
+    results = [None] * THREADS
+
+    def run(i):
+        barrier.wait()
+        results[i] = target()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def make_service():
+    google_service = GoogleService()
+    google_service.credentials = google_service._share_credentials(FakeCredentials())
+    return google_service
+
+def test_each_thread_gets_its_own_client_and_transport():
+    google_service = make_service()
+
+    def clients():
+        drive = google_service.service_drive
+        assert google_service.service_drive is drive
+        # RetryingHttp -> AuthorizedHttp -> httplib2.Http
+        return drive, drive._http.http.http, drive._http.credentials
+
+    results = run_threads(clients)
+
+    assert len({id(drive) for drive, http, credentials in results}) == THREADS
+    assert len({id(http) for drive, http, credentials in results}) == THREADS
+    assert all(credentials is google_service.credentials for drive, http, credentials in results)
+
+def test_expired_token_is_refreshed_once():
+    google_service = make_service()
+    credentials = google_service.credentials
+
+    run_threads(lambda: credentials.refresh(None))
+
+    assert credentials.refreshes == 1
+    assert credentials.valid
+
+def test_resume_incomplete_chunks_reach_media_upload(drive_stub):
+    google_service = make_service()
+    data = bytes(range(256)) * 4096
+    media = MediaIoBaseUpload(io.BytesIO(data), mimetype='image/jpeg', chunksize=256 * 1024, resumable=True)
+
+    # Empat chunk: tiga dijawab 308 tanpa Location, httplib2 tidak boleh menganggapnya redirect
+    result = google_service.service_drive.files().create(
+        body={'name': 'foto.jpg', 'parents': ['folder']}, media_body=media
+    ).execute()
+
+    assert drive_stub.files[result['id']] == ('foto.jpg', data)
+
+def test_parallel_uploads_share_one_token(drive_stub):
+    drive_stub.latency = 0.02
+    google_service = make_service()
+    photos = {f"foto_{i}.jpg": f"isi foto {i}".encode() * 1000 for i in range(STRESS_UPLOADS)}
+
+    with ThreadPoolExecutor(max_workers=STRESS_UPLOADS) as executor:
+        file_ids = list(executor.map(
+            lambda name: google_service.upload_bytes_to_drive(photos[name], name, 'folder'), photos
+        ))
+
+    assert all(file_ids) and len(set(file_ids)) == STRESS_UPLOADS
+    assert {drive_stub.files[file_id] for file_id in file_ids} == set(photos.items())
+    assert sorted(drive_stub.permissions) == sorted(file_ids)
+    assert google_service.credentials.refreshes == 1
+    assert drive_stub.unauthorized == 0
+    # Upload benar-benar paralel, bukan antri di satu transport
+    assert drive_stub.max_active > THREADS
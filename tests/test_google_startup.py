@@ -0,0 +1,71 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+import rsa
+
+COLD_STARTS = 3
+
+# Dijalankan di proses baru supaya import dan parsing discovery document benar-benar dingin
+STARTUP_SCRIPT = """
+import json, os, sys, time
+from google.oauth2 import service_account
+
+info = json.loads(os.environ['GOOGLE_SERVICE_ACCOUNT_JSON'])
+if sys.argv[1] == 'build':
+    # Cara lama di authenticate(): dua build() sebelum bot bisa menjawab (tanpa tes koneksi)
+    from googleapiclient.discovery import build
+    from services.google_service import SCOPES
+    started = time.perf_counter()
+    credentials = service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
+    build('drive', 'v3', credentials=credentials)
+    build('sheets', 'v4', credentials=credentials)
+    print(json.dumps({'startup': time.perf_counter() - started}))
+else:
+    from services.google_service import GoogleService
+    google_service = GoogleService()
+    started = time.perf_counter()
+    assert google_service.authenticate(check_connection=False)
+    startup = time.perf_counter() - started
+    started = time.perf_counter()
+    google_service.service_drive
+    google_service.service_sheets
+    print(json.dumps({'startup': startup, 'first_use': time.perf_counter() - started}))
+"""
+
+def service_account_json():
+    public_key, private_key = rsa.newkeys(1024)
+    return json.dumps({
+        'type': 'service_account',
+        'project_id': 'report-bot',
+        'private_key_id': 'key',
+        'private_key': private_key.save_pkcs1().decode(),
+        'client_email': 'bot@report-bot.iam.gserviceaccount.com',
+        'client_id': '1',
+        'token_uri': 'https://oauth2.googleapis.com/token',
+    })
+
+def cold_start(mode, environment):
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT, mode], capture_output=True, text=True, timeout=120,
+        env=environment, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+@pytest.mark.benchmark
+def test_authenticate_does_not_wait_for_client_builds():
+    environment = dict(os.environ, GOOGLE_SERVICE_ACCOUNT_JSON=service_account_json())
+
+    built = [cold_start('build', environment) for _ in range(COLD_STARTS)]
+    lazy = [cold_start('lazy', environment) for _ in range(COLD_STARTS)]
+
+    build_startup = min(run['startup'] for run in built) * 1000
+    lazy_startup = min(run['startup'] for run in lazy) * 1000
+    first_use = min(run['first_use'] for run in lazy) * 1000
+    print(f"build() at startup: {build_startup:.0f}ms; authenticate(): {lazy_startup:.0f}ms, "
+          f"then {first_use:.0f}ms for both clients on first use")
+
+    assert lazy_startup < build_startup
@@ -0,0 +1,77 @@
+import asyncio
+from concurrent.futures import Future
+
+from services.folder_pool import FolderPool
+from services.google_service import GoogleService
+from services.httpx_google_service import HttpxGoogleService
+
+class RecordingBatcher:
+    def __init__(self):
+        self.requests = []
+
+    def submit(self, build_request):
+        self.requests.append(build_request)
+        return Future()
+
+def test_share_goes_through_drive_batcher():
+    google_service = GoogleService.__new__(GoogleService)
+    google_service.share_parent_only = False
+    google_service.batcher = RecordingBatcher()
+
+    async def scenario():
+        service = HttpxGoogleService(google_service, http2=False)
+
+        async def no_http(*args, **kwargs):
+            raise AssertionError("permission sent outside the batcher")
+
+        service._send = no_http
+        await asyncio.gather(*(service._share_file(f"file-{i}", f"foto_{i}.jpg") for i in range(5)))
+        await service.close()
+
+    asyncio.run(scenario())
+
+    assert len(google_service.batcher.requests) == 5
+
+class PoolDrive:
+    def create_folder(self, folder_name):
+        return 'new-folder'
+
+def claim_outcomes(pool):
+    return {result: pool.claims.value(result=result) for result in ('hit', 'miss', 'rename_failed')}
+
+def test_pool_claim_records_one_outcome():
+    google_service = GoogleService.__new__(GoogleService)
+    google_service.folder_pool = FolderPool(PoolDrive(), size=2)
+    pool = google_service.folder_pool
+    pool._folders.extend(['pooled-1', 'pooled-2'])
+
+    async def scenario():
+        service = HttpxGoogleService(google_service, http2=False)
+        renames = iter([True, False])
+
+        async def rename_file(file_id, new_name):
+            return next(renames)
+
+        async def create_folder(folder_name):
+            return 'new-folder'
+
+        service.rename_file = rename_file
+        service.create_folder = create_folder
+        before = claim_outcomes(pool)
+        renamed = await service.claim_folder('Laporan 1')
+        after_hit = claim_outcomes(pool)
+        failed = await service.claim_folder('Laporan 2')
+        after_failure = claim_outcomes(pool)
+        await service.close()
+        return before, (renamed, after_hit), (failed, after_failure)
+
+    before, (renamed, after_hit), (failed, after_failure) = asyncio.run(scenario())
+
+    assert renamed == ('pooled-1', False)
+    assert after_hit['hit'] - before['hit'] == 1
+    assert failed == ('new-folder', False)
+    assert after_failure['hit'] == after_hit['hit']
+    assert after_failure['rename_failed'] - after_hit['rename_failed'] == 1
+    # Folder yang sudah di-rename tidak butuh marker appProperty
+    assert list(pool._unmarked) == []
+    assert list(pool._folders) == ['pooled-2']
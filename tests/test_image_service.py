@@ -0,0 +1,57 @@
+import asyncio
+import io
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from PIL import Image
+
+from services.image_service import ImageNormalizer
+
+BENCHMARK_PHOTOS = 24
+
+def camera_jpeg(width=4000, height=3000):
+    """Noisy 12 MP JPEG, roughly what a phone camera sends as a file"""
+    image = Image.frombytes('RGB', (width, height), os.urandom(width * height * 3))
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=92)
+    return output.getvalue()
+
+@pytest.mark.parametrize('server', ['webhook_server.py', 'asgi_server.py'])
+def test_spawned_workers_do_not_build_the_bot_runtime(server):
+    # Worker spawn menjalankan file utama dengan run_name '__mp_main__'
+    script = (
+        "import runpy, sys\n"
+        f"module = runpy.run_path({server!r}, run_name='__mp_main__')\n"
+        "assert module['runtime'] is None\n"
+        "assert 'bot_runtime' not in sys.modules and 'telegram' not in sys.modules\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+
+@pytest.mark.benchmark
+def test_normalize_throughput_per_core():
+    data = camera_jpeg()
+
+    async def photos_per_second(workers):
+        normalizer = ImageNormalizer(workers=workers)
+        try:
+            # Pemanasan: start proses worker dan import Pillow di sana
+            await asyncio.gather(*(normalizer.normalize_bytes(data) for _ in range(workers)))
+            started = time.perf_counter()
+            results = await asyncio.gather(*(normalizer.normalize_bytes(data) for _ in range(BENCHMARK_PHOTOS)))
+            elapsed = time.perf_counter() - started
+        finally:
+            normalizer.shutdown()
+        assert all(len(result) < len(data) for result in results)
+        return BENCHMARK_PHOTOS / elapsed
+
+    cores = os.cpu_count() or 1
+    single = asyncio.run(photos_per_second(1))
+    pooled = asyncio.run(photos_per_second(cores))
+    print(f"1 worker: {single:.2f} photos/s, {cores} workers: {pooled:.2f} photos/s "
+          f"({pooled / cores:.2f} per core)")
+
+    assert pooled >= single * min(cores, 4) * 0.5
@@ -0,0 +1,62 @@
+import threading
+
+from services.metrics import Counter, Histogram
+
+def run_in_threads(target, count):
+    for _ in range(count):
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+
+def test_counter_merges_shards_of_finished_threads():
+    counter = Counter('test_requests_total', 'test')
+    run_in_threads(lambda: counter.inc(status='ok'), 500)
+
+    assert counter._shards == []
+    assert counter.value(status='ok') == 500
+
+def test_histogram_merges_shards_of_finished_threads():
+    histogram = Histogram('test_request_seconds', 'test', buckets=(0.1, 1.0))
+    run_in_threads(lambda: histogram.observe(0.5), 500)
+
+    assert histogram._shards == []
+    assert histogram.count() == 500
+    assert 'test_request_seconds_bucket{le="1"} 500' in histogram.render()
+
+def test_live_thread_keeps_its_shard():
+    counter = Counter('test_live_total', 'test')
+    counter.inc()
+    run_in_threads(counter.inc, 3)
+
+    assert len(counter._shards) == 1
+    assert counter.value() == 4
+
+def test_scrape_does_not_count_a_retiring_shard_twice():
+    counter = Counter('test_scrape_total', 'test')
+    exit_thread = threading.Event()
+
+    def worker():
+        counter.inc()
+        exit_thread.wait()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    while not counter._shards:
+        pass
+
+    merge = counter._merge
+
+    def merge_while_thread_exits(target, shard):
+        # Thread selesai (shard-nya pensiun) di tengah scrape
+        if target is not counter._base and not exit_thread.is_set():
+            exit_thread.set()
+            thread.join(0.5)
+        merge(target, shard)
+
+    counter._merge = merge_while_thread_exits
+    value = counter.value()
+    thread.join()
+    counter._merge = merge
+
+    assert value == 1
+    assert counter.value() == 1
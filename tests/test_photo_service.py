@@ -0,0 +1,181 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from services.photo_service import STREAM_QUEUE_CHUNKS, _END_OF_STREAM, PhotoService, _iter_chunks, _put_chunk
+
+def test_chunks_reach_the_upload_thread_in_order():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+
+        def consume():
+            received = []
+            for chunk in _iter_chunks(chunks, loop):
+                # Upload lebih lambat dari download: antrian penuh
+                time.sleep(0.01)
+                received.append(chunk)
+            return received
+
+        upload = loop.run_in_executor(None, consume)
+        for i in range(20):
+            assert await _put_chunk(chunks, bytes([i]), upload)
+        assert await _put_chunk(chunks, _END_OF_STREAM, upload)
+        return await upload
+
+    assert asyncio.run(scenario()) == [bytes([i]) for i in range(20)]
+
+def test_download_stops_when_the_upload_fails():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+
+        def consume():
+            next(_iter_chunks(chunks, loop))
+            raise RuntimeError("Drive rejected the upload")
+
+        upload = loop.run_in_executor(None, consume)
+        sent = 0
+        while await _put_chunk(chunks, b"x", upload):
+            sent += 1
+        try:
+            await upload
+        except RuntimeError:
+            pass
+        return sent
+
+    # Satu chunk dibaca, sisanya hanya sampai antrian penuh
+    assert asyncio.run(scenario()) <= STREAM_QUEUE_CHUNKS + 1
+
+def test_download_error_is_raised_in_the_upload_thread():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+        upload = loop.run_in_executor(None, lambda: list(_iter_chunks(chunks, loop)))
+        await _put_chunk(chunks, b"x", upload)
+        await _put_chunk(chunks, ConnectionError("Telegram download failed"), upload)
+        try:
+            await upload
+        except ConnectionError as e:
+            return str(e)
+
+    assert asyncio.run(scenario()) == "Telegram download failed"
+
+class StalledTelegram:
+    """Telegram file download that sends a burst of chunks and then hangs"""
+
+    @asynccontextmanager
+    async def stream(self, method, url):
+        async def aiter_bytes(chunk_size):
+            for i in range(STREAM_QUEUE_CHUNKS * 3):
+                yield bytes([i])
+            await asyncio.Event().wait()
+
+        yield SimpleNamespace(raise_for_status=lambda: None, aiter_bytes=aiter_bytes)
+
+class SlowDrive:
+    """Upload backend that reads chunks slower than Telegram sends them"""
+
+    def __init__(self):
+        self.received = 0
+        self.error = None
+        self.finished = threading.Event()
+
+    async def stream_upload_to_drive(self, chunks, file_name, folder_id):
+        return await asyncio.get_running_loop().run_in_executor(None, self.consume, chunks)
+
+    def consume(self, chunks):
+        try:
+            for chunk in chunks:
+                time.sleep(0.05)
+                self.received += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished.set()
+
+def test_cancelled_transfer_releases_the_upload_thread():
+    async def scenario():
+        drive = SlowDrive()
+        photo_service = PhotoService(drive)
+        photo_service._http = StalledTelegram()
+
+        transfer = asyncio.create_task(photo_service._transfer_streaming(SimpleNamespace(file_path='foto'), 'foto.jpg', 'folder'))
+        await asyncio.sleep(0.1)
+        transfer.cancel()
+        try:
+            await transfer
+        except asyncio.CancelledError:
+            pass
+
+        # Thread upload berhenti sekarang, bukan setelah STREAM_STALL_TIMEOUT
+        assert await asyncio.to_thread(drive.finished.wait, 2)
+        return drive
+
+    drive = asyncio.run(scenario())
+    assert isinstance(drive.error, ConnectionAbortedError)
+    # Chunk yang belum dibaca dibuang, tidak di-upload setelah batal
+    assert drive.received < STREAM_QUEUE_CHUNKS + 3
+
+BENCHMARK_PHOTOS = 50
+BENCHMARK_PHOTO_SIZE = 3 * 1024 * 1024
+
+class TelegramPhoto:
+    """Telegram file that downloads fixed content to memory or disk"""
+
+    def __init__(self, data):
+        self.data = data
+        self.file_size = len(data)
+        self.file_path = 'photos/file_0.jpg'
+
+    async def download_as_bytearray(self):
+        return bytearray(self.data)
+
+    async def download_to_drive(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.data)
+
+class ReadingDrive:
+    """Upload backend that reads the whole photo like a real upload would"""
+
+    async def upload_bytes_to_drive(self, data, file_name, folder_id):
+        return f"id-{len(data)}"
+
+    async def upload_to_drive(self, file_path, file_name, folder_id):
+        with open(file_path, 'rb') as f:
+            return f"id-{len(f.read())}"
+
+@pytest.mark.benchmark
+def test_memory_path_writes_nothing_to_disk(tmp_path):
+    data = os.urandom(BENCHMARK_PHOTO_SIZE)
+    telegram_photo = TelegramPhoto(data)
+
+    async def get_file(file_id):
+        return telegram_photo
+
+    bot = SimpleNamespace(get_file=get_file)
+    photo = SimpleNamespace(file_id='photo', file_size=len(data))
+
+    async def transfer(spool_threshold):
+        photo_service = PhotoService(ReadingDrive(), spool_dir=str(tmp_path), spool_threshold=spool_threshold,
+                                     streaming=False)
+        written = photo_service.disk_bytes.value()
+        started = time.perf_counter()
+        for i in range(BENCHMARK_PHOTOS):
+            assert await photo_service.transfer_photo(bot, photo, 7, f"foto_{i}.jpg", 'folder') == f"id-{len(data)}"
+        elapsed = time.perf_counter() - started
+        return photo_service.disk_bytes.value() - written, elapsed / BENCHMARK_PHOTOS * 1000
+
+    # threshold 0: setiap foto lewat file spool seperti temp file sebelumnya
+    spool_written, spool_ms = asyncio.run(transfer(0))
+    memory_written, memory_ms = asyncio.run(transfer(BENCHMARK_PHOTO_SIZE))
+
+    print(f"spool file: {spool_written / BENCHMARK_PHOTOS / 1024:.0f} KiB written, {spool_ms:.2f} ms per photo")
+    print(f"memory: {memory_written / BENCHMARK_PHOTOS / 1024:.0f} KiB written, {memory_ms:.2f} ms per photo")
+    assert spool_written == BENCHMARK_PHOTOS * len(data)
+    assert memory_written == 0
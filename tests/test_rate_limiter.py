@@ -0,0 +1,99 @@
+import asyncio
+import json
+import time
+
+from telegram.ext import Application
+from telegram.request import BaseRequest
+
+from services.rate_limiter import PRIORITY_BACKGROUND, TelegramRateLimiter
+
+CHAT_ID = 7
+
+class FloodControlledTelegram(BaseRequest):
+    """Bot API stand-in that records sent texts and answers the first flood_texts with a 429"""
+
+    def __init__(self, flood_texts=()):
+        self.sent = []
+        self.attempts = []
+        self.flood_texts = set(flood_texts)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        endpoint = url.rsplit('/', 1)[1]
+        parameters = request_data.parameters if request_data else {}
+        if endpoint == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Report Bot', 'username': 'report_bot'}
+            return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+        text = parameters['text']
+        self.attempts.append((text, time.monotonic()))
+        if text in self.flood_texts:
+            self.flood_texts.discard(text)
+            return 429, json.dumps({
+                'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1}
+            }).encode()
+
+        self.sent.append(text)
+        result = {'message_id': len(self.sent), 'date': 0, 'text': text, 'chat': {'id': CHAT_ID, 'type': 'private'}}
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+async def start_bot(request, rate_limiter):
+    application = Application.builder().token('123:TEST').request(request).rate_limiter(rate_limiter).build()
+    await application.initialize()
+    return application
+
+def test_interactive_replies_go_before_queued_background_updates():
+    async def scenario():
+        request = FloodControlledTelegram()
+        application = await start_bot(request, TelegramRateLimiter(private_chat_rate=20, burst=1))
+
+        def send(text, background=False):
+            return application.bot.send_message(
+                CHAT_ID, text, rate_limit_args={'priority': PRIORITY_BACKGROUND if background else 'interactive'}
+            )
+
+        await asyncio.gather(
+            send('progress 1', background=True), send('progress 2', background=True),
+            send('progress 3', background=True), send('reply 1'), send('reply 2')
+        )
+        await application.shutdown()
+        return request.sent
+
+    sent = asyncio.run(scenario())
+    # progress 1 sudah dapat token sebelum balasan interaktif datang
+    assert sent[0] == 'progress 1'
+    assert set(sent[1:3]) == {'reply 1', 'reply 2'}
+    assert set(sent[3:]) == {'progress 2', 'progress 3'}
+
+def test_retry_after_holds_the_chat_and_retries():
+    async def scenario():
+        request = FloodControlledTelegram(flood_texts=['laporan'])
+        rate_limiter = TelegramRateLimiter(private_chat_rate=20, burst=5)
+        application = await start_bot(request, rate_limiter)
+
+        first = asyncio.create_task(application.bot.send_message(CHAT_ID, 'laporan'))
+        while not request.attempts:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        # Request berikutnya ke chat yang sama ikut menunggu flood control selesai
+        await application.bot.send_message(CHAT_ID, 'foto')
+        message = await first
+        await application.shutdown()
+        return request, message
+
+    request, message = asyncio.run(scenario())
+
+    assert message.text == 'laporan'
+    assert sorted(text for text, at in request.attempts) == ['foto', 'laporan', 'laporan']
+    flooded_at = request.attempts[0][1]
+    assert all(at - flooded_at >= 0.95 for text, at in request.attempts[1:])
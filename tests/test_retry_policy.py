@@ -0,0 +1,159 @@
+import time
+from types import SimpleNamespace
+
+import httplib2
+import requests
+import urllib3
+from googleapiclient.errors import HttpError
+
+from services.drive_batcher import DriveBatcher
+from services.google_service import GoogleService
+from services.retry_policy import RetryPolicy
+
+def make_policy():
+    return RetryPolicy(max_attempts=3, base_delay=0, max_delay=0, failure_threshold=100)
+
+def response(status, headers=None, body=b'{}'):
+    return SimpleNamespace(
+        status_code=status, headers=headers or {}, content=body,
+        json=lambda: {'id': 'file-id'}, raise_for_status=lambda: None
+    )
+
+def run(policy, outcomes, idempotent):
+    calls = []
+
+    def attempt(remaining):
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return response(outcome)
+
+    try:
+        policy.call('sheets', attempt, lambda r: r.status_code, idempotent=idempotent)
+    except Exception:
+        pass
+    return len(calls)
+
+def connect_error():
+    reason = urllib3.exceptions.NewConnectionError(None, "Connection refused")
+    return requests.exceptions.ConnectionError(urllib3.exceptions.MaxRetryError(None, '/', reason))
+
+def test_non_idempotent_requests_retry_only_when_unprocessed():
+    policy = make_policy()
+
+    assert run(policy, [500, 200], idempotent=True) == 2
+    assert run(policy, [500, 200], idempotent=False) == 1
+    assert run(policy, [requests.exceptions.ReadTimeout(), 200], idempotent=False) == 1
+    assert run(policy, [429, 503, 200], idempotent=False) == 3
+    assert run(policy, [connect_error(), 200], idempotent=False) == 2
+
+class ResumableSession:
+    """Drive upload session that stores 10 bytes of the first chunk, then times out"""
+
+    def __init__(self):
+        self.puts = []
+
+    def put(self, url, data=None, headers=None, timeout=None):
+        self.puts.append((headers['Content-Range'], data))
+        if len(self.puts) == 1:
+            raise requests.exceptions.ReadTimeout()
+        if data is None:
+            return response(308, {'Range': 'bytes=0-1033'})
+        return response(200)
+
+def test_chunk_retry_resumes_from_upload_status():
+    google_service = GoogleService.__new__(GoogleService)
+    google_service.policy = make_policy()
+    session = ResumableSession()
+    data = bytes(range(100))
+
+    result = google_service._put_chunk(session, 'upload-url', data, 1024, 1124)
+
+    assert result == {'id': 'file-id'}
+    assert session.puts[1] == ('bytes */1124', None)
+    assert session.puts[2] == ('bytes 1034-1123/1124', data[10:])
+
+class FakeRequest:
+    def __init__(self, name, method):
+        self.name = name
+        self.method = method
+
+    def execute(self):
+        return {'name': self.name}
+
+class FakeBatch:
+    def __init__(self, drive):
+        self.drive = drive
+        self.requests = []
+
+    def add(self, request, callback, request_id):
+        self.requests.append((request, callback, request_id))
+
+    def execute(self):
+        self.drive.batches.append([request.name for request, callback, request_id in self.requests])
+        for request, callback, request_id in self.requests:
+            status = self.drive.statuses[request.name].pop(0)
+            if status == 200:
+                callback(request_id, {'name': request.name}, None)
+            else:
+                callback(request_id, None, HttpError(httplib2.Response({'status': status}), b'{}'))
+
+class FakeDrive:
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.batches = []
+
+    def new_batch_http_request(self):
+        return FakeBatch(self)
+
+def test_batch_retries_failed_sub_requests():
+    drive = FakeDrive({'share': [429, 200], 'delete': [500, 200], 'append': [500]})
+    batcher = DriveBatcher(SimpleNamespace(service_drive=drive, policy=make_policy()))
+    futures = {
+        name: batcher.submit(lambda d, name=name, method=method: FakeRequest(name, method))
+        for name, method in (('share', 'POST'), ('delete', 'DELETE'), ('append', 'POST'))
+    }
+
+    batcher._execute([batcher._queue.get() for _ in futures], 'size')
+    assert not futures['share'].done()
+    # Retry dijadwalkan ke batch berikutnya, bukan dikirim ulang di tempat
+    batcher._execute(batcher._due_retries(), 'delay')
+
+    assert batcher._retries == [] and batcher._attempts == {}
+    assert drive.batches == [['share', 'delete', 'append'], ['share', 'delete']]
+    assert futures['share'].result() == {'name': 'share'}
+    assert futures['delete'].result() == {'name': 'delete'}
+    assert isinstance(futures['append'].exception(), HttpError)
+
+def test_batch_backoff_does_not_stall_other_requests():
+    drive = FakeDrive({'share': [429, 200], 'other': [200], 'rename': [200]})
+    policy = RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=0.5, failure_threshold=100)
+    policy._backoff = lambda attempt: 0.5
+    batcher = DriveBatcher(SimpleNamespace(service_drive=drive, policy=policy), max_delay_ms=20)
+    batcher.start()
+    try:
+        share = batcher.submit(lambda d: FakeRequest('share', 'POST'))
+        batcher.submit(lambda d: FakeRequest('other', 'POST'))
+        while not batcher._retries:
+            time.sleep(0.005)
+
+        # Request baru terkirim selagi share menunggu backoff-nya
+        started = time.monotonic()
+        assert batcher.submit(lambda d: FakeRequest('rename', 'PATCH')).result(timeout=5) == {'name': 'rename'}
+        assert time.monotonic() - started < 0.4
+        assert not share.done()
+        assert share.result(timeout=5) == {'name': 'share'}
+    finally:
+        batcher.stop()
+
+def test_submit_after_stop_fails_right_away():
+    drive = FakeDrive({})
+    batcher = DriveBatcher(SimpleNamespace(service_drive=drive, policy=make_policy()))
+    batcher.start()
+    batcher.stop()
+
+    future = batcher.submit(lambda d: FakeRequest('share', 'POST'))
+
+    assert isinstance(future.exception(timeout=1), RuntimeError)
+    assert drive.batches == []
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from bot import TelegramBot, CONFIRM_DATA
+from services.album_collector import AlbumCollector
+from services.metrics import metrics
+from services.session_service import SessionService
+from services.upload_queue import UploadQueue
+
+USER_ID = 7
+
+class FakeTelegram:
+    """Stand-in for the Bot used by StatusMessage and upload_photo_background"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(text)
+        return SimpleNamespace(message_id=len(self.sent))
+
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        self.sent.append(text)
+
+class FakeAsyncGoogle:
+    def __init__(self):
+        self.rows = []
+
+    async def update_spreadsheet(self, spreadsheet_id, spreadsheet_config, laporan_data):
+        self.rows.append(laporan_data)
+        return True
+
+def make_bot():
+    bot = TelegramBot.__new__(TelegramBot)
+    bot.spreadsheet_id = 'sheet'
+    bot.spreadsheet_config = None
+    bot.session_service = SessionService(None)
+    bot.async_google_service = FakeAsyncGoogle()
+    bot.upload_queue = UploadQueue()
+    bot.album_collector = AlbumCollector(lambda session_key, parts: None)
+    bot.folder_locks = {}
+    bot.status_interval = 0
+    bot.upload_barrier_timeout = 0.1
+    bot.reports = metrics.counter('bot_reports_total', 'Finished report sessions by outcome')
+
+    session = bot.session_service.create_session(USER_ID)
+    session.update({
+        'folder_id': 'folder',
+        'data': {'report_type': 'BGES', 'id_ticket': 'IN123'}
+    })
+    return bot, session
+
+def make_update(replies):
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=USER_ID),
+        effective_chat=SimpleNamespace(id=USER_ID),
+        message=SimpleNamespace(reply_text=reply_text)
+    )
+
+def test_report_waits_briefly_and_stays_on_confirm_while_uploading():
+    bot, session = make_bot()
+    telegram = FakeTelegram()
+    replies = []
+
+    async def scenario():
+        bot.upload_queue.submit(USER_ID, asyncio.sleep(5, result='file-id'))
+        started = time.perf_counter()
+        state = await bot.send_report(make_update(replies), SimpleNamespace(bot=telegram))
+        elapsed = time.perf_counter() - started
+        await bot.upload_queue.cancel(USER_ID)
+        return state, elapsed
+
+    state, elapsed = asyncio.run(scenario())
+
+    assert state == CONFIRM_DATA
+    assert elapsed < 1
+    assert bot.async_google_service.rows == []
+    assert 'Kirim Laporan' in replies[-1]
+
+def test_failed_upload_keeps_report_on_confirm_once():
+    bot, session = make_bot()
+    telegram = FakeTelegram()
+    replies = []
+
+    async def fail():
+        return None
+
+    async def scenario():
+        entry = {'id': None, 'name': 'foto_1.jpg'}
+        session['photos'].append(entry)
+        status = bot.photo_status(telegram, USER_ID, session)
+        bot.upload_queue.submit(
+            USER_ID, bot.upload_photo_background(telegram, USER_ID, USER_ID, session, entry, fail, status)
+        )
+        context = SimpleNamespace(bot=telegram)
+        first = await bot.send_report(make_update(replies), context)
+        # Dipilih lagi: user sengaja mengirim tanpa foto yang gagal
+        second = await bot.send_report(make_update(replies), context)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first == CONFIRM_DATA
+    assert 'foto_1.jpg' in replies[0]
+    assert second != CONFIRM_DATA
+    assert len(bot.async_google_service.rows) == 1
@@ -0,0 +1,34 @@
+import asyncio
+from types import SimpleNamespace
+
+from telegram.error import TimedOut
+
+from services.status_message import StatusMessage
+
+class FlakyTelegram:
+    """Bot whose first edit times out"""
+
+    def __init__(self):
+        self.sent = []
+        self.failures = 1
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(text)
+        return SimpleNamespace(message_id=len(self.sent))
+
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise TimedOut()
+        self.sent.append(text)
+
+def test_timed_out_edit_is_retried_without_new_updates():
+    async def scenario():
+        bot = FlakyTelegram()
+        status = StatusMessage(bot, chat_id=7, min_interval=0.05)
+        await status.update("Mengunggah 1/3")
+        await status.update("Selesai", force=True)
+        await asyncio.sleep(0.3)
+        return bot.sent
+
+    assert asyncio.run(scenario()) == ["Mengunggah 1/3", "Selesai"]
@@ -0,0 +1,25 @@
+from services.update_filter import RecentUpdateIds
+
+def test_duplicate_is_dropped():
+    recent = RecentUpdateIds(size=3)
+    assert recent.add_if_new(1)
+    assert not recent.add_if_new(1)
+
+def test_oldest_id_leaves_the_window():
+    recent = RecentUpdateIds(size=3)
+    for update_id in (1, 2, 3, 4):
+        assert recent.add_if_new(update_id)
+    assert 1 not in recent
+    assert len(recent) == 3
+
+def test_forgotten_id_keeps_a_full_window_after_redelivery():
+    recent = RecentUpdateIds(size=3)
+    recent.add_if_new(1)
+    recent.add_if_new(2)
+    recent.forget(1)
+    assert recent.add_if_new(1)
+
+    # Slot lama milik 1 sudah kosong, jadi mengisinya tidak membuang 1 lagi
+    assert recent.add_if_new(3)
+    assert 1 in recent
+    assert not recent.add_if_new(1)
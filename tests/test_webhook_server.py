@@ -0,0 +1,92 @@
+import asyncio
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+import webhook_server
+
+FLASK_THREADS = 8
+CALLS_PER_THREAD = 25
+
+class BotApiStub(BaseHTTPRequestHandler):
+    """Keep-alive stand-in for api.telegram.org answering sendMessage"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        body = b'{"ok": true, "result": {"message_id": 1}}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def latencies(call):
+    """Per-call latency (ms) of call() made from FLASK_THREADS request threads at once"""
+    results = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(FLASK_THREADS)
+
+    def run():
+        barrier.wait()
+        own = []
+        for _ in range(CALLS_PER_THREAD):
+            started = time.perf_counter()
+            call()
+            own.append((time.perf_counter() - started) * 1000)
+        with lock:
+            results.extend(own)
+
+    threads = [threading.Thread(target=run) for _ in range(FLASK_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(results)
+
+async def make_client():
+    return httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=FLASK_THREADS))
+
+@pytest.mark.benchmark
+def test_persistent_loop_latency_against_asyncio_run_per_request():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), BotApiStub)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/bot123:TEST/sendMessage"
+
+    async def reply(client):
+        # Satu balasan ke Bot API, seperti handler yang menjawab update
+        response = await client.post(url, json={'chat_id': 7, 'text': 'ok'})
+        return response.json()['ok']
+
+    async def reply_with_own_client():
+        # asyncio.run per request: pool HTTPX terikat loop lama, jadi tiap request buka koneksi baru
+        async with httpx.AsyncClient() as client:
+            return await reply(client)
+
+    webhook_server.start_bot_loop()
+    try:
+        shared = webhook_server.run_on_bot_loop(make_client())
+        persistent = latencies(lambda: webhook_server.run_on_bot_loop(reply(shared)))
+        per_request = latencies(lambda: asyncio.run(reply_with_own_client()))
+        webhook_server.run_on_bot_loop(shared.aclose())
+    finally:
+        webhook_server.bot_loop.call_soon_threadsafe(webhook_server.bot_loop.stop)
+        webhook_server.bot_loop_thread.join(5)
+        webhook_server.bot_loop.close()
+        server.shutdown()
+        server.server_close()
+
+    for name, result in (('bot loop thread', persistent), ('asyncio.run per request', per_request)):
+        print(f"{name}: p50 {statistics.median(result):.2f}ms, "
+              f"p99 {result[int(len(result) * 0.99)]:.2f}ms")
+
+    assert statistics.median(persistent) < statistics.median(per_request)